@@ -1,6 +1,6 @@
 'use client'
 
-import { useQuery } from '@tanstack/react-query'
+import { useInfiniteQuery } from '@tanstack/react-query'
 import { leadsApi, Lead } from '@/lib/api'
 import { formatDateTime, downloadBlob } from '@/lib/utils'
 import { useState } from 'react'
@@ -10,14 +10,22 @@ import { ArrowDownTrayIcon } from '@heroicons/react/24/outline'
 export default function LeadsPage() {
   const [selectedFormId, setSelectedFormId] = useState<string | undefined>()
 
-  const { data: leads, isLoading } = useQuery({
+  // The API returns 50 leads per page and the next page's cursor in X-Next-Cursor
+  const { data, isLoading, fetchNextPage, hasNextPage, isFetchingNextPage } = useInfiniteQuery({
     queryKey: ['leads', selectedFormId],
-    queryFn: async () => {
-      const response = await leadsApi.getAll(selectedFormId)
-      return response.data
+    queryFn: async ({ pageParam }) => {
+      const response = await leadsApi.getAll(selectedFormId, pageParam)
+      return {
+        leads: response.data,
+        nextCursor: (response.headers['x-next-cursor'] as string | undefined) || undefined,
+      }
     },
+    initialPageParam: undefined as string | undefined,
+    getNextPageParam: (lastPage) => lastPage.nextCursor,
   })
 
+  const leads: Lead[] | undefined = data?.pages.flatMap((page) => page.leads)
+
   const handleExport = async () => {
     if (!selectedFormId) {
       toast.error('Please select a form first')
@@ -170,6 +178,17 @@ export default function LeadsPage() {
               </div>
             </div>
           </div>
+          {hasNextPage && (
+            <div className="mt-6 flex justify-center">
+              <button
+                onClick={() => fetchNextPage()}
+                disabled={isFetchingNextPage}
+                className="inline-flex items-center rounded-md border border-gray-300 bg-white px-4 py-2 text-sm font-medium text-gray-700 shadow-sm hover:bg-gray-50 disabled:opacity-50"
+              >
+                {isFetchingNextPage ? 'Loading...' : 'Load more leads'}
+              </button>
+            </div>
+          )}
         </div>
       )}
     </div>
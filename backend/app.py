@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
@@ -14,7 +14,7 @@ app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'postgresql://
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
 
-CORS(app, origins=[os.getenv('FRONTEND_URL', 'http://localhost:3000')])
+CORS(app, origins=[os.getenv('FRONTEND_URL', 'http://localhost:3000')], expose_headers=['X-Next-Cursor'])
 
 db = SQLAlchemy(app)
 
@@ -33,6 +33,38 @@ app.register_blueprint(chat_bp, url_prefix='/api/chat')
 app.register_blueprint(analytics_bp, url_prefix='/api/analytics')
 app.register_blueprint(documents_bp, url_prefix='/api/documents')
 
+# Request, database and service metrics for /api/metrics
+from services import metrics
+metrics.init_app(app)
+
+# Register CLI commands
+from commands import register_commands
+register_commands(app)
+
+# Buffered analytics ingestion
+from services.analytics_buffer import analytics_buffer
+analytics_buffer.init_app(app)
+
+# Background document ingestion
+from services.ingestion import ingestion_service
+ingestion_service.init_app(app)
+
+# Background lead analysis
+from services.lead_analysis import lead_analysis
+lead_analysis.init_app(app)
+
+# Per-turn lead insights
+from services.lead_insights import lead_insights
+lead_insights.init_app(app)
+
+# Background question clustering
+from services.question_clusters import question_recorder
+question_recorder.init_app(app)
+
+# Prompt token profiling
+from services.prompt_profiler import prompt_profiler
+prompt_profiler.init_app(app)
+
 # Supabase JWT verification
 import requests
 
@@ -87,6 +119,27 @@ def require_admin(f):
 def health_check():
     return jsonify({'status': 'healthy', 'timestamp': datetime.utcnow().isoformat()})
 
+@app.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    if not metrics.scrape_token():
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    if not metrics.scrape_allowed(request.headers.get('Authorization')):
+        return jsonify({'error': 'Invalid metrics token'}), 401
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/admin/prompt-profile', methods=['GET'])
+@verify_token
+@require_admin
+def prompt_profile():
+    """Per-form prompt token distributions of the serving worker"""
+    from services.prompt_profiler import prompt_profiler
+    
+    threshold = request.args.get('threshold', type=int)
+    flagged_only = request.args.get('flagged', '').lower() in ('1', 'true')
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    
+    return jsonify(prompt_profiler.report(threshold, flagged_only, limit))
+
 # Create tables
 with app.app_context():
     db.create_all()
@@ -0,0 +1,54 @@
+"""
+Async serving mode: the chat endpoints run on Quart with AsyncOpenAI and an
+async database session, everything else is the unchanged Flask app.
+
+    uvicorn asgi:application --workers 2
+"""
+import os
+from asgiref.wsgi import WsgiToAsgi
+from quart import Quart, request
+from quart_cors import cors
+from app import app as flask_app
+from routes.async_chat import async_chat_bp
+from services.async_db import engine
+from services import metrics
+
+CHAT_PREFIX = '/api/chat'
+
+chat_app = Quart(__name__)
+chat_app.register_blueprint(async_chat_bp, url_prefix=CHAT_PREFIX)
+chat_app = cors(chat_app, allow_origin=[os.getenv('FRONTEND_URL', 'http://localhost:3000')])
+
+@chat_app.before_request
+async def start_timer():
+    metrics.begin_request()
+
+@chat_app.after_request
+async def keep_status(response):
+    metrics.record_status(response.status_code)
+    return response
+
+@chat_app.teardown_request
+async def record_request(error=None):
+    # Teardown also runs for requests that raise
+    metrics.end_request(
+        request.blueprint,
+        request.url_rule.rule if request.url_rule else None,
+        request.method
+    )
+
+@chat_app.after_serving
+async def close_connections():
+    from routes.async_chat import ai_service
+    await ai_service.async_llm.close()
+    await engine.dispose()
+
+wsgi_app = WsgiToAsgi(flask_app)
+
+async def application(scope, receive, send):
+    """Route chat requests to the async app and the rest to Flask"""
+    path = scope.get('path', '')
+    if scope['type'] == 'lifespan' or path == CHAT_PREFIX or path.startswith(CHAT_PREFIX + '/'):
+        await chat_app(scope, receive, send)
+    else:
+        await wsgi_app(scope, receive, send)
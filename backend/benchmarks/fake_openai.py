@@ -0,0 +1,204 @@
+import json
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY_WORDS = (
+    'Thanks for reaching out! We help teams like yours automate lead qualification, '
+    'cut manual follow-up and see which conversations are worth a call. Could you tell me '
+    'a bit more about your team size and what you use today?'
+).split()
+
+ANALYSIS_REPLY = {
+    'pain_points': ['manual follow-up'],
+    'buying_signals': ['asked about pricing'],
+    'qualification_level': 'warm',
+    'summary': 'Evaluating tools to automate lead qualification.',
+}
+
+
+class FakeOpenAIConfig:
+    """
+    Latency profile of the stub: time to first token, then one token per interval.
+    Tests can also script the next delays and failures and read the request count.
+    """
+
+    def __init__(self, latency=0.5, jitter=0.2, token_interval=0.02, reply_tokens=40, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.token_interval = token_interval
+        self.reply_tokens = reply_tokens
+        self.error_rate = error_rate
+        self.error_status = 503
+        self.requests = 0
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self._delays = deque()
+        self._failures = deque()
+
+    def delay_next(self, *delays):
+        """Seconds to the first token of the next requests, in order"""
+        with self.lock:
+            self._delays.extend(delays)
+
+    def fail_next(self, count=1, status=503):
+        """Answer the next `count` requests with this HTTP status"""
+        with self.lock:
+            self._failures.extend([status] * count)
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self._delays.clear()
+            self._failures.clear()
+
+    def first_token_delay(self):
+        with self.lock:
+            self.requests += 1
+            if self._delays:
+                return self._delays.popleft()
+            return max(self.latency + self.random.uniform(-self.jitter, self.jitter), 0)
+
+    def failure_status(self):
+        """HTTP status to fail this request with, or None"""
+        with self.lock:
+            if self._failures:
+                return self._failures.popleft()
+            return self.error_status if self.random.random() < self.error_rate else None
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """OpenAI-compatible /v1/chat/completions, streaming and not"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path.rstrip('/') != '/v1/chat/completions':
+            self._send_json(404, {'error': {'message': f'Unknown path {self.path}'}})
+            return
+
+        config = self.server.config
+        request = json.loads(body or b'{}')
+        # Scripted failures go to requests in arrival order, however long each one stalls
+        status = config.failure_status()
+        time.sleep(config.first_token_delay())
+
+        if status is not None:
+            self._send_json(status, {'error': {'message': 'Injected failure', 'type': 'server_error'}})
+            return
+
+        content = self._reply_text(request)
+        if request.get('stream'):
+            self._stream(request, content)
+        else:
+            self._send_json(200, {
+                'id': f'chatcmpl-{uuid.uuid4().hex}',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': request.get('model', 'fake'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': content},
+                    'finish_reason': 'stop',
+                }],
+                'usage': {
+                    'prompt_tokens': self._prompt_tokens(request),
+                    'completion_tokens': len(content.split()),
+                    'total_tokens': self._prompt_tokens(request) + len(content.split()),
+                },
+            })
+
+    def _reply_text(self, request):
+        # Analysis and insight prompts expect a JSON object back
+        prompt = ' '.join(str(msg.get('content', '')) for msg in request.get('messages', []))
+        if 'Respond in JSON format' in prompt:
+            return json.dumps(ANALYSIS_REPLY)
+        tokens = self.server.config.reply_tokens
+        return ' '.join(REPLY_WORDS[i % len(REPLY_WORDS)] for i in range(tokens))
+
+    def _prompt_tokens(self, request):
+        return sum(len(str(msg.get('content', ''))) // 4 for msg in request.get('messages', []))
+
+    def _stream(self, request, content):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        completion_id = f'chatcmpl-{uuid.uuid4().hex}'
+        words = content.split(' ')
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.server.config.token_interval)
+            self._write_event({
+                'id': completion_id,
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': request.get('model', 'fake'),
+                'choices': [{
+                    'index': 0,
+                    'delta': {'content': word if i == 0 else f' {word}'},
+                    'finish_reason': None,
+                }],
+            })
+        self._write_chunk(b'data: [DONE]\n\n')
+        self._write_chunk(b'')
+
+    def _write_event(self, payload):
+        self._write_chunk(f'data: {json.dumps(payload)}\n\n'.encode())
+
+    def _write_chunk(self, data):
+        self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+        self.wfile.flush()
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config, host='127.0.0.1', port=0):
+        super().__init__((host, port), FakeOpenAIHandler)
+        self.config = config
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='fake-openai', daemon=True).start()
+        return self
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Stub OpenAI-compatible server for local load tests')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.5, help='Seconds to the first token')
+    parser.add_argument('--jitter', type=float, default=0.2, help='Uniform +/- seconds around the latency')
+    parser.add_argument('--token-interval', type=float, default=0.02, help='Seconds between streamed tokens')
+    parser.add_argument('--reply-tokens', type=int, default=40)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with a 503')
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(
+        FakeOpenAIConfig(args.latency, args.jitter, args.token_interval, args.reply_tokens, args.error_rate),
+        port=args.port
+    )
+    print(f"Fake OpenAI server on {server.base_url}")
+    server.serve_forever()
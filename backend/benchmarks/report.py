@@ -0,0 +1,120 @@
+import json
+import os
+from datetime import datetime
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), 'baselines')
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return None
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def summarize(recorder, seconds):
+    """Per-endpoint throughput and latency percentiles in milliseconds"""
+    endpoints = {}
+    for label in sorted(set(recorder.samples) | set(recorder.errors)):
+        values = sorted(recorder.samples.get(label, []))
+        errors = recorder.errors.get(label, 0)
+        endpoints[label] = {
+            'requests': len(values) + errors,
+            'errors': errors,
+            'throughput': round((len(values) + errors) / seconds, 2) if seconds else 0,
+            'p50_ms': _ms(percentile(values, 0.50)),
+            'p95_ms': _ms(percentile(values, 0.95)),
+            'p99_ms': _ms(percentile(values, 0.99)),
+        }
+    return endpoints
+
+
+def build_result(endpoints, seconds, settings):
+    return {
+        'created_at': datetime.utcnow().isoformat(),
+        'duration': round(seconds, 1),
+        'settings': settings,
+        'endpoints': endpoints,
+    }
+
+
+def format_table(endpoints):
+    header = f"{'endpoint':<52} {'reqs':>7} {'errs':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    lines = [header, '-' * len(header)]
+    for label, stats in endpoints.items():
+        lines.append(
+            f"{label:<52} {stats['requests']:>7} {stats['errors']:>5} {stats['throughput']:>8.2f} "
+            f"{_cell(stats['p50_ms'])} {_cell(stats['p95_ms'])} {_cell(stats['p99_ms'])}"
+        )
+    return '\n'.join(lines)
+
+
+def baseline_path(name):
+    return name if name.endswith('.json') else os.path.join(BASELINE_DIR, f'{name}.json')
+
+
+def save_baseline(name, result):
+    path = baseline_path(name)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(result, f, indent=2, sort_keys=True)
+        f.write('\n')
+    return path
+
+
+def load_baseline(name):
+    with open(baseline_path(name)) as f:
+        return json.load(f)
+
+
+def compare(baseline, result, tolerance):
+    """
+    Endpoints whose p95 grew, or whose throughput or error-free share fell, by more
+    than the tolerance (0.2 = 20%) against the baseline. Returns (lines, regressions).
+    """
+    lines = []
+    regressions = []
+
+    if baseline.get('settings') != result.get('settings'):
+        lines.append('Warning: baseline was recorded with different settings; compare with care')
+
+    for label, stats in result['endpoints'].items():
+        before = baseline['endpoints'].get(label)
+        if before is None:
+            lines.append(f"{label}: new endpoint, no baseline")
+            continue
+
+        problems = []
+        if before['p95_ms'] and stats['p95_ms'] and stats['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            problems.append(f"p95 {before['p95_ms']} -> {stats['p95_ms']} ms")
+        if before['throughput'] and stats['throughput'] < before['throughput'] * (1 - tolerance):
+            problems.append(f"throughput {before['throughput']} -> {stats['throughput']} req/s")
+        if _error_rate(stats) > _error_rate(before) + tolerance / 10:
+            problems.append(f"errors {_error_rate(before):.1%} -> {_error_rate(stats):.1%}")
+
+        if problems:
+            regressions.append(label)
+            lines.append(f"REGRESSION {label}: {', '.join(problems)}")
+        else:
+            lines.append(
+                f"ok {label}: p95 {before['p95_ms']} -> {stats['p95_ms']} ms, "
+                f"{before['throughput']} -> {stats['throughput']} req/s"
+            )
+
+    for label in baseline['endpoints']:
+        if label not in result['endpoints']:
+            lines.append(f"{label}: in the baseline but not exercised in this run")
+
+    return lines, regressions
+
+
+def _error_rate(stats):
+    return stats['errors'] / stats['requests'] if stats['requests'] else 0
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+def _cell(value):
+    return f"{value:>9.1f}" if value is not None else f"{'-':>9}"
@@ -0,0 +1,204 @@
+"""
+Load test of the backend against a local database and a stub OpenAI server.
+
+    python -m benchmarks.run --duration 60 --concurrency 20 --save-baseline main
+    python -m benchmarks.run --duration 60 --concurrency 20 --compare main
+
+Run from backend/. The database named by --database-url is dropped and seeded on every run.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import requests
+from benchmarks import report
+from benchmarks.fake_openai import FakeOpenAIConfig, FakeOpenAIServer
+from benchmarks.seed import check_database, reset_database, seed
+from benchmarks.traffic import DEFAULT_MIX, TrafficConfig, drive
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DATABASE_URL = 'postgresql://localhost/ai_form_builder_bench'
+STARTUP_TIMEOUT = 60
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Mixed-traffic benchmark with per-endpoint p50/p95/p99')
+    parser.add_argument('--database-url', default=os.getenv('BENCH_DATABASE_URL', DEFAULT_DATABASE_URL),
+                        help="Local database to reset and seed; its name must contain 'bench'")
+    parser.add_argument('--server', choices=('gunicorn', 'uvicorn'), default='gunicorn',
+                        help='gunicorn serves app:app, uvicorn serves the async asgi:application')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4, help='gunicorn threads per worker')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--concurrency', type=int, default=20, help='Virtual users')
+    parser.add_argument('--duration', type=float, default=60, help='Measured seconds')
+    parser.add_argument('--warmup', type=float, default=10, help='Seconds of traffic before measuring')
+    parser.add_argument('--mix', default=','.join(f'{name}={weight}' for name, weight in DEFAULT_MIX.items()),
+                        help='Scenario weights, e.g. track=50,chat=25,dashboard=15,export=10')
+    parser.add_argument('--export-sizes', default='100,1000,10000', help='Seeded lead counts of the export forms')
+    parser.add_argument('--stream-share', type=float, default=0.5, help='Share of chat sessions that stream')
+    parser.add_argument('--submit-share', type=float, default=0.4, help='Share of chat sessions that submit')
+    parser.add_argument('--think-time', type=float, default=0.0, help='Mean seconds between scenarios per user')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--llm-latency', type=float, default=0.5, help='Stub seconds to the first token')
+    parser.add_argument('--llm-jitter', type=float, default=0.2)
+    parser.add_argument('--llm-token-interval', type=float, default=0.02)
+    parser.add_argument('--llm-reply-tokens', type=int, default=40)
+    parser.add_argument('--llm-error-rate', type=float, default=0.0)
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE',
+                        help='Extra environment for the server, e.g. --env LLM_HEDGE=true')
+    parser.add_argument('--output', help='Write the results as JSON to this path')
+    parser.add_argument('--save-baseline', metavar='NAME', help='Store the results as benchmarks/baselines/NAME.json')
+    parser.add_argument('--compare', metavar='NAME', help='Compare against a stored baseline (name or path)')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed p95 growth and throughput drop before a regression is reported')
+    return parser.parse_args(argv)
+
+
+def parse_mix(value):
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        if name.strip() not in DEFAULT_MIX:
+            raise SystemExit(f"Unknown scenario '{name}', expected one of {', '.join(DEFAULT_MIX)}")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def server_env(args, openai_base_url):
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_URL': args.database_url,
+        'OPENAI_BASE_URL': openai_base_url,
+        'OPENAI_API_KEY': 'bench',
+        'LEAD_ANALYSIS_WEBHOOK_URL': '',
+    })
+    for item in args.env:
+        key, _, value = item.partition('=')
+        env[key] = value
+    return env
+
+
+def prepare_database(args, env, export_sizes):
+    # app reads its configuration at import time
+    os.environ.update(env)
+    sys.path.insert(0, BACKEND_DIR)
+    from app import app, db
+
+    with app.app_context():
+        reset_database(db)
+        seed(db, export_sizes, args.seed)
+
+
+def start_server(args, env):
+    bind = f'127.0.0.1:{args.port}'
+    if args.server == 'gunicorn':
+        command = [
+            sys.executable, '-m', 'gunicorn', '-w', str(args.workers), '--threads', str(args.threads),
+            '-b', bind, '--timeout', '120', 'app:app',
+        ]
+    else:
+        command = [
+            sys.executable, '-m', 'uvicorn', 'asgi:application', '--workers', str(args.workers),
+            '--host', '127.0.0.1', '--port', str(args.port), '--log-level', 'warning',
+        ]
+
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+    base_url = f'http://{bind}'
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"{args.server} exited with code {process.returncode}")
+        try:
+            if requests.get(f'{base_url}/api/health', timeout=2).ok:
+                return process, base_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+
+    process.terminate()
+    raise SystemExit(f"{args.server} did not answer /api/health within {STARTUP_TIMEOUT}s")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def settings(args, mix, export_sizes):
+    """Everything that shapes the numbers, stored with results so baselines are comparable"""
+    return {
+        'server': args.server,
+        'workers': args.workers,
+        'threads': args.threads if args.server == 'gunicorn' else None,
+        'concurrency': args.concurrency,
+        'mix': mix,
+        'export_sizes': export_sizes,
+        'stream_share': args.stream_share,
+        'submit_share': args.submit_share,
+        'think_time': args.think_time,
+        'seed': args.seed,
+        'llm': {
+            'latency': args.llm_latency,
+            'jitter': args.llm_jitter,
+            'token_interval': args.llm_token_interval,
+            'reply_tokens': args.llm_reply_tokens,
+            'error_rate': args.llm_error_rate,
+        },
+        'env': sorted(args.env),
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    check_database(args.database_url)
+    mix = parse_mix(args.mix)
+    export_sizes = [int(size) for size in args.export_sizes.split(',') if size.strip()]
+
+    fake_openai = FakeOpenAIServer(FakeOpenAIConfig(
+        args.llm_latency, args.llm_jitter, args.llm_token_interval,
+        args.llm_reply_tokens, args.llm_error_rate, args.seed
+    )).start()
+    env = server_env(args, fake_openai.base_url)
+
+    print(f"Seeding {args.database_url} (export sizes {export_sizes})")
+    prepare_database(args, env, export_sizes)
+
+    process, base_url = start_server(args, env)
+    try:
+        print(f"Driving {args.concurrency} users for {args.warmup:g}s warmup + {args.duration:g}s against {base_url}")
+        config = TrafficConfig(
+            mix, export_sizes, stream_share=args.stream_share, submit_share=args.submit_share,
+            think_time=args.think_time, seed=args.seed
+        )
+        recorder, seconds = drive(base_url, config, args.concurrency, args.duration, args.warmup)
+    finally:
+        stop_server(process)
+        fake_openai.shutdown()
+
+    endpoints = report.summarize(recorder, seconds)
+    result = report.build_result(endpoints, seconds, settings(args, mix, export_sizes))
+    print(report.format_table(endpoints))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+    if args.save_baseline:
+        print(f"Baseline saved to {report.save_baseline(args.save_baseline, result)}")
+
+    if args.compare:
+        lines, regressions = report.compare(report.load_baseline(args.compare), result, args.tolerance)
+        print('\n'.join(lines))
+        if regressions:
+            print(f"{len(regressions)} endpoint(s) regressed beyond {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
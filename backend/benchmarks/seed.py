@@ -0,0 +1,90 @@
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from sqlalchemy.engine import make_url
+
+BENCH_USER = 'bench-user'
+CHAT_FORM_ID = 'bench-chat'
+SEED_BATCH_SIZE = 1000
+
+FORM_CONTEXT = (
+    'Acme Leads helps B2B sales teams qualify inbound visitors. Plans: Starter ($49/month, '
+    '1 form, 500 conversations), Growth ($199/month, 10 forms, CRM sync) and Enterprise '
+    '(custom pricing, SSO, dedicated support). Trials last 14 days. Integrations: HubSpot, '
+    'Salesforce, Pipedrive, Slack and webhooks. Ask about team size, current tools, budget '
+    'and timeline before suggesting a demo. '
+) * 4
+
+FORM_FIELDS = [
+    {'id': 'name', 'label': 'Name', 'type': 'text', 'required': True},
+    {'id': 'email', 'label': 'Email', 'type': 'email', 'required': True},
+    {'id': 'company', 'label': 'Company', 'type': 'text', 'required': False},
+    {'id': 'team_size', 'label': 'Team size', 'type': 'number', 'required': False},
+]
+
+
+def export_form_id(size):
+    return f'bench-leads-{size}'
+
+
+def check_database(url):
+    """The benchmark drops every table, so only databases named for it are accepted"""
+    name = make_url(url).database or ''
+    if 'bench' not in name:
+        raise SystemExit(f"Refusing to reset '{name}': the benchmark database name must contain 'bench'")
+
+
+def reset_database(db):
+    db.drop_all()
+    db.create_all()
+
+
+def seed(db, export_sizes, seed=0):
+    """The chat form and one form per export size with that many leads"""
+    from models import Form, Lead
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+
+    forms = [Form(
+        id=CHAT_FORM_ID, user_id=BENCH_USER, title='Benchmark chat', cta_type='Book a demo',
+        fields=FORM_FIELDS, context=FORM_CONTEXT, context_documents=[], embed_settings={}, ai_settings={}
+    )]
+    for size in export_sizes:
+        forms.append(Form(
+            id=export_form_id(size), user_id=BENCH_USER, title=f'Benchmark export {size}', cta_type='Submit',
+            fields=FORM_FIELDS, context='', context_documents=[], embed_settings={}, ai_settings={}
+        ))
+    db.session.add_all(forms)
+    db.session.commit()
+
+    for size in export_sizes:
+        for start in range(0, size, SEED_BATCH_SIZE):
+            rows = [
+                _lead_row(export_form_id(size), i, now - timedelta(minutes=i), rng)
+                for i in range(start, min(start + SEED_BATCH_SIZE, size))
+            ]
+            db.session.execute(insert(Lead), rows)
+            db.session.commit()
+
+
+def _lead_row(form_id, i, created_at, rng):
+    return {
+        'id': f'{form_id}-{i}',
+        'form_id': form_id,
+        'session_id': f'{form_id}-session-{i}',
+        'contact_info': {'name': f'Visitor {i}', 'email': f'visitor{i}@example.com', 'phone': None},
+        'responses': {'name': f'Visitor {i}', 'email': f'visitor{i}@example.com', 'team_size': rng.randint(2, 500)},
+        'conversation_history': [
+            {'role': 'user', 'content': 'Hi, how does pricing work for a team of 20?'},
+            {'role': 'assistant', 'content': 'Growth is $199/month and covers 10 forms with CRM sync.'},
+            {'role': 'user', 'content': 'We follow up manually today and it is too slow.'},
+            {'role': 'assistant', 'content': 'That is what we automate. Want to book a demo?'},
+        ],
+        'pain_points': ['too slow', 'manual'],
+        'buying_signals': ['pricing'],
+        'qualification_level': rng.choice(('hot', 'warm', 'cold')),
+        'analysis_status': 'completed',
+        'analysis_attempts': 0,
+        'created_at': created_at,
+    }
@@ -0,0 +1,199 @@
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+import requests
+from benchmarks.seed import BENCH_USER, CHAT_FORM_ID, export_form_id
+
+REQUEST_TIMEOUT = 120
+
+OPENING_MESSAGES = (
+    'Hi, what does this do?',
+    'How much does it cost?',
+    'Do you integrate with HubSpot?',
+    'We need something to qualify inbound leads faster, our team of 12 follows up manually.',
+    'Is there a free trial?',
+)
+FOLLOW_UP_MESSAGES = (
+    'What is included in the Growth plan?',
+    'Our current process is too slow and error prone.',
+    'We have a budget of $500 per month and want to roll out next quarter.',
+    'Can I book a demo for next week?',
+    'How does the Salesforce sync work?',
+    'ok thanks',
+    'Do you support SSO for larger teams?',
+)
+
+DEFAULT_MIX = {'track': 50, 'chat': 25, 'dashboard': 15, 'export': 10}
+
+
+class Recorder:
+    """Latencies and errors per endpoint label, collected only while recording is on"""
+
+    def __init__(self):
+        self.recording = False
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, label, seconds, ok):
+        if not self.recording:
+            return
+        with self._lock:
+            if ok:
+                self.samples[label].append(seconds)
+            else:
+                self.errors[label] += 1
+
+
+class TrafficConfig:
+    def __init__(self, mix=None, export_sizes=(), chat_turns=(2, 5), stream_share=0.5,
+                 submit_share=0.4, think_time=0.0, seed=0):
+        self.mix = mix or DEFAULT_MIX
+        self.export_sizes = list(export_sizes)
+        self.chat_turns = chat_turns
+        self.stream_share = stream_share
+        self.submit_share = submit_share
+        self.think_time = think_time
+        self.seed = seed
+
+
+class VirtualUser:
+    """Runs randomly picked scenarios back to back; each user has its own seeded RNG"""
+
+    def __init__(self, index, base_url, config, recorder):
+        self.base_url = base_url
+        self.config = config
+        self.recorder = recorder
+        self.rng = random.Random(config.seed * 100003 + index)
+        self.http = requests.Session()
+        self.scenarios = {
+            'track': self.track,
+            'chat': self.chat,
+            'dashboard': self.dashboard,
+            'export': self.export,
+        }
+
+    def run(self, stop_at):
+        names = [name for name, weight in self.config.mix.items() if weight > 0]
+        weights = [self.config.mix[name] for name in names]
+        while time.monotonic() < stop_at:
+            self.scenarios[self.rng.choices(names, weights)[0]]()
+            if self.config.think_time:
+                time.sleep(self.rng.uniform(0, 2 * self.config.think_time))
+
+    def track(self):
+        session_id = self._session_id()
+        events = [{'form_id': CHAT_FORM_ID, 'event_type': 'form_view', 'session_id': session_id}]
+        if self.rng.random() < 0.3:
+            events.append({'form_id': CHAT_FORM_ID, 'event_type': 'form_shown', 'session_id': session_id})
+
+        if len(events) == 1:
+            self._request('POST /api/analytics/track', 'POST', '/api/analytics/track', json=events[0])
+        else:
+            self._request('POST /api/analytics/track/batch', 'POST', '/api/analytics/track/batch', json={'events': events})
+
+    def chat(self):
+        session_id = self._session_id()
+        stream = self.rng.random() < self.config.stream_share
+        turns = self.rng.randint(*self.config.chat_turns)
+
+        for turn in range(turns):
+            message = self.rng.choice(OPENING_MESSAGES if turn == 0 else FOLLOW_UP_MESSAGES)
+            payload = {'session_id': session_id, 'message': message, 'stream': stream}
+            if stream:
+                ok = self._stream_chat(payload)
+            else:
+                ok = self._request('POST /api/chat/:formId', 'POST', f'/api/chat/{CHAT_FORM_ID}', json=payload)
+            if not ok:
+                return
+
+        if self.rng.random() < self.config.submit_share:
+            index = self.rng.getrandbits(32)
+            self._request('POST /api/chat/:formId/submit', 'POST', f'/api/chat/{CHAT_FORM_ID}/submit', json={
+                'session_id': session_id,
+                'data': {'name': f'Bench {index}', 'email': f'bench{index}@example.com', 'team_size': 12},
+            })
+
+    def dashboard(self):
+        headers = {'Authorization': BENCH_USER}
+        self._request('GET /api/analytics/dashboard', 'GET', '/api/analytics/dashboard', headers=headers)
+        self._request('GET /api/analytics/forms/:formId', 'GET', f'/api/analytics/forms/{CHAT_FORM_ID}', headers=headers)
+        self._request(
+            'GET /api/analytics/forms/:formId/timeseries', 'GET',
+            f'/api/analytics/forms/{CHAT_FORM_ID}/timeseries?granularity=hour&days=2', headers=headers
+        )
+
+    def export(self):
+        if not self.config.export_sizes:
+            return
+        size = self.rng.choice(self.config.export_sizes)
+        self._request(
+            f'GET /api/leads/export/:formId ({size} leads)', 'GET', f'/api/leads/export/{export_form_id(size)}',
+            headers={'Authorization': BENCH_USER}
+        )
+
+    def _stream_chat(self, payload):
+        """Records time to the first token and to the end of the stream separately"""
+        started = time.perf_counter()
+        first_token = None
+        ok = False
+        try:
+            with self.http.post(
+                f'{self.base_url}/api/chat/{CHAT_FORM_ID}', json=payload, stream=True, timeout=REQUEST_TIMEOUT
+            ) as response:
+                if response.status_code < 400:
+                    for line in response.iter_lines(decode_unicode=True):
+                        if line == 'event: token' and first_token is None:
+                            first_token = time.perf_counter() - started
+                        elif line == 'event: done':
+                            ok = True
+                        elif line.startswith('data:') and ok:
+                            # The done payload carries the saved reply
+                            json.loads(line[5:])
+                            break
+        except (requests.RequestException, ValueError) as e:
+            print(f"Benchmark Request Error: stream chat: {str(e)}")
+
+        self.recorder.record('POST /api/chat/:formId (stream)', time.perf_counter() - started, ok)
+        if first_token is not None:
+            self.recorder.record('POST /api/chat/:formId (stream, first token)', first_token, True)
+        return ok
+
+    def _request(self, label, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.http.request(method, f'{self.base_url}{path}', timeout=REQUEST_TIMEOUT, **kwargs)
+            # Exports stream, so the timing covers the whole body
+            response.content
+            ok = response.status_code < 400
+        except requests.RequestException as e:
+            print(f"Benchmark Request Error: {label}: {str(e)}")
+            ok = False
+        self.recorder.record(label, time.perf_counter() - started, ok)
+        return ok
+
+    def _session_id(self):
+        return f'bench-{self.rng.getrandbits(64):016x}'
+
+
+def drive(base_url, config, concurrency, duration, warmup=0):
+    """Run `concurrency` virtual users for warmup + duration seconds; returns (recorder, measured seconds)"""
+    recorder = Recorder()
+    stop_at = time.monotonic() + warmup + duration
+    users = [VirtualUser(index, base_url, config, recorder) for index in range(concurrency)]
+    threads = [
+        threading.Thread(target=user.run, args=(stop_at,), name=f'bench-user-{index}', daemon=True)
+        for index, user in enumerate(users)
+    ]
+    for thread in threads:
+        thread.start()
+
+    time.sleep(warmup)
+    recorder.recording = True
+    started = time.monotonic()
+    for thread in threads:
+        thread.join()
+    # Scenarios started before the deadline finish after it and are still counted
+    return recorder, time.monotonic() - started
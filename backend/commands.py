@@ -0,0 +1,110 @@
+import click
+from models import ChatMessage, ChatSession, Document, Form, QuestionCluster, QuestionClusterBand, db
+from services.retrieval import RetrievalService
+from services.rollups import rebuild_rollups
+from services.question_clusters import QuestionClusterService
+from services.lead_tags import rebuild_lead_tags
+from services.lead_analysis import lead_analysis
+
+
+def register_commands(app):
+    @app.cli.command('reindex-documents')
+    def reindex_documents():
+        """Rebuild retrieval chunks for every document and strip pasted copies from form context"""
+        retrieval_service = RetrievalService()
+        documents = Document.query.order_by(Document.created_at).all()
+
+        for document in documents:
+            retrieval_service.index_document(document)
+
+            # Uploads used to append the full document to form.context
+            form = Form.query.get(document.form_id)
+            if form and form.context and document.parsed_content:
+                for block in (
+                    f"\n\n--- Content from {document.filename} ---\n{document.parsed_content}",
+                    f"--- Content from {document.filename} ---\n{document.parsed_content}",
+                ):
+                    if block in form.context:
+                        form.context = form.context.replace(block, '', 1)
+                        break
+
+            db.session.commit()
+
+        click.echo(f"Reindexed {len(documents)} documents")
+
+    @app.cli.command('migrate-chat-messages')
+    @click.option('--batch-size', default=500, help='Sessions to migrate per transaction')
+    def migrate_chat_messages(batch_size):
+        """Move transcripts from the legacy ChatSession.messages blob into chat_messages rows"""
+        migrated = 0
+        last_id = ''
+        while True:
+            sessions = ChatSession.query.filter(
+                ChatSession.message_count == 0,
+                ChatSession.id > last_id
+            ).order_by(ChatSession.id).limit(batch_size).all()
+            if not sessions:
+                break
+
+            for chat_session in sessions:
+                if chat_session.migrate_legacy_messages():
+                    migrated += 1
+            last_id = sessions[-1].id
+            db.session.commit()
+
+        click.echo(f"Migrated {migrated} chat sessions")
+
+    @app.cli.command('backfill-rollups')
+    def backfill_rollups():
+        """Rebuild hourly and daily analytics rollups from the raw analytics table"""
+        from services.analytics_buffer import analytics_buffer
+
+        # Don't let events buffered in this process land between the rebuild and its commit
+        analytics_buffer.flush()
+        rebuild_rollups()
+        db.session.commit()
+
+        click.echo("Rebuilt analytics rollups")
+
+    @app.cli.command('backfill-question-clusters')
+    @click.option('--batch-size', default=1000, help='Messages to process per transaction')
+    def backfill_question_clusters(batch_size):
+        """Rebuild question clusters from every stored user message"""
+        question_clusters = QuestionClusterService()
+
+        QuestionClusterBand.query.delete()
+        QuestionCluster.query.delete()
+        db.session.commit()
+
+        processed = 0
+        last_id = 0
+        while True:
+            rows = db.session.query(ChatMessage.id, ChatMessage.content, ChatSession.form_id).join(
+                ChatSession, ChatMessage.session_id == ChatSession.id
+            ).filter(
+                ChatMessage.role == 'user',
+                ChatMessage.id > last_id
+            ).order_by(ChatMessage.id).limit(batch_size).all()
+            if not rows:
+                break
+
+            for message_id, content, form_id in rows:
+                question_clusters.record(form_id, content)
+            last_id = rows[-1][0]
+            processed += len(rows)
+            db.session.commit()
+
+        click.echo(f"Processed {processed} user messages")
+
+    @app.cli.command('backfill-lead-tags')
+    def backfill_lead_tags():
+        """Rebuild lead tag rows and per-form counters from existing leads"""
+        processed = rebuild_lead_tags()
+        db.session.commit()
+        click.echo(f"Tagged {processed} leads")
+
+    @app.cli.command('analyze-leads')
+    def analyze_leads():
+        """Run the background analysis for every queued lead, e.g. with LEAD_ANALYSIS_WORKERS=0"""
+        processed = lead_analysis.process_pending()
+        click.echo(f"Analyzed {processed} leads")
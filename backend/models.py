@@ -15,11 +15,17 @@ class Form(db.Model):
     context_documents = db.Column(db.JSON)
     template_type = db.Column(db.String(50))
     embed_settings = db.Column(db.JSON, nullable=False)
+    ai_settings = db.Column(db.JSON, default=dict)
+    # Bumped whenever the form's document chunks change; keys the cached retrieval index
+    retrieval_version = db.Column(db.Integer, nullable=False, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     leads = db.relationship('Lead', backref='form', lazy=True, cascade='all, delete-orphan')
     analytics = db.relationship('Analytics', backref='form', lazy=True, cascade='all, delete-orphan')
+    analytics_rollups = db.relationship('AnalyticsRollup', lazy=True, cascade='all, delete-orphan')
+    question_clusters = db.relationship('QuestionCluster', lazy=True, cascade='all, delete-orphan')
+    lead_tag_counts = db.relationship('LeadTagCount', lazy=True, cascade='all, delete-orphan')
     
     def to_dict(self):
         return {
@@ -33,6 +39,7 @@ class Form(db.Model):
             'context_documents': self.context_documents,
             'template_type': self.template_type,
             'embed_settings': self.embed_settings,
+            'ai_settings': self.ai_settings or {},
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
         }
@@ -40,6 +47,15 @@ class Form(db.Model):
 
 class Lead(db.Model):
     __tablename__ = 'leads'
+    __table_args__ = (
+        db.Index('ix_leads_form_id_created_at_id', 'form_id', 'created_at', 'id'),
+        db.Index('ix_leads_analysis_status_created_at', 'analysis_status', 'created_at'),
+    )
+    
+    FIELDS = (
+        'id', 'form_id', 'session_id', 'contact_info', 'responses', 'conversation_history',
+        'pain_points', 'buying_signals', 'qualification_level', 'analysis_status', 'created_at',
+    )
     
     id = db.Column(db.String(50), primary_key=True)
     form_id = db.Column(db.String(50), db.ForeignKey('forms.id'), nullable=False)
@@ -50,46 +66,164 @@ class Lead(db.Model):
     pain_points = db.Column(db.JSON, default=list)
     buying_signals = db.Column(db.JSON, default=list)
     qualification_level = db.Column(db.String(20), default='cold')
+    # pending, processing, completed, failed; pending leads are the analysis queue
+    analysis_status = db.Column(db.String(20), nullable=False, default='completed')
+    analysis_attempts = db.Column(db.Integer, nullable=False, default=0)
+    analysis_error = db.Column(db.Text)
+    analysis_claimed_at = db.Column(db.DateTime)
+    analyzed_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    tags = db.relationship('LeadTag', backref='lead', lazy=True, cascade='all, delete-orphan')
+    
+    def to_dict(self, fields=None):
+        # Only touch the requested columns so deferred ones are never loaded
+        data = {}
+        for field in fields or self.FIELDS:
+            value = getattr(self, field)
+            data[field] = value.isoformat() if field == 'created_at' else value
+        return data
+
+
+class LeadTag(db.Model):
+    __tablename__ = 'lead_tags'
+    __table_args__ = (
+        db.Index('ix_lead_tags_form_id_kind_value', 'form_id', 'kind', 'value'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    lead_id = db.Column(db.String(50), db.ForeignKey('leads.id'), nullable=False, index=True)
+    form_id = db.Column(db.String(50), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)  # pain_point or buying_signal
+    value = db.Column(db.String(255), nullable=False)
+
+
+class LeadTagCount(db.Model):
+    __tablename__ = 'lead_tag_counts'
+    __table_args__ = (
+        db.UniqueConstraint('form_id', 'kind', 'value', name='uq_lead_tag_counts_key'),
+        db.Index('ix_lead_tag_counts_form_id_kind_count', 'form_id', 'kind', 'count'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    form_id = db.Column(db.String(50), db.ForeignKey('forms.id'), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)
+    value = db.Column(db.String(255), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class Document(db.Model):
+    __tablename__ = 'documents'
+    
+    id = db.Column(db.String(50), primary_key=True)
+    form_id = db.Column(db.String(50), db.ForeignKey('forms.id'), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    file_type = db.Column(db.String(50), nullable=False)
+    file_path = db.Column(db.String(500), nullable=False)
+    # Shared blob; null for documents uploaded before content addressing
+    content_hash = db.Column(db.String(64), db.ForeignKey('stored_files.content_hash'), index=True)
+    parsed_content = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    chunks = db.relationship('DocumentChunk', backref='document', lazy=True, cascade='all, delete-orphan')
+    
     def to_dict(self):
         return {
             'id': self.id,
             'form_id': self.form_id,
-            'session_id': self.session_id,
-            'contact_info': self.contact_info,
-            'responses': self.responses,
-            'conversation_history': self.conversation_history,
-            'pain_points': self.pain_points,
-            'buying_signals': self.buying_signals,
-            'qualification_level': self.qualification_level,
+            'filename': self.filename,
+            'file_type': self.file_type,
+            'content_hash': self.content_hash,
             'created_at': self.created_at.isoformat(),
         }
 
 
-class Document(db.Model):
-    __tablename__ = 'documents'
+class StoredFile(db.Model):
+    __tablename__ = 'stored_files'
+    
+    content_hash = db.Column(db.String(64), primary_key=True)  # SHA-256 of the file bytes
+    file_path = db.Column(db.String(500), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ParsedContentCache(db.Model):
+    __tablename__ = 'parsed_content_cache'
+    __table_args__ = (
+        db.UniqueConstraint('content_hash', 'parser_version', 'file_type', name='uq_parsed_content_cache_key'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)
+    parser_version = db.Column(db.String(20), nullable=False)
+    file_type = db.Column(db.String(50), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class DocumentJob(db.Model):
+    __tablename__ = 'document_jobs'
     
     id = db.Column(db.String(50), primary_key=True)
-    form_id = db.Column(db.String(50), db.ForeignKey('forms.id'), nullable=False)
+    form_id = db.Column(db.String(50), db.ForeignKey('forms.id'), nullable=False, index=True)
+    # Assigned up front; the Document row is created with this id when parsing completes
+    document_id = db.Column(db.String(50), nullable=False)
     filename = db.Column(db.String(255), nullable=False)
     file_type = db.Column(db.String(50), nullable=False)
     file_path = db.Column(db.String(500), nullable=False)
-    parsed_content = db.Column(db.Text)
+    content_hash = db.Column(db.String(64))
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, processing, completed, failed
+    progress = db.Column(db.Float, nullable=False, default=0)
+    # Claims so far; a job whose worker keeps dying fails after INGESTION_MAX_ATTEMPTS
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def to_dict(self):
         return {
             'id': self.id,
             'form_id': self.form_id,
+            'document_id': self.document_id,
             'filename': self.filename,
             'file_type': self.file_type,
+            'status': self.status,
+            'progress': self.progress,
+            'attempts': self.attempts,
+            'error': self.error,
             'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat(),
+        }
+
+
+class DocumentChunk(db.Model):
+    __tablename__ = 'document_chunks'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    form_id = db.Column(db.String(50), db.ForeignKey('forms.id'), nullable=False, index=True)
+    document_id = db.Column(db.String(50), db.ForeignKey('documents.id'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    token_count = db.Column(db.Integer, nullable=False)
+    term_counts = db.Column(db.JSON, nullable=False)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'form_id': self.form_id,
+            'document_id': self.document_id,
+            'position': self.position,
+            'content': self.content,
+            'token_count': self.token_count,
         }
 
 
 class Analytics(db.Model):
     __tablename__ = 'analytics'
+    __table_args__ = (
+        db.Index('ix_analytics_form_id_timestamp', 'form_id', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     form_id = db.Column(db.String(50), db.ForeignKey('forms.id'), nullable=False)
@@ -109,25 +243,140 @@ class Analytics(db.Model):
         }
 
 
+class AnalyticsRollup(db.Model):
+    __tablename__ = 'analytics_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('form_id', 'event_type', 'granularity', 'bucket', name='uq_analytics_rollups_key'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    form_id = db.Column(db.String(50), db.ForeignKey('forms.id'), nullable=False)
+    event_type = db.Column(db.String(50), nullable=False)
+    granularity = db.Column(db.String(10), nullable=False)  # hour or day
+    bucket = db.Column(db.DateTime, nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def to_dict(self):
+        return {
+            'form_id': self.form_id,
+            'event_type': self.event_type,
+            'granularity': self.granularity,
+            'bucket': self.bucket.isoformat(),
+            'count': self.count,
+        }
+
+
+class QuestionCluster(db.Model):
+    __tablename__ = 'question_clusters'
+    __table_args__ = (
+        db.Index('ix_question_clusters_form_id_count', 'form_id', 'count'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    form_id = db.Column(db.String(50), db.ForeignKey('forms.id'), nullable=False)
+    representative = db.Column(db.Text, nullable=False)
+    signature = db.Column(db.JSON, nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    last_seen_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    bands = db.relationship('QuestionClusterBand', lazy=True, cascade='all, delete-orphan')
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'form_id': self.form_id,
+            'question': self.representative,
+            'count': self.count,
+            'last_seen_at': self.last_seen_at.isoformat(),
+        }
+
+
+class QuestionClusterBand(db.Model):
+    __tablename__ = 'question_cluster_bands'
+    __table_args__ = (
+        db.Index('ix_question_cluster_bands_form_id_band_key', 'form_id', 'band_key'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    form_id = db.Column(db.String(50), nullable=False)
+    band_key = db.Column(db.String(32), nullable=False)
+    cluster_id = db.Column(db.Integer, db.ForeignKey('question_clusters.id'), nullable=False)
+
+
 class ChatSession(db.Model):
     __tablename__ = 'chat_sessions'
     
     id = db.Column(db.String(50), primary_key=True)
-    form_id = db.Column(db.String(50), db.ForeignKey('forms.id'), nullable=False)
+    form_id = db.Column(db.String(50), db.ForeignKey('forms.id'), nullable=False, index=True)
     session_id = db.Column(db.String(100), nullable=False, unique=True)
+    # Legacy transcript blob, superseded by chat_messages rows
     messages = db.Column(db.JSON, default=list)
+    message_count = db.Column(db.Integer, nullable=False, default=0)
     context_data = db.Column(db.JSON, default=dict)
     started_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_activity = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    chat_messages = db.relationship('ChatMessage', backref='chat_session', lazy='dynamic',
+                                    order_by='ChatMessage.seq', cascade='all, delete-orphan')
+    
+    def add_message(self, role, content, session=None):
+        """
+        Append one message row; the session only bumps its counter.
+        Pass session to add it to a session other than db.session.
+        """
+        message = ChatMessage(
+            session_id=self.id,
+            seq=self.message_count or 0,
+            role=role,
+            content=content
+        )
+        self.message_count = message.seq + 1
+        (session or db.session).add(message)
+        return message
+    
+    def get_messages(self, since_seq=0):
+        """Message dicts in order, starting at the given sequence number"""
+        return [row.to_dict() for row in self.chat_messages.filter(ChatMessage.seq >= since_seq)]
+    
+    def migrate_legacy_messages(self, session=None):
+        """Move messages from the old JSON blob into chat_messages rows"""
+        if not self.messages or self.message_count:
+            return False
+        for msg in self.messages:
+            message = self.add_message(msg['role'], msg['content'], session)
+            if msg.get('timestamp'):
+                message.created_at = datetime.fromisoformat(msg['timestamp'])
+        self.messages = []
+        return True
+    
     def to_dict(self):
         return {
             'id': self.id,
             'form_id': self.form_id,
             'session_id': self.session_id,
-            'messages': self.messages,
+            'messages': self.get_messages(),
             'context_data': self.context_data,
             'started_at': self.started_at.isoformat(),
             'last_activity': self.last_activity.isoformat(),
         }
 
+
+class ChatMessage(db.Model):
+    __tablename__ = 'chat_messages'
+    __table_args__ = (
+        db.UniqueConstraint('session_id', 'seq', name='uq_chat_messages_session_seq'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.String(50), db.ForeignKey('chat_sessions.id'), nullable=False)
+    seq = db.Column(db.Integer, nullable=False)
+    role = db.Column(db.String(20), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'role': self.role,
+            'content': self.content,
+            'timestamp': (self.created_at or datetime.utcnow()).isoformat(),
+        }
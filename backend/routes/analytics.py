@@ -1,63 +1,67 @@
 from flask import Blueprint, request, jsonify
-from models import Analytics, Lead, Form, db
+from models import Analytics, Lead, Form, ChatSession, db
 from sqlalchemy import func
+from sqlalchemy.orm import load_only
 from datetime import datetime, timedelta
+from services.analytics_buffer import analytics_buffer
+from services.rollups import avg_completion_time, event_counts
+from services import analytics_engine
+from services.question_clusters import QuestionClusterService
+from services.lead_tags import top_tags
 
 analytics_bp = Blueprint('analytics', __name__)
 
+MAX_BATCH_EVENTS = 500
+TIMESERIES_GRANULARITIES = ('hour', 'day')
+MAX_LIVE_SESSIONS = 100
+
+question_clusters = QuestionClusterService()
+
+def event_error(event):
+    """Why a tracked event can't be stored, checked against the Analytics columns; None if it can"""
+    if not isinstance(event, dict):
+        return 'Every event must be an object'
+    for field, required in (('form_id', True), ('event_type', True), ('session_id', False)):
+        value = event.get(field)
+        if value is None and not required:
+            continue
+        if not isinstance(value, str) or not value:
+            return f'{field} must be a non-empty string'
+        max_length = getattr(Analytics, field).type.length
+        if len(value) > max_length:
+            return f'{field} must be at most {max_length} characters'
+    if not isinstance(event.get('event_data') or {}, dict):
+        return 'event_data must be an object'
+    return None
+
 @analytics_bp.route('/forms/<form_id>', methods=['GET'])
 def get_form_analytics(form_id):
     # Get time range (default: last 30 days)
     days = request.args.get('days', 30, type=int)
     start_date = datetime.utcnow() - timedelta(days=days)
     
-    # Total views (form loads)
-    total_views = Analytics.query.filter(
-        Analytics.form_id == form_id,
-        Analytics.event_type == 'form_view',
-        Analytics.timestamp >= start_date
-    ).count()
-    
-    # Total completions
-    total_completions = Analytics.query.filter(
-        Analytics.form_id == form_id,
-        Analytics.event_type == 'form_completed',
-        Analytics.timestamp >= start_date
-    ).count()
+    # Total views (form loads) and completions from the hourly rollups
+    counts = event_counts([form_id], ['form_view', 'form_completed'], start_date)
+    total_views = counts['form_view']
+    total_completions = counts['form_completed']
     
     # Calculate rates
     completion_rate = total_completions / total_views if total_views > 0 else 0
     drop_off_rate = 1 - completion_rate
     
-    # Average completion time (mock for now - would need to track session durations)
-    avg_completion_time = 120  # seconds
-    
-    # Top questions asked
-    message_events = Analytics.query.filter(
-        Analytics.form_id == form_id,
-        Analytics.event_type == 'message_sent',
-        Analytics.timestamp >= start_date
-    ).all()
-    
-    # Mock top questions (in production, extract from actual messages)
-    top_questions = [
-        {'question': 'What are your pricing plans?', 'count': 15},
-        {'question': 'Do you offer a free trial?', 'count': 12},
-        {'question': 'How long does implementation take?', 'count': 10},
-        {'question': 'What integrations do you support?', 'count': 8},
-        {'question': 'Can I cancel anytime?', 'count': 6},
-    ]
+    # Session funnel from the raw events, cached per worker
+    report = analytics_engine.report_cache.get(('form', form_id, days), lambda: {
+        **analytics_engine.funnel([form_id], start_date),
+        'avg_session_duration': analytics_engine.avg_session_duration([form_id], start_date)
+    })
     
-    # Common objections (extracted from leads)
-    leads = Lead.query.filter_by(form_id=form_id).all()
-    objections = {}
-    for lead in leads:
-        for pain_point in lead.pain_points:
-            objections[pain_point] = objections.get(pain_point, 0) + 1
+    # Top questions from the precomputed clusters (all-time counts)
+    top_questions = question_clusters.top_questions(form_id)
     
+    # Common objections from the per-form pain point counters
     common_objections = [
         {'objection': obj, 'count': count}
-        for obj, count in sorted(objections.items(), key=lambda x: x[1], reverse=True)[:5]
+        for obj, count in top_tags(form_id, 'pain_point')
     ]
     
     return jsonify({
@@ -66,11 +70,68 @@ def get_form_analytics(form_id):
         'total_completions': total_completions,
         'completion_rate': completion_rate,
         'drop_off_rate': drop_off_rate,
-        'avg_completion_time': avg_completion_time,
+        'avg_completion_time': avg_completion_time([form_id], start_date),
+        'median_completion_time': report['median_completion_time'],
+        'avg_session_duration': report['avg_session_duration'],
+        'funnel': report['steps'],
         'top_questions': top_questions,
         'common_objections': common_objections
     })
 
+@analytics_bp.route('/forms/<form_id>/timeseries', methods=['GET'])
+def get_form_timeseries(form_id):
+    days = request.args.get('days', 30, type=int)
+    granularity = request.args.get('granularity', 'day')
+    
+    if granularity not in TIMESERIES_GRANULARITIES:
+        return jsonify({'error': f'granularity must be one of {", ".join(TIMESERIES_GRANULARITIES)}'}), 400
+    
+    start_date = datetime.utcnow() - timedelta(days=days)
+    
+    return jsonify({
+        'form_id': form_id,
+        'granularity': granularity,
+        'buckets': analytics_engine.report_cache.get(
+            ('timeseries', form_id, days, granularity),
+            lambda: analytics_engine.funnel_timeseries([form_id], start_date, granularity)
+        )
+    })
+
+@analytics_bp.route('/forms/<form_id>/live', methods=['GET'])
+def get_live_sessions(form_id):
+    """Provisional qualification of recently active conversations"""
+    minutes = request.args.get('minutes', 30, type=int)
+    since = datetime.utcnow() - timedelta(minutes=minutes)
+    
+    chat_sessions = ChatSession.query.options(
+        load_only(ChatSession.session_id, ChatSession.message_count, ChatSession.context_data, ChatSession.last_activity)
+    ).filter(
+        ChatSession.form_id == form_id,
+        ChatSession.last_activity >= since
+    ).order_by(ChatSession.last_activity.desc()).limit(MAX_LIVE_SESSIONS).all()
+    
+    sessions = []
+    qualification = {'hot': 0, 'warm': 0, 'cold': 0}
+    for chat_session in chat_sessions:
+        insights = (chat_session.context_data or {}).get('insights') or {}
+        level = insights.get('qualification_level')
+        if level in qualification:
+            qualification[level] += 1
+        sessions.append({
+            'session_id': chat_session.session_id,
+            'message_count': chat_session.message_count,
+            'qualification_level': level,
+            'pain_points': insights.get('pain_points', []),
+            'buying_signals': insights.get('buying_signals', []),
+            'last_activity': chat_session.last_activity.isoformat()
+        })
+    
+    return jsonify({
+        'form_id': form_id,
+        'qualification': qualification,
+        'sessions': sessions
+    })
+
 @analytics_bp.route('/dashboard', methods=['GET'])
 def get_dashboard_stats():
     # Get user's forms
@@ -90,17 +151,9 @@ def get_dashboard_stats():
     days = 30
     start_date = datetime.utcnow() - timedelta(days=days)
     
-    total_views = Analytics.query.filter(
-        Analytics.form_id.in_(form_ids),
-        Analytics.event_type == 'form_view',
-        Analytics.timestamp >= start_date
-    ).count()
-    
-    total_completions = Analytics.query.filter(
-        Analytics.form_id.in_(form_ids),
-        Analytics.event_type == 'form_completed',
-        Analytics.timestamp >= start_date
-    ).count()
+    counts = event_counts(form_ids, ['form_view', 'form_completed'], start_date)
+    total_views = counts['form_view']
+    total_completions = counts['form_completed']
     
     completion_rate = total_completions / total_views if total_views > 0 else 0
     
@@ -108,24 +161,56 @@ def get_dashboard_stats():
         'total_views': total_views,
         'total_completions': total_completions,
         'completion_rate': completion_rate,
-        'avg_completion_time': 120,
+        'avg_completion_time': avg_completion_time(form_ids, start_date),
         'total_forms': len(user_forms),
         'total_leads': Lead.query.filter(Lead.form_id.in_(form_ids)).count()
     })
 
 @analytics_bp.route('/track', methods=['POST'])
 def track_event():
-    data = request.get_json()
+    data = request.get_json(silent=True)
+    
+    error = event_error(data)
+    if error:
+        return jsonify({'error': error}), 400
     
-    analytics = Analytics(
+    # Buffered and written in bulk by the flush thread
+    analytics_buffer.add(
         form_id=data.get('form_id'),
         event_type=data.get('event_type'),
         event_data=data.get('event_data', {}),
         session_id=data.get('session_id')
     )
     
-    db.session.add(analytics)
-    db.session.commit()
-    
     return jsonify({'success': True}), 201
 
+@analytics_bp.route('/track/batch', methods=['POST'])
+def track_events():
+    data = request.get_json()
+    events = data.get('events', []) if isinstance(data, dict) else data
+    
+    if not isinstance(events, list) or not events:
+        return jsonify({'error': 'events must be a non-empty list'}), 400
+    
+    if len(events) > MAX_BATCH_EVENTS:
+        return jsonify({'error': f'At most {MAX_BATCH_EVENTS} events per batch'}), 400
+    
+    for index, event in enumerate(events):
+        error = event_error(event)
+        if error:
+            return jsonify({'error': f'Event {index}: {error}'}), 400
+    
+    now = datetime.utcnow()
+    analytics_buffer.add_many([
+        {
+            'form_id': e['form_id'],
+            'event_type': e['event_type'],
+            'event_data': e.get('event_data', {}),
+            'session_id': e.get('session_id'),
+            'timestamp': now
+        }
+        for e in events
+    ])
+    
+    return jsonify({'success': True, 'accepted': len(events)}), 202
+
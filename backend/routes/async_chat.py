@@ -0,0 +1,196 @@
+from quart import Blueprint, request, jsonify, Response, abort
+from sqlalchemy import select
+from models import ChatSession, ChatMessage
+from services.async_ai_service import AsyncAIService
+from services.async_db import async_session
+from services.analytics_buffer import analytics_buffer
+from services.lead_analysis import lead_analysis
+from services.lead_insights import lead_insights
+from services.lead_tags import record_lead_tags
+from services.form_cache import form_cache
+from services.answer_cache import answer_cache
+from services.model_router import model_router
+from services.question_clusters import question_recorder
+from routes.chat import (
+    STREAM_ERROR_MESSAGE, generate_id, format_sse, save_ai_response, build_lead, precomputed_insights,
+    completion_event_data
+)
+
+# Same endpoints as routes/chat.py for the ASGI app (see asgi.py). Requests
+# await OpenAI and the async engine instead of holding a worker thread.
+async_chat_bp = Blueprint('async_chat', __name__)
+
+ai_service = AsyncAIService()
+
+def wants_stream(data):
+    return bool(data.get('stream')) or 'text/event-stream' in request.headers.get('Accept', '')
+
+async def get_chat_session(session, session_id):
+    chat_session = await session.scalar(
+        select(ChatSession).where(ChatSession.session_id == session_id)
+    )
+    if chat_session:
+        chat_session.migrate_legacy_messages(session)
+    return chat_session
+
+async def get_messages(session, chat_session, since_seq=0):
+    rows = await session.scalars(
+        select(ChatMessage).where(
+            ChatMessage.session_id == chat_session.id,
+            ChatMessage.seq >= since_seq
+        ).order_by(ChatMessage.seq)
+    )
+    return [row.to_dict() for row in rows]
+
+async def load_history(session, chat_session):
+    summary_state = (chat_session.context_data or {}).get('history_summary') or {}
+    offset = summary_state.get('message_count', 0)
+    return await get_messages(session, chat_session, offset), offset
+
+@async_chat_bp.route('/<form_id>', methods=['POST'])
+async def send_message(form_id):
+    data = await request.get_json()
+    session_id = data.get('session_id')
+    message = data.get('message')
+    context = data.get('context', {})
+
+    async with async_session() as session:
+        form = await form_cache.get_async(form_id, session)
+        if form is None:
+            abort(404)
+
+        chat_session = await get_chat_session(session, session_id)
+        if not chat_session:
+            chat_session = ChatSession(
+                id=generate_id(),
+                form_id=form_id,
+                session_id=session_id,
+                messages=[],
+                message_count=0,
+                context_data=context
+            )
+            session.add(chat_session)
+
+        chat_session.add_message('user', message, session)
+
+        analytics_buffer.add(
+            form_id=form_id,
+            event_type='message_sent',
+            event_data={'message_length': len(message)},
+            session_id=session_id
+        )
+
+        history, history_offset = await load_history(session, chat_session)
+
+        # Commit the user turn so no connection is held while OpenAI answers
+        await session.commit()
+
+        # Counted towards the form's top questions on the background thread
+        question_recorder.add(form_id, message)
+
+        if wants_stream(data):
+            return stream_message(form, chat_session, message, history, history_offset)
+
+        ai_response = await ai_service.generate_response(
+            form=form,
+            conversation_history=history,
+            user_message=message,
+            context_data=chat_session.context_data,
+            history_offset=history_offset
+        )
+
+        save_ai_response(chat_session, ai_response, session)
+        await session.commit()
+
+    lead_insights.schedule(form, chat_session.id)
+
+    return jsonify({
+        'message': ai_response['message'],
+        'show_form': ai_response.get('show_form', False),
+        'extracted_data': ai_response.get('extracted_data', {})
+    })
+
+def stream_message(form, chat_session, message, history, history_offset):
+    """Server-Sent Events, as in routes/chat.py; the reply is saved in a new session"""
+    async def generate():
+        events = ai_service.stream_response(
+            form=form,
+            conversation_history=history,
+            user_message=message,
+            context_data=chat_session.context_data,
+            history_offset=history_offset
+        )
+
+        try:
+            async for event, payload in events:
+                if event == 'token':
+                    yield format_sse('token', {'content': payload})
+                    continue
+
+                async with async_session() as session:
+                    session.add(chat_session)
+                    save_ai_response(chat_session, payload, session)
+                    await session.commit()
+                lead_insights.schedule(form, chat_session.id)
+
+                yield format_sse('done', {
+                    'message': payload['message'],
+                    'show_form': payload.get('show_form', False),
+                    'extracted_data': payload.get('extracted_data', {})
+                })
+        except Exception as e:
+            print(f"Chat Stream Error: {str(e)}")
+            yield format_sse('error', {'message': STREAM_ERROR_MESSAGE})
+
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+@async_chat_bp.route('/<form_id>/submit', methods=['POST'])
+async def submit_form(form_id):
+    data = await request.get_json()
+    session_id = data.get('session_id')
+    form_data = data.get('data', {})
+
+    async with async_session() as session:
+        chat_session = await get_chat_session(session, session_id)
+        conversation_history = await get_messages(session, chat_session) if chat_session else []
+
+        form = await form_cache.get_async(form_id, session)
+        insights = precomputed_insights(form, chat_session, conversation_history, form_data)
+
+        # Saved right away; without complete running insights the analysis follows in the background
+        lead = build_lead(form_id, session_id, form_data, conversation_history, insights)
+        session.add(lead)
+        if insights:
+            # The sync tag helpers run on this session, so the counters commit with the lead
+            await session.run_sync(lambda sync_session: record_lead_tags(lead, sync_session))
+        await session.commit()
+
+    if not insights:
+        lead_analysis.notify()
+
+    analytics_buffer.add(
+        form_id=form_id,
+        event_type='form_completed',
+        event_data=completion_event_data(chat_session, form_data),
+        session_id=session_id
+    )
+
+    return jsonify(lead.to_dict()), 201
+
+@async_chat_bp.route('/cache-stats', methods=['GET'])
+async def cache_stats():
+    return jsonify({
+        'answers': answer_cache.stats(),
+        'forms': {'hits': form_cache.hits, 'misses': form_cache.misses}
+    })
+
+@async_chat_bp.route('/routing-stats', methods=['GET'])
+async def routing_stats():
+    return jsonify(model_router.stats())
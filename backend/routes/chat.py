@@ -1,16 +1,102 @@
-from flask import Blueprint, request, jsonify
-from models import Form, Lead, ChatSession, Analytics, db
+from flask import Blueprint, request, jsonify, Response, stream_with_context, abort
+from models import Form, Lead, ChatSession, db
 from services.ai_service import AIService
+from services.analytics_buffer import analytics_buffer
+from services.question_clusters import question_recorder
+from services.lead_analysis import lead_analysis
+from services.lead_insights import lead_insights, session_insights, covers_transcript
+from services.lead_tags import record_lead_tags
+from services.lead_signals import lead_signals
+from services.form_cache import form_cache
+from services.answer_cache import answer_cache
+from services.model_router import model_router
 from datetime import datetime
+import json
 import uuid
 
 chat_bp = Blueprint('chat', __name__)
 
 ai_service = AIService()
 
+STREAM_ERROR_MESSAGE = 'The reply was interrupted. Please try again.'
+
 def generate_id():
     return str(uuid.uuid4())
 
+def wants_stream(data):
+    return bool(data.get('stream')) or 'text/event-stream' in request.headers.get('Accept', '')
+
+def format_sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+def load_history(chat_session):
+    """
+    Load only the messages not yet folded into the history summary.
+    Returns the messages and how many earlier messages were skipped.
+    """
+    summary_state = (chat_session.context_data or {}).get('history_summary') or {}
+    offset = summary_state.get('message_count', 0)
+    return chat_session.get_messages(since_seq=offset), offset
+
+def save_ai_response(chat_session, ai_response, session=None):
+    """Add the reply to the session's transcript; pass session when not using db.session"""
+    chat_session.add_message('assistant', ai_response['message'], session)
+    
+    # Update context data
+    context_data = {**(chat_session.context_data or {}), **ai_response.get('extracted_data', {})}
+    if ai_response.get('history_summary'):
+        context_data['history_summary'] = ai_response['history_summary']
+    
+    # Record the funnel step the first time the form is offered
+    if ai_response.get('show_form') and not context_data.get('form_shown'):
+        context_data['form_shown'] = True
+        analytics_buffer.add(
+            form_id=chat_session.form_id,
+            event_type='form_shown',
+            session_id=chat_session.session_id
+        )
+    
+    chat_session.context_data = context_data
+    
+    chat_session.last_activity = datetime.utcnow()
+
+def build_lead(form_id, session_id, form_data, conversation_history, insights=None):
+    """New lead; without insights it is queued for background analysis"""
+    insights = insights or {}
+    return Lead(
+        id=generate_id(),
+        form_id=form_id,
+        session_id=session_id,
+        contact_info={
+            'name': form_data.get('name'),
+            'email': form_data.get('email'),
+            'phone': form_data.get('phone')
+        },
+        responses=form_data,
+        conversation_history=conversation_history,
+        pain_points=insights.get('pain_points', []),
+        buying_signals=insights.get('buying_signals', []),
+        qualification_level=insights.get('qualification_level', 'cold'),
+        analysis_status='completed' if insights else 'pending'
+    )
+
+def completion_event_data(chat_session, form_data):
+    """form_completed payload; the time since the chat started feeds the dashboard rollups"""
+    event_data = {'fields_count': len(form_data)}
+    if chat_session and chat_session.started_at:
+        event_data['completion_seconds'] = round((datetime.utcnow() - chat_session.started_at).total_seconds())
+    return event_data
+
+def precomputed_insights(form, chat_session, conversation_history, form_data):
+    """
+    Insights that make the model analysis at submission unnecessary: running
+    insights covering the whole conversation, or a clear-cut rule-based score
+    """
+    insights = session_insights(chat_session)
+    if covers_transcript(insights, len(conversation_history)):
+        return insights
+    return lead_signals.clear_cut_insights(form, conversation_history, form_data)
+
 @chat_bp.route('/<form_id>', methods=['POST'])
 def send_message(form_id):
     data = request.get_json()
@@ -18,8 +104,10 @@ def send_message(form_id):
     message = data.get('message')
     context = data.get('context', {})
     
-    # Get form
-    form = Form.query.get_or_404(form_id)
+    # Get form (cached snapshot, no DB round trip on a hit)
+    form = form_cache.get(form_id)
+    if form is None:
+        abort(404)
     
     # Get or create chat session
     chat_session = ChatSession.query.filter_by(session_id=session_id).first()
@@ -29,50 +117,47 @@ def send_message(form_id):
             form_id=form_id,
             session_id=session_id,
             messages=[],
+            message_count=0,
             context_data=context
         )
         db.session.add(chat_session)
+    else:
+        chat_session.migrate_legacy_messages()
     
     # Add user message to history
-    user_message = {
-        'role': 'user',
-        'content': message,
-        'timestamp': datetime.utcnow().isoformat()
-    }
-    chat_session.messages.append(user_message)
-    
-    # Get AI response
-    ai_response = ai_service.generate_response(
-        form=form,
-        conversation_history=chat_session.messages,
-        user_message=message,
-        context_data=chat_session.context_data
-    )
-    
-    # Add AI message to history
-    ai_message = {
-        'role': 'assistant',
-        'content': ai_response['message'],
-        'timestamp': datetime.utcnow().isoformat()
-    }
-    chat_session.messages.append(ai_message)
+    chat_session.add_message('user', message)
     
-    # Update context data
-    if 'extracted_data' in ai_response:
-        chat_session.context_data.update(ai_response['extracted_data'])
-    
-    chat_session.last_activity = datetime.utcnow()
+    # Count it towards the form's top questions, on the background thread
+    question_recorder.add(form_id, message)
     
-    # Track analytics
-    analytics = Analytics(
+    # Track analytics outside the chat transaction
+    analytics_buffer.add(
         form_id=form_id,
         event_type='message_sent',
         event_data={'message_length': len(message)},
         session_id=session_id
     )
-    db.session.add(analytics)
+    
+    if wants_stream(data):
+        # Persist the user turn before the first token goes out
+        db.session.commit()
+        return stream_message(form, chat_session, message)
+    
+    history, history_offset = load_history(chat_session)
+    
+    # Get AI response
+    ai_response = ai_service.generate_response(
+        form=form,
+        conversation_history=history,
+        user_message=message,
+        context_data=chat_session.context_data,
+        history_offset=history_offset
+    )
+    
+    save_ai_response(chat_session, ai_response)
     
     db.session.commit()
+    lead_insights.schedule(form, chat_session.id)
     
     return jsonify({
         'message': ai_response['message'],
@@ -80,6 +165,53 @@ def send_message(form_id):
         'extracted_data': ai_response.get('extracted_data', {})
     })
 
+def stream_message(form, chat_session, message):
+    """
+    Forward tokens to the client as Server-Sent Events.
+    Emits a `token` event per chunk and a final `done` event carrying
+    show_form and extracted_data; the reply is persisted once complete.
+    If the reply fails after tokens were sent, an `error` event ends the
+    stream instead and nothing is saved.
+    """
+    def generate():
+        try:
+            history, history_offset = load_history(chat_session)
+            events = ai_service.stream_response(
+                form=form,
+                conversation_history=history,
+                user_message=message,
+                context_data=chat_session.context_data,
+                history_offset=history_offset
+            )
+            
+            for event, payload in events:
+                if event == 'token':
+                    yield format_sse('token', {'content': payload})
+                    continue
+                
+                save_ai_response(chat_session, payload)
+                db.session.commit()
+                lead_insights.schedule(form, chat_session.id)
+                
+                yield format_sse('done', {
+                    'message': payload['message'],
+                    'show_form': payload.get('show_form', False),
+                    'extracted_data': payload.get('extracted_data', {})
+                })
+        except Exception as e:
+            print(f"Chat Stream Error: {str(e)}")
+            db.session.rollback()
+            yield format_sse('error', {'message': STREAM_ERROR_MESSAGE})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
 @chat_bp.route('/<form_id>/submit', methods=['POST'])
 def submit_form(form_id):
     data = request.get_json()
@@ -88,42 +220,41 @@ def submit_form(form_id):
     
     # Get chat session
     chat_session = ChatSession.query.filter_by(session_id=session_id).first()
+    if chat_session:
+        chat_session.migrate_legacy_messages()
+    conversation_history = chat_session.get_messages() if chat_session else []
     
-    # Analyze conversation for insights
-    insights = ai_service.analyze_conversation(
-        conversation_history=chat_session.messages if chat_session else [],
-        form_data=form_data
-    )
+    insights = precomputed_insights(form_cache.get(form_id), chat_session, conversation_history, form_data)
     
-    # Create lead
-    lead = Lead(
-        id=generate_id(),
-        form_id=form_id,
-        session_id=session_id,
-        contact_info={
-            'name': form_data.get('name'),
-            'email': form_data.get('email'),
-            'phone': form_data.get('phone')
-        },
-        responses=form_data,
-        conversation_history=chat_session.messages if chat_session else [],
-        pain_points=insights.get('pain_points', []),
-        buying_signals=insights.get('buying_signals', []),
-        qualification_level=insights.get('qualification_level', 'cold')
-    )
+    # Saved right away; without precomputed insights the analysis follows in the background
+    lead = build_lead(form_id, session_id, form_data, conversation_history, insights)
     
     db.session.add(lead)
+    if insights:
+        record_lead_tags(lead)
+    db.session.commit()
+    if not insights:
+        lead_analysis.notify()
     
-    # Track analytics
-    analytics = Analytics(
+    # Track analytics outside the lead transaction
+    analytics_buffer.add(
         form_id=form_id,
         event_type='form_completed',
-        event_data={'fields_count': len(form_data)},
+        event_data=completion_event_data(chat_session, form_data),
         session_id=session_id
     )
-    db.session.add(analytics)
-    
-    db.session.commit()
     
     return jsonify(lead.to_dict()), 201
 
+@chat_bp.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    """Hit and miss counters of this worker's chat caches"""
+    return jsonify({
+        'answers': answer_cache.stats(),
+        'forms': {'hits': form_cache.hits, 'misses': form_cache.misses}
+    })
+
+@chat_bp.route('/routing-stats', methods=['GET'])
+def routing_stats():
+    """Model tier decisions and latencies of this worker"""
+    return jsonify(model_router.stats())
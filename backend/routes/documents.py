@@ -1,20 +1,18 @@
 from flask import Blueprint, request, jsonify
-from models import Document, Form, db
+from models import Document, DocumentJob, Form, db
 from werkzeug.utils import secure_filename
 import os
 import uuid
-from services.document_parser import DocumentParser
+from services.ingestion import ingestion_service
+from services.blob_store import blob_store
+from services.retrieval import bump_version
+from services.form_cache import form_cache
+from services.answer_cache import answer_cache
 
 documents_bp = Blueprint('documents', __name__)
 
-UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
 ALLOWED_EXTENSIONS = {'pdf', 'docx', 'txt'}
 
-# Create upload folder if it doesn't exist
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
-document_parser = DocumentParser()
-
 def generate_id():
     return str(uuid.uuid4())
 
@@ -41,45 +39,32 @@ def upload_document():
     # Get form
     form = Form.query.get_or_404(form_id)
     
-    # Save file
+    # Save file once per distinct content, shared across forms
     filename = secure_filename(file.filename)
-    unique_filename = f"{generate_id()}_{filename}"
-    file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
-    file.save(file_path)
-    
-    # Parse document
-    try:
-        parsed_content = document_parser.parse(file_path, file.filename.rsplit('.', 1)[1].lower())
-    except Exception as e:
-        os.remove(file_path)
-        return jsonify({'error': f'Failed to parse document: {str(e)}'}), 400
+    content_hash, file_path = blob_store.save(file.stream)
     
-    # Create document record
-    document = Document(
+    # Parse in the background; the document appears on the form once the job completes
+    job = DocumentJob(
         id=generate_id(),
-        form_id=form_id,
+        form_id=form.id,
+        document_id=generate_id(),
         filename=filename,
         file_type=file.filename.rsplit('.', 1)[1].lower(),
         file_path=file_path,
-        parsed_content=parsed_content
+        content_hash=content_hash
     )
-    
-    db.session.add(document)
-    
-    # Update form context with document content
-    if form.context:
-        form.context += f"\n\n--- Content from {filename} ---\n{parsed_content}"
-    else:
-        form.context = f"--- Content from {filename} ---\n{parsed_content}"
-    
-    # Add document ID to form's context_documents
-    if not form.context_documents:
-        form.context_documents = []
-    form.context_documents.append(document.id)
-    
+    db.session.add(job)
     db.session.commit()
     
-    return jsonify(document.to_dict()), 201
+    ingestion_service.submit(job.id)
+    form_cache.invalidate(form.id)
+    
+    return jsonify(job.to_dict()), 202, {'Location': f'/api/documents/jobs/{job.id}'}
+
+@documents_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_document_job(job_id):
+    job = DocumentJob.query.get_or_404(job_id)
+    return jsonify(job.to_dict())
 
 @documents_bp.route('/<document_id>', methods=['GET'])
 def get_document(document_id):
@@ -90,17 +75,28 @@ def get_document(document_id):
 def delete_document(document_id):
     document = Document.query.get_or_404(document_id)
     
-    # Delete file
-    if os.path.exists(document.file_path):
-        os.remove(document.file_path)
-    
     # Remove from form's context_documents
     form = Form.query.get(document.form_id)
     if form and form.context_documents and document.id in form.context_documents:
-        form.context_documents.remove(document.id)
+        form.context_documents = [doc_id for doc_id in form.context_documents if doc_id != document.id]
     
     db.session.delete(document)
+    db.session.flush()
+    bump_version(document.form_id)
+    form_id, content_hash, file_path = document.form_id, document.content_hash, document.file_path
+    
+    # Drop this document's reference to the shared file
+    released = blob_store.release(content_hash) if content_hash else None
+    
     db.session.commit()
+    form_cache.invalidate(form_id)
+    answer_cache.invalidate(form_id)
+    
+    # Files go only once the delete is committed
+    if content_hash:
+        blob_store.remove_released(content_hash, released)
+    elif os.path.exists(file_path):
+        os.remove(file_path)
     
     return '', 204
 
@@ -108,12 +104,18 @@ def delete_document(document_id):
 def reparse_document(document_id):
     document = Document.query.get_or_404(document_id)
     
-    try:
-        parsed_content = document_parser.parse(document.file_path, document.file_type)
-        document.parsed_content = parsed_content
-        db.session.commit()
-        
-        return jsonify(document.to_dict())
-    except Exception as e:
-        return jsonify({'error': f'Failed to parse document: {str(e)}'}), 400
-
+    job = DocumentJob(
+        id=generate_id(),
+        form_id=document.form_id,
+        document_id=document.id,
+        filename=document.filename,
+        file_type=document.file_type,
+        file_path=document.file_path,
+        content_hash=document.content_hash
+    )
+    db.session.add(job)
+    db.session.commit()
+    
+    ingestion_service.submit(job.id)
+    
+    return jsonify(job.to_dict()), 202, {'Location': f'/api/documents/jobs/{job.id}'}
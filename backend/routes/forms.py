@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify
 from models import Form, db
 from datetime import datetime
 import uuid
+from services.form_cache import form_cache
+from services.answer_cache import answer_cache
 
 forms_bp = Blueprint('forms', __name__)
 
@@ -43,7 +45,8 @@ def create_form():
             'button_text': 'Start Chat',
             'position': 'inline',
             'width': '100%'
-        })
+        }),
+        ai_settings=data.get('ai_settings', {})
     )
     
     db.session.add(form)
@@ -71,10 +74,14 @@ def update_form(form_id):
         form.context_documents = data['context_documents']
     if 'embed_settings' in data:
         form.embed_settings = data['embed_settings']
+    if 'ai_settings' in data:
+        form.ai_settings = data['ai_settings']
     
     form.updated_at = datetime.utcnow()
     
     db.session.commit()
+    form_cache.invalidate(form_id)
+    answer_cache.invalidate(form_id)
     
     return jsonify(form.to_dict())
 
@@ -84,6 +91,8 @@ def delete_form(form_id):
     
     db.session.delete(form)
     db.session.commit()
+    form_cache.invalidate(form_id)
+    answer_cache.invalidate(form_id)
     
     return '', 204
 
@@ -101,7 +110,8 @@ def duplicate_form(form_id):
         context=original_form.context,
         context_documents=original_form.context_documents,
         template_type=original_form.template_type,
-        embed_settings=original_form.embed_settings
+        embed_settings=original_form.embed_settings,
+        ai_settings=original_form.ai_settings
     )
     
     db.session.add(new_form)
@@ -1,32 +1,90 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from models import Lead, Form, db
+from sqlalchemy import tuple_
+from sqlalchemy.orm import load_only
 from datetime import datetime
-import csv
-import io
+import base64
+import json
 import uuid
+from services.lead_tags import record_lead_tags
+from services.lead_export import EXPORT_FORMATS, export_stream
 
 leads_bp = Blueprint('leads', __name__)
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# The transcript is only returned by get_lead
+LIST_FIELDS = tuple(f for f in Lead.FIELDS if f != 'conversation_history')
+DEFAULT_LIST_FIELDS = tuple(f for f in LIST_FIELDS if f != 'responses')
+
 def generate_id():
     return str(uuid.uuid4())
 
+def encode_cursor(lead):
+    raw = json.dumps([lead.created_at.isoformat(), lead.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    created_at, lead_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return datetime.fromisoformat(created_at), lead_id
+
+def parse_fields(value):
+    if not value:
+        return DEFAULT_LIST_FIELDS
+    fields = [f.strip() for f in value.split(',') if f.strip()]
+    invalid = [f for f in fields if f not in LIST_FIELDS]
+    if invalid:
+        raise ValueError(f"Unknown or unavailable fields: {', '.join(invalid)}")
+    # id and created_at are needed for the cursor
+    return tuple(dict.fromkeys(['id', 'created_at'] + fields))
+
 @leads_bp.route('', methods=['GET'])
 def get_leads():
+    """
+    List leads newest first, one page at a time. The next page's cursor is
+    returned in the X-Next-Cursor header when there are more leads.
+    """
     form_id = request.args.get('form_id')
+    limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    
+    try:
+        fields = parse_fields(request.args.get('fields'))
+        cursor = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        created_after = request.args.get('created_after')
+        created_after = datetime.fromisoformat(created_after) if created_after else None
+        created_before = request.args.get('created_before')
+        created_before = datetime.fromisoformat(created_before) if created_before else None
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
     
-    query = Lead.query
+    query = Lead.query.options(load_only(*[getattr(Lead, f) for f in fields]))
     
     if form_id:
         query = query.filter_by(form_id=form_id)
     else:
         # Get all forms for current user
         user_id = request.headers.get('Authorization', 'test-user')
-        user_forms = Form.query.filter_by(user_id=user_id).all()
-        form_ids = [f.id for f in user_forms]
-        query = query.filter(Lead.form_id.in_(form_ids))
+        user_form_ids = db.session.query(Form.id).filter_by(user_id=user_id)
+        query = query.filter(Lead.form_id.in_(user_form_ids))
+    
+    qualification_level = request.args.get('qualification_level')
+    if qualification_level:
+        query = query.filter(Lead.qualification_level == qualification_level)
+    if created_after:
+        query = query.filter(Lead.created_at >= created_after)
+    if created_before:
+        query = query.filter(Lead.created_at < created_before)
+    if cursor:
+        query = query.filter(tuple_(Lead.created_at, Lead.id) < tuple_(*cursor))
+    
+    # Fetch one extra row to know whether another page exists
+    leads = query.order_by(Lead.created_at.desc(), Lead.id.desc()).limit(limit + 1).all()
     
-    leads = query.order_by(Lead.created_at.desc()).all()
-    return jsonify([lead.to_dict() for lead in leads])
+    response = jsonify([lead.to_dict(fields) for lead in leads[:limit]])
+    if len(leads) > limit:
+        response.headers['X-Next-Cursor'] = encode_cursor(leads[limit - 1])
+    return response
 
 @leads_bp.route('/<lead_id>', methods=['GET'])
 def get_lead(lead_id):
@@ -35,44 +93,35 @@ def get_lead(lead_id):
 
 @leads_bp.route('/export/<form_id>', methods=['GET'])
 def export_leads_csv(form_id):
-    leads = Lead.query.filter_by(form_id=form_id).order_by(Lead.created_at.desc()).all()
+    """
+    Stream a form's leads as csv (default), ndjson or parquet.
+    Pass gzip=1 to compress csv and ndjson output.
+    """
+    export_format = request.args.get('format', 'csv')
+    compress = request.args.get('gzip', '').lower() in ('1', 'true')
     
-    # Create CSV
-    output = io.StringIO()
-    writer = csv.writer(output)
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'format must be one of {", ".join(EXPORT_FORMATS)}'}), 400
     
-    # Header
-    writer.writerow([
-        'ID',
-        'Name',
-        'Email',
-        'Phone',
-        'Qualification Level',
-        'Pain Points',
-        'Buying Signals',
-        'Created At'
-    ])
+    if export_format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return jsonify({'error': 'Parquet export requires pyarrow'}), 400
+        compress = False
     
-    # Rows
-    for lead in leads:
-        writer.writerow([
-            lead.id,
-            lead.contact_info.get('name', ''),
-            lead.contact_info.get('email', ''),
-            lead.contact_info.get('phone', ''),
-            lead.qualification_level,
-            '; '.join(lead.pain_points),
-            '; '.join(lead.buying_signals),
-            lead.created_at.isoformat()
-        ])
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    download_name = f'leads_{form_id}_{datetime.now().strftime("%Y%m%d")}.{extension}'
+    headers = {}
+    if compress:
+        download_name += '.gz'
+        mimetype = 'application/gzip'
+    headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
     
-    # Create response
-    output.seek(0)
-    return send_file(
-        io.BytesIO(output.getvalue().encode('utf-8')),
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name=f'leads_{form_id}_{datetime.now().strftime("%Y%m%d")}.csv'
+    return Response(
+        stream_with_context(export_stream(form_id, export_format, compress)),
+        mimetype=mimetype,
+        headers=headers
     )
 
 @leads_bp.route('', methods=['POST'])
@@ -92,6 +141,7 @@ def create_lead():
     )
     
     db.session.add(lead)
+    record_lead_tags(lead)
     db.session.commit()
     
     return jsonify(lead.to_dict()), 201
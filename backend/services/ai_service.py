@@ -1,86 +1,293 @@
 import os
-from openai import OpenAI
 import json
 import re
+import time
+from services.llm_client import LLMClient
+from services.retrieval import RetrievalService
+from services.history import HistoryBuilder
+from services.form_cache import form_cache
+from services.answer_cache import answer_cache
+from services.lead_signals import extract, lead_signals
+from services.model_router import model_router
+from services.prompt_profiler import prompt_profiler
+from services import metrics
+from services.tokens import estimate_tokens
 
 class AIService:
     def __init__(self):
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        self.model = "gpt-4"  # or "gpt-3.5-turbo" for cost savings
+        self.llm = LLMClient()
+        self.router = model_router
+        self.summary_model = os.getenv('SUMMARY_MODEL', 'gpt-3.5-turbo')
+        self.retrieval = RetrievalService()
+        self.history = HistoryBuilder(self.summarize_history)
     
-    def generate_response(self, form, conversation_history, user_message, context_data):
+    def generate_response(self, form, conversation_history, user_message, context_data, history_offset=0):
         """
-        Generate an AI response based on the conversation and form context
+        Generate an AI response based on the conversation and form context.
+        conversation_history may be the tail of the transcript, starting after
+        history_offset earlier messages.
         """
+        message_count = history_offset + len(conversation_history)
+        cached = self._cached_answer(form, message_count, user_message)
+        if cached is not None:
+            return self._build_result(form, message_count, user_message, cached, context_data)
         
-        # Build system prompt
-        system_prompt = f"""You are a helpful AI assistant for a conversational form.
+        messages, history_summary = self._build_messages(form, conversation_history, user_message, context_data, history_offset)
+        
+        # Get AI response from the tier this turn needs
+        tier, model, _ = self.router.route(form, user_message, message_count)
+        try:
+            started = time.monotonic()
+            response = self.llm.complete(**self._reply_request(messages, model))
+            self.router.record_latency(tier, time.monotonic() - started)
+            
+            ai_message = response.choices[0].message.content
+            self._store_answer(form, message_count, user_message, ai_message)
+            
+            return self._build_result(form, message_count, user_message, ai_message, context_data, history_summary)
+            
+        except Exception as e:
+            print(f"OpenAI API Error: {str(e)}")
+            return self._fallback_response(history_summary)
+    
+    def stream_response(self, form, conversation_history, user_message, context_data, history_offset=0):
+        """
+        Stream an AI response as the completion is generated.
+        Yields ('token', text) for each chunk, then a single ('done', result)
+        where result has the same shape as generate_response's return value.
+        Raises if the completion fails after tokens were yielded.
+        """
+        message_count = history_offset + len(conversation_history)
+        cached = self._cached_answer(form, message_count, user_message)
+        if cached is not None:
+            yield 'token', cached
+            yield 'done', self._build_result(form, message_count, user_message, cached, context_data)
+            return
+        
+        messages, history_summary = self._build_messages(form, conversation_history, user_message, context_data, history_offset)
+        tier, model, _ = self.router.route(form, user_message, message_count)
+        chunks = []
+        
+        try:
+            started = time.monotonic()
+            stream = self.llm.stream(**self._reply_request(messages, model))
+            
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    chunks.append(delta)
+                    yield 'token', delta
+                    
+        except Exception as e:
+            print(f"OpenAI API Error: {str(e)}")
+            # Nothing reached the client yet, so send the fallback instead
+            if not chunks:
+                fallback = self._fallback_response(history_summary)
+                yield 'token', fallback['message']
+                yield 'done', fallback
+                return
+            # The reply was cut short; the caller reports it instead of saving it
+            raise
+        else:
+            self.router.record_latency(tier, time.monotonic() - started)
+            # Streams carry no usage, so count estimated tokens
+            metrics.record_llm_tokens(
+                model,
+                sum(estimate_tokens(msg['content']) for msg in messages),
+                estimate_tokens(''.join(chunks))
+            )
+            self._store_answer(form, message_count, user_message, ''.join(chunks))
+        
+        ai_message = ''.join(chunks)
+        yield 'done', self._build_result(form, message_count, user_message, ai_message, context_data, history_summary)
+    
+    def summarize_history(self, previous_summary, messages):
+        """
+        Fold older conversation turns into the running summary
+        """
+        conversation_text = "\n".join([
+            f"{msg['role']}: {msg['content']}"
+            for msg in messages
+        ])
+        
+        summary_prompt = f"""Update the summary of this conversation with the new messages.
+Keep every concrete fact the user shared (company, budget, timeline, team size, needs, objections).
 
-Form Title: {form.title}
-CTA: {form.cta_type}
+Current summary:
+{previous_summary or "(none)"}
 
-Context and Instructions:
-{form.context}
+New messages:
+{conversation_text}
 
-Your job is to:
-1. Answer user questions naturally and helpfully
-2. Guide the conversation towards collecting the required information
-3. Identify pain points, buying signals, and qualification indicators
-4. When you've gathered enough information, suggest moving to the form submission
+Respond with the updated summary only, in at most 120 words."""
+        
+        response = self.llm.complete(
+            model=self.summary_model,
+            messages=[
+                {"role": "system", "content": "You summarize sales conversations accurately and concisely."},
+                {"role": "user", "content": summary_prompt}
+            ],
+            temperature=0.2,
+            max_tokens=200
+        )
+        
+        return response.choices[0].message.content.strip()
+    
+    def update_insights(self, previous_insights, messages, form_data=None):
+        """
+        Update running lead insights from the messages since the last update.
+        Only the previous insights and the new messages are sent, on the summary model.
+        """
+        conversation_text = "\n".join([
+            f"{msg['role']}: {msg['content']}"
+            for msg in messages
+        ])
+        
+        previous = {
+            key: (previous_insights or {}).get(key)
+            for key in ('pain_points', 'buying_signals', 'qualification_level', 'summary')
+        }
+        form_section = f"\nForm Data:\n{json.dumps(form_data, indent=2)}\n" if form_data else ""
+        
+        insights_prompt = f"""Update the lead insights below with the new conversation messages.
+Keep earlier findings unless the new messages contradict them.
 
-Available form fields:
-{self._format_fields(form.fields)}
+Current insights:
+{json.dumps(previous, indent=2)}
 
-Keep responses concise (2-3 sentences max). Be conversational and friendly.
+New messages:
+{conversation_text}
+{form_section}
+Respond in JSON format:
+{{
+  "pain_points": ["list", "of", "pain", "points"],
+  "buying_signals": ["list", "of", "buying", "signals"],
+  "qualification_level": "hot|warm|cold",
+  "summary": "Brief summary of the lead"
+}}
 """
         
+        response = self.llm.complete(
+            model=self.summary_model,
+            messages=[
+                {"role": "system", "content": "You are a sales analyst extracting insights from conversations."},
+                {"role": "user", "content": insights_prompt}
+            ],
+            temperature=0.2,
+            max_tokens=300
+        )
+        
+        json_match = re.search(r'\{.*\}', response.choices[0].message.content, re.DOTALL)
+        if not json_match:
+            raise ValueError("Insight update did not return JSON")
+        return json.loads(json_match.group())
+    
+    def _build_messages(self, form, conversation_history, user_message, context_data, history_offset=0):
+        """
+        Build the chat completion messages for a form conversation.
+        Returns the messages and the (possibly updated) history summary state.
+        """
+        
+        # Recent turns under the form's token budget, older ones folded into a summary
+        budget = (form.ai_settings or {}).get('history_token_budget')
+        summary, recent_messages, history_summary = self.history.build(
+            conversation_history,
+            (context_data or {}).get('history_summary'),
+            budget,
+            history_offset
+        )
+        
+        # Only the document chunks relevant to this message go into the prompt
+        knowledge = self._format_knowledge(self.retrieval.retrieve(form.id, user_message))
+        
+        # Build system prompt; the form-derived part is rendered once per form version
+        prefix = form_cache.prompt(form, self._render_prompt_prefix)
+        system_prompt = prefix + knowledge
+        
+        summary_text = f"\nSummary of the earlier conversation:\n{summary}\n" if summary else ""
+        system_prompt += summary_text
+        
+        prompt_profiler.record(form, prefix, self._prompt_segments, knowledge, summary_text, recent_messages)
+        
         # Build conversation messages
         messages = [{"role": "system", "content": system_prompt}]
         
-        # Add conversation history (limit to last 10 messages for context window)
-        for msg in conversation_history[-10:]:
+        # Add the recent conversation history
+        for msg in recent_messages:
             messages.append({
                 "role": msg['role'],
                 "content": msg['content']
             })
         
-        # Get AI response
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=0.7,
-                max_tokens=200
-            )
-            
-            ai_message = response.choices[0].message.content
-            
-            # Determine if we should show the form
-            # Simple heuristic: if conversation is long enough or user seems ready
-            show_form = self._should_show_form(conversation_history, user_message, ai_message)
-            
-            # Extract any data mentioned
-            extracted_data = self._extract_data(user_message, context_data)
-            
-            return {
-                'message': ai_message,
-                'show_form': show_form,
-                'extracted_data': extracted_data
-            }
-            
-        except Exception as e:
-            print(f"OpenAI API Error: {str(e)}")
-            # Fallback response
-            return {
-                'message': "I'd be happy to help! Could you tell me more about what you're looking for?",
-                'show_form': False,
-                'extracted_data': {}
-            }
-    
-    def analyze_conversation(self, conversation_history, form_data):
+        return messages, history_summary
+    
+    def _cached_answer(self, form, message_count, user_message):
+        """Cached reply to an opening message, or None"""
+        if message_count != 1 or extract(user_message):
+            return None
+        return answer_cache.get(form, user_message)
+    
+    def _store_answer(self, form, message_count, user_message, ai_message):
+        # Only opening messages without contact or company details are shared between visitors
+        if message_count == 1 and not extract(user_message):
+            answer_cache.put(form, user_message, ai_message)
+    
+    def _build_result(self, form, message_count, user_message, ai_message, context_data, history_summary=None):
+        """Wrap a completed AI message with form and extraction hints"""
+        
+        # One keyword pass and the precompiled patterns over the user's message
+        labels, extracted_data = lead_signals.analyze_message(form, user_message)
+        
+        # Determine if we should show the form
+        # Simple heuristic: if conversation is long enough or user seems ready
+        show_form = self._should_show_form(message_count, labels)
+        
+        return {
+            'message': ai_message,
+            'show_form': show_form,
+            'extracted_data': extracted_data,
+            'history_summary': history_summary
+        }
+    
+    def _fallback_response(self, history_summary=None):
+        """Return fallback response when the OpenAI call fails"""
+        return {
+            'message': "I'd be happy to help! Could you tell me more about what you're looking for?",
+            'show_form': False,
+            'extracted_data': {},
+            'history_summary': history_summary
+        }
+    
+    def analyze_conversation(self, conversation_history, form_data, form=None):
         """
         Analyze the conversation to extract insights about the lead
         """
+        try:
+            return self.analyze_lead(conversation_history, form_data, form)
+        except Exception as e:
+            print(f"Analysis Error: {str(e)}")
+            return self._default_analysis()
+    
+    def analyze_lead(self, conversation_history, form_data, form=None):
+        """analyze_conversation without the fallback, so callers can retry on errors"""
+        started = time.monotonic()
+        response = self.llm.complete(**self._analysis_request(conversation_history, form_data, self.router.analysis_model(form)))
+        self.router.record_latency('analysis', time.monotonic() - started)
+        return self._parse_analysis(response.choices[0].message.content)
+    
+    def _reply_request(self, messages, model):
+        """Completion arguments for a chat reply"""
+        return {
+            'model': model,
+            'messages': messages,
+            'temperature': 0.7,
+            'max_tokens': 200
+        }
+    
+    def _analysis_request(self, conversation_history, form_data, model):
+        """Completion arguments for a lead analysis"""
         
         # Build conversation text
         conversation_text = "\n".join([
@@ -109,31 +316,59 @@ Respond in JSON format:
 }}
 """
         
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a sales analyst extracting insights from conversations."},
-                    {"role": "user", "content": analysis_prompt}
-                ],
-                temperature=0.3,
-                max_tokens=500
-            )
-            
-            # Parse JSON response
-            analysis_text = response.choices[0].message.content
-            
-            # Extract JSON from response (handle markdown code blocks)
-            json_match = re.search(r'\{.*\}', analysis_text, re.DOTALL)
-            if json_match:
-                analysis = json.loads(json_match.group())
-                return analysis
-            else:
-                return self._default_analysis()
-                
-        except Exception as e:
-            print(f"Analysis Error: {str(e)}")
-            return self._default_analysis()
+        return {
+            'model': model,
+            'messages': [
+                {"role": "system", "content": "You are a sales analyst extracting insights from conversations."},
+                {"role": "user", "content": analysis_prompt}
+            ],
+            'temperature': 0.3,
+            'max_tokens': 500
+        }
+    
+    def _parse_analysis(self, analysis_text):
+        # Extract JSON from response (handle markdown code blocks)
+        json_match = re.search(r'\{.*\}', analysis_text, re.DOTALL)
+        if json_match:
+            return json.loads(json_match.group())
+        return self._default_analysis()
+    
+    def _render_prompt_prefix(self, form):
+        """System prompt text that depends only on the form"""
+        return f"""You are a helpful AI assistant for a conversational form.
+
+Form Title: {form.title}
+CTA: {form.cta_type}
+
+Context and Instructions:
+{form.context}
+
+Your job is to:
+1. Answer user questions naturally and helpfully
+2. Guide the conversation towards collecting the required information
+3. Identify pain points, buying signals, and qualification indicators
+4. When you've gathered enough information, suggest moving to the form submission
+
+Available form fields:
+{self._format_fields(form.fields)}
+
+Keep responses concise (2-3 sentences max). Be conversational and friendly.
+"""
+    
+    def _prompt_segments(self, form):
+        """The form's own values as they appear in the prompt prefix"""
+        return {
+            'title': form.title or '',
+            'cta': form.cta_type or '',
+            'context': form.context or '',
+            'fields': self._format_fields(form.fields),
+        }
+    
+    def _format_knowledge(self, chunks):
+        """Format retrieved document chunks for the prompt"""
+        if not chunks:
+            return ""
+        return "\nRelevant information from uploaded documents:\n" + "\n---\n".join(chunks) + "\n"
     
     def _format_fields(self, fields):
         """Format form fields for the prompt"""
@@ -143,44 +378,21 @@ Respond in JSON format:
             field_list.append(f"- {field['label']} ({field['type']}, {required})")
         return "\n".join(field_list)
     
-    def _should_show_form(self, conversation_history, user_message, ai_message):
+    def _should_show_form(self, message_count, labels):
         """
         Determine if we should show the form to the user
         Simple heuristic based on conversation length and keywords
         """
         
         # Show form after 4-5 exchanges
-        if len(conversation_history) >= 8:
+        if message_count >= 8:
             return True
         
         # Show form if user expresses readiness
-        ready_keywords = ['ready', 'sign up', 'register', 'book', 'schedule', 'interested', 'get started']
-        if any(keyword in user_message.lower() for keyword in ready_keywords):
-            return True
-        
-        return False
-    
-    def _extract_data(self, message, existing_data):
-        """
-        Extract structured data from user messages
-        """
-        extracted = {}
-        
-        # Email extraction
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        email_match = re.search(email_pattern, message)
-        if email_match:
-            extracted['email'] = email_match.group()
-        
-        # Phone extraction (simple pattern)
-        phone_pattern = r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b'
-        phone_match = re.search(phone_pattern, message)
-        if phone_match:
-            extracted['phone'] = phone_match.group()
-        
-        return extracted
+        return 'ready' in labels
     
-    def _default_analysis(self):
+    @staticmethod
+    def _default_analysis():
         """Return default analysis when AI analysis fails"""
         return {
             'pain_points': [],
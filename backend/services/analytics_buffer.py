@@ -0,0 +1,144 @@
+import atexit
+import os
+import threading
+from datetime import datetime
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+from models import Analytics, db
+from services.rollups import increment_rollups
+
+# Errors caused by a single row (unknown form_id, value too long for its column);
+# anything else means the database itself is failing
+ROW_ERRORS = (IntegrityError, DataError)
+
+
+class AnalyticsBuffer:
+    """
+    Collects analytics events in memory and writes them with bulk inserts
+    once the buffer is full or the flush interval has passed
+    """
+
+    def __init__(self):
+        self.max_size = int(os.getenv('ANALYTICS_BUFFER_SIZE', 200))
+        self.flush_interval = float(os.getenv('ANALYTICS_FLUSH_INTERVAL', 2.0))
+        # Cap on events held while the database is unavailable
+        self.max_pending = int(os.getenv('ANALYTICS_MAX_PENDING', 10000))
+        self.app = None
+        self._events = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def init_app(self, app):
+        self.app = app
+        atexit.register(self.flush)
+
+    @property
+    def queue_depth(self):
+        return len(self._events)
+
+    def add(self, form_id, event_type, event_data=None, session_id=None, timestamp=None):
+        """Queue a single event"""
+        self.add_many([{
+            'form_id': form_id,
+            'event_type': event_type,
+            'event_data': event_data or {},
+            'session_id': session_id,
+            'timestamp': timestamp or datetime.utcnow()
+        }])
+
+    def add_many(self, events):
+        """Queue several events given as Analytics column dicts"""
+        self._ensure_worker()
+
+        with self._lock:
+            self._events.extend(events)
+            self._trim()
+            full = len(self._events) >= self.max_size
+
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write all queued events; returns how many were written"""
+        with self._flush_lock:
+            with self._lock:
+                events, self._events = self._events, []
+
+            if not events:
+                return 0
+
+            with self.app.app_context():
+                try:
+                    self._write(events)
+                    db.session.commit()
+                    return len(events)
+                except ROW_ERRORS:
+                    db.session.rollback()
+                    return self._write_individually(events)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Analytics Flush Error: {str(e)}")
+                    self._requeue(events)
+                    return 0
+
+    def _write(self, events):
+        db.session.execute(insert(Analytics), events)
+        # Same transaction, so rollups never drift from the raw events
+        increment_rollups(events)
+
+    def _write_individually(self, events):
+        """Fallback when a batch has bad rows (e.g. unknown form_id): keep the good ones"""
+        written = 0
+        try:
+            for event in events:
+                try:
+                    with db.session.begin_nested():
+                        self._write([event])
+                    written += 1
+                except ROW_ERRORS as e:
+                    print(f"Dropping analytics event: {str(e.orig)}")
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Analytics Flush Error: {str(e)}")
+            self._requeue(events)
+            return 0
+        return written
+
+    def _requeue(self, events):
+        with self._lock:
+            self._events[:0] = events
+            self._trim()
+
+    def _trim(self):
+        # Callers hold the lock. Drop the oldest events rather than grow without bound
+        if len(self._events) > self.max_pending:
+            del self._events[:len(self._events) - self.max_pending]
+
+    def _ensure_worker(self):
+        # Started lazily so every forked gunicorn worker gets its own flush thread,
+        # and started again should it ever die
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='analytics-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Analytics Flush Error: {str(e)}")
+
+
+analytics_buffer = AnalyticsBuffer()
@@ -0,0 +1,165 @@
+import os
+import statistics
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import func
+from models import Analytics, ChatSession, db
+from services.rollups import as_bucket, bucket_sql
+
+FUNNEL_STEPS = [
+    ('viewed', 'form_view'),
+    ('first_message', 'message_sent'),
+    ('form_shown', 'form_shown'),
+    ('completed', 'form_completed'),
+]
+
+
+def _session_steps(form_ids, start_date):
+    """
+    One row per session with the first time it reached each funnel step,
+    computed in a single pass over the form's events
+    """
+    timestamp = Analytics.timestamp
+    columns = [
+        Analytics.session_id.label('session_id'),
+        func.min(timestamp).label('started_at'),
+    ]
+    columns += [
+        func.min(timestamp).filter(Analytics.event_type == event_type).label(f'{step}_at')
+        for step, event_type in FUNNEL_STEPS
+    ]
+
+    return db.session.query(*columns).filter(
+        Analytics.form_id.in_(form_ids),
+        Analytics.timestamp >= start_date,
+        Analytics.session_id.isnot(None)
+    ).group_by(Analytics.session_id).subquery()
+
+
+def _step_counts(steps):
+    return [func.count(getattr(steps.c, f'{step}_at')).label(step) for step, _ in FUNNEL_STEPS]
+
+
+def _is_postgres():
+    return db.session.get_bind().dialect.name == 'postgresql'
+
+
+def _seconds_between(end, start):
+    if _is_postgres():
+        return func.extract('epoch', end - start)
+    return (func.julianday(end) - func.julianday(start)) * 86400
+
+
+def funnel(form_ids, start_date):
+    """Sessions reaching each funnel step, plus the median completion time in seconds"""
+    steps = _session_steps(form_ids, start_date)
+    row = db.session.query(*_step_counts(steps)).one()
+
+    counts = {step: getattr(row, step) for step, _ in FUNNEL_STEPS}
+    stages = []
+    previous = None
+    for step, _ in FUNNEL_STEPS:
+        stages.append({
+            'step': step,
+            'sessions': counts[step],
+            'conversion_from_previous': (counts[step] / previous) if previous else None
+        })
+        previous = counts[step]
+
+    return {
+        'steps': stages,
+        'median_completion_time': median_completion_time(form_ids, start_date)
+    }
+
+
+def median_completion_time(form_ids, start_date):
+    """
+    Median of the completion_seconds recorded on form_completed events, the
+    same measure the rollups average (see rollups.avg_completion_time)
+    """
+    seconds = Analytics.event_data['completion_seconds'].as_float()
+    query = db.session.query(seconds).filter(
+        Analytics.form_id.in_(form_ids),
+        Analytics.event_type == 'form_completed',
+        Analytics.timestamp >= start_date,
+        seconds >= 0
+    )
+    if _is_postgres():
+        value = query.with_entities(func.percentile_cont(0.5).within_group(seconds)).scalar()
+        return float(value or 0)
+    # SQLite has no percentile_cont
+    values = [value for (value,) in query]
+    return float(statistics.median(values)) if values else 0.0
+
+
+def avg_session_duration(form_ids, start_date):
+    """Average chat session length in seconds"""
+    duration = _seconds_between(ChatSession.last_activity, ChatSession.started_at)
+    value = db.session.query(func.avg(duration)).filter(
+        ChatSession.form_id.in_(form_ids),
+        ChatSession.started_at >= start_date
+    ).scalar()
+    return float(value or 0)
+
+
+def funnel_timeseries(form_ids, start_date, granularity):
+    """
+    Funnel counts per hour or day, with sessions bucketed by when they
+    started, and a running total of completions
+    """
+    steps = _session_steps(form_ids, start_date)
+    bucket = bucket_sql(granularity, steps.c.started_at)
+    completed = func.count(steps.c.completed_at)
+
+    rows = db.session.query(
+        bucket.label('bucket'),
+        *_step_counts(steps),
+        func.sum(completed).over(order_by=bucket).label('cumulative_completed')
+    ).group_by(bucket).order_by(bucket).all()
+
+    return [
+        {
+            'bucket': as_bucket(row.bucket).isoformat(),
+            **{step: getattr(row, step) for step, _ in FUNNEL_STEPS},
+            'cumulative_completed': int(row.cumulative_completed),
+        }
+        for row in rows
+    ]
+
+
+class ReportCache:
+    """
+    Per-worker cache of the reports above. They scan raw events, so each one
+    is computed at most once every ANALYTICS_REPORT_TTL seconds.
+    """
+
+    def __init__(self):
+        self.ttl = float(os.getenv('ANALYTICS_REPORT_TTL', 300))
+        self.max_entries = int(os.getenv('ANALYTICS_REPORT_CACHE_SIZE', 512))
+        self._entries = OrderedDict()  # key -> (report, computed_at)
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        """The cached report for key, computing it with compute() when missing or stale"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                self._entries.move_to_end(key)
+                return entry[0]
+
+        report = compute()
+        with self._lock:
+            self._entries[key] = (report, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return report
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+report_cache = ReportCache()
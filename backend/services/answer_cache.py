@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+import numpy as np
+from services.question_clusters import normalize
+
+DIMENSIONS = 1024
+NGRAM_SIZE = 3
+
+
+def ngram_vector(normalized):
+    """Unit-length hashed character n-gram vector"""
+    padded = f" {normalized} "
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    for i in range(max(len(padded) - NGRAM_SIZE + 1, 1)):
+        vector[zlib.crc32(padded[i:i + NGRAM_SIZE].encode()) % DIMENSIONS] += 1
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def form_fingerprint(form):
+    """Changes whenever anything that shapes the answers changes"""
+    payload = json.dumps([form.context, form.fields, form.context_documents], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+class FormAnswers:
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.entries = OrderedDict()  # normalized -> (answer, expires_at, vector)
+        self._matrix = None
+        self._keys = None
+
+    def matrix(self):
+        if self._matrix is None:
+            self._keys = list(self.entries)
+            self._matrix = np.vstack([entry[2] for entry in self.entries.values()])
+        return self._keys, self._matrix
+
+    def changed(self):
+        self._matrix = None
+        self._keys = None
+
+
+class AnswerCache:
+    """
+    Per-worker cache of first-turn answers for each form, matched on the
+    normalized message or, failing that, on hashed n-gram cosine similarity
+    """
+
+    def __init__(self):
+        self.ttl = float(os.getenv('ANSWER_CACHE_TTL', 3600))
+        self.max_per_form = int(os.getenv('ANSWER_CACHE_MAX_PER_FORM', 200))
+        self.threshold = float(os.getenv('ANSWER_CACHE_SIMILARITY', 0.9))
+        self.max_forms = int(os.getenv('ANSWER_CACHE_MAX_FORMS', 1000))
+        self.hits = 0
+        self.misses = 0
+        self._forms = OrderedDict()  # form_id -> FormAnswers, least recently used first
+        self._lock = threading.Lock()
+
+    def enabled_for(self, form):
+        return (form.ai_settings or {}).get('answer_cache', True)
+
+    def get(self, form, message):
+        """Cached answer for a first message, or None"""
+        normalized = normalize(message or '')
+        if not normalized or not self.enabled_for(form):
+            return None
+
+        now = time.time()
+        with self._lock:
+            answers = self._answers(form)
+            answer = self._lookup(answers, normalized, now)
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return answer
+
+    def put(self, form, message, answer):
+        normalized = normalize(message or '')
+        if not normalized or not answer or not self.enabled_for(form):
+            return
+
+        with self._lock:
+            answers = self._answers(form)
+            answers.entries[normalized] = (answer, time.time() + self.ttl, ngram_vector(normalized))
+            answers.entries.move_to_end(normalized)
+            while len(answers.entries) > self.max_per_form:
+                answers.entries.popitem(last=False)
+            answers.changed()
+
+    def invalidate(self, form_id):
+        with self._lock:
+            self._forms.pop(form_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'forms': len(self._forms),
+                'entries': sum(len(a.entries) for a in self._forms.values()),
+            }
+
+    def _answers(self, form):
+        """The form's entries, dropped if the form's context or fields changed"""
+        # Form snapshots hash themselves once; plain Form rows are hashed here
+        fingerprint = getattr(form, 'fingerprint', None) or form_fingerprint(form)
+        answers = self._forms.get(form.id)
+        if answers is None or answers.fingerprint != fingerprint:
+            answers = FormAnswers(fingerprint)
+            self._forms[form.id] = answers
+        self._forms.move_to_end(form.id)
+        while len(self._forms) > self.max_forms:
+            self._forms.popitem(last=False)
+        return answers
+
+    def _lookup(self, answers, normalized, now):
+        entry = answers.entries.get(normalized)
+        if entry is not None:
+            if entry[1] > now:
+                return entry[0]
+            del answers.entries[normalized]
+            answers.changed()
+
+        if not answers.entries:
+            return None
+
+        keys, matrix = answers.matrix()
+        scores = matrix @ ngram_vector(normalized)
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+
+        answer, expires_at, _ = answers.entries[keys[best]]
+        if expires_at <= now:
+            del answers.entries[keys[best]]
+            answers.changed()
+            return None
+        return answer
+
+
+answer_cache = AnswerCache()
@@ -0,0 +1,87 @@
+import time
+from services.ai_service import AIService
+from services.async_db import run_sync
+from services.llm_client import AsyncLLMClient
+from services import metrics
+from services.tokens import estimate_tokens
+
+
+class AsyncAIService(AIService):
+    """
+    AIService for the ASGI app. Replies await AsyncOpenAI;
+    prompt building (retrieval, occasional history summaries) runs in a thread.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.async_llm = AsyncLLMClient()
+
+    async def generate_response(self, form, conversation_history, user_message, context_data, history_offset=0):
+        message_count = history_offset + len(conversation_history)
+        cached = self._cached_answer(form, message_count, user_message)
+        if cached is not None:
+            return self._build_result(form, message_count, user_message, cached, context_data)
+
+        messages, history_summary = await run_sync(
+            self._build_messages, form, conversation_history, user_message, context_data, history_offset
+        )
+
+        tier, model, _ = self.router.route(form, user_message, message_count)
+        try:
+            started = time.monotonic()
+            response = await self.async_llm.complete(**self._reply_request(messages, model))
+            self.router.record_latency(tier, time.monotonic() - started)
+            ai_message = response.choices[0].message.content
+            self._store_answer(form, message_count, user_message, ai_message)
+            return self._build_result(form, message_count, user_message, ai_message, context_data, history_summary)
+        except Exception as e:
+            print(f"OpenAI API Error: {str(e)}")
+            return self._fallback_response(history_summary)
+
+    async def stream_response(self, form, conversation_history, user_message, context_data, history_offset=0):
+        """Async generator of the same ('token', text) / ('done', result) events as AIService"""
+        message_count = history_offset + len(conversation_history)
+        cached = self._cached_answer(form, message_count, user_message)
+        if cached is not None:
+            yield 'token', cached
+            yield 'done', self._build_result(form, message_count, user_message, cached, context_data)
+            return
+
+        messages, history_summary = await run_sync(
+            self._build_messages, form, conversation_history, user_message, context_data, history_offset
+        )
+        tier, model, _ = self.router.route(form, user_message, message_count)
+        chunks = []
+
+        try:
+            started = time.monotonic()
+            stream = await self.async_llm.stream(**self._reply_request(messages, model))
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    chunks.append(delta)
+                    yield 'token', delta
+        except Exception as e:
+            print(f"OpenAI API Error: {str(e)}")
+            # Nothing reached the client yet, so send the fallback instead
+            if not chunks:
+                fallback = self._fallback_response(history_summary)
+                yield 'token', fallback['message']
+                yield 'done', fallback
+                return
+            # The reply was cut short; the caller reports it instead of saving it
+            raise
+        else:
+            self.router.record_latency(tier, time.monotonic() - started)
+            # Streams carry no usage, so count estimated tokens
+            metrics.record_llm_tokens(
+                model,
+                sum(estimate_tokens(msg['content']) for msg in messages),
+                estimate_tokens(''.join(chunks))
+            )
+            self._store_answer(form, message_count, user_message, ''.join(chunks))
+
+        ai_message = ''.join(chunks)
+        yield 'done', self._build_result(form, message_count, user_message, ai_message, context_data, history_summary)
@@ -0,0 +1,39 @@
+import asyncio
+import os
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app import app
+
+# Async drivers for the sync database URLs the Flask app is configured with
+ASYNC_DRIVERS = {
+    'postgres': 'postgresql+asyncpg',
+    'postgresql': 'postgresql+asyncpg',
+    'postgresql+psycopg2': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def async_database_url(url):
+    scheme, rest = url.split('://', 1)
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}://{rest}"
+
+
+engine = create_async_engine(
+    os.getenv('ASYNC_DATABASE_URL') or async_database_url(app.config['SQLALCHEMY_DATABASE_URI']),
+    pool_size=int(os.getenv('ASYNC_DB_POOL_SIZE', 20)),
+    max_overflow=int(os.getenv('ASYNC_DB_MAX_OVERFLOW', 20)),
+    pool_pre_ping=True
+)
+
+# Objects stay readable after commit, e.g. while a streamed reply is sent
+async_session = async_sessionmaker(engine, expire_on_commit=False)
+
+
+async def run_sync(func, *args, **kwargs):
+    """
+    Run blocking code that still uses the Flask-SQLAlchemy session
+    (retrieval, question clusters, lead tags) in a thread with an app context
+    """
+    def call():
+        with app.app_context():
+            return func(*args, **kwargs)
+    return await asyncio.to_thread(call)
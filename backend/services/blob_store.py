@@ -0,0 +1,88 @@
+import hashlib
+import os
+import uuid
+from models import ParsedContentCache, StoredFile, db
+from services.upsert import upsert_increment
+
+DEFAULT_UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
+READ_SIZE = 1024 * 1024
+
+
+class BlobStore:
+    """
+    Content-addressed storage for uploaded files. Each distinct file is
+    stored once under its SHA-256 and reference-counted by its documents.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or os.getenv('UPLOAD_FOLDER', DEFAULT_UPLOAD_FOLDER)
+        os.makedirs(self.root, exist_ok=True)
+
+    def path_for(self, content_hash):
+        return os.path.join(self.root, content_hash[:2], content_hash)
+
+    def save(self, stream):
+        """
+        Store an uploaded stream and take one reference to it.
+        Returns (content_hash, file_path); commits the reference.
+        """
+        temp_path = os.path.join(self.root, f".upload-{uuid.uuid4()}")
+        sha256 = hashlib.sha256()
+        size = 0
+
+        try:
+            with open(temp_path, 'wb') as temp_file:
+                while True:
+                    block = stream.read(READ_SIZE)
+                    if not block:
+                        break
+                    sha256.update(block)
+                    temp_file.write(block)
+                    size += len(block)
+
+            content_hash = sha256.hexdigest()
+            file_path = self.path_for(content_hash)
+
+            upsert_increment(StoredFile, [{
+                'content_hash': content_hash,
+                'file_path': file_path,
+                'size': size,
+                'ref_count': 1
+            }], ['content_hash'], 'ref_count')
+            db.session.commit()
+
+            # Written after the reference is committed so a concurrent release can't remove it
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            os.replace(temp_path, file_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        return content_hash, file_path
+
+    def release(self, content_hash):
+        """
+        Drop one reference; the cached parses go with the last one. Runs in the
+        caller's transaction and returns the file to pass to remove_released
+        once it commits, or None while other documents still use it.
+        """
+        stored_file = StoredFile.query.filter_by(content_hash=content_hash).with_for_update().first()
+        if not stored_file:
+            return None
+
+        stored_file.ref_count -= 1
+        if stored_file.ref_count > 0:
+            return None
+
+        ParsedContentCache.query.filter_by(content_hash=content_hash).delete()
+        db.session.delete(stored_file)
+        return stored_file.file_path
+
+    def remove_released(self, content_hash, file_path):
+        """Delete a released file after its commit, unless it was uploaded again since"""
+        if not file_path or StoredFile.query.get(content_hash):
+            return
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+blob_store = BlobStore()
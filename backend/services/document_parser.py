@@ -1,53 +1,169 @@
 import PyPDF2
 from docx import Document as DocxDocument
+from collections import deque
+import io
 import os
 
+# Bump when extraction output changes so cached parses are not reused
+PARSER_VERSION = '2'
+
+# Pages handed to one worker process when a PDF is split across a pool
+PAGES_PER_TASK = 25
+# Page ranges in flight or waiting to be read, per document, when the caller gives no window
+DEFAULT_WINDOW = 2 * (os.cpu_count() or 2)
+TXT_READ_SIZE = 64 * 1024
+
+class DocumentLimitError(ValueError):
+    pass
+
 class DocumentParser:
-    def parse(self, file_path, file_type):
+    def __init__(self, max_pages=None, max_file_bytes=None, max_text_bytes=None):
+        self.max_pages = max_pages or int(os.getenv('PARSER_MAX_PAGES', 1000))
+        self.max_file_bytes = max_file_bytes or int(os.getenv('PARSER_MAX_FILE_BYTES', 50 * 1024 * 1024))
+        self.max_text_bytes = max_text_bytes or int(os.getenv('PARSER_MAX_TEXT_BYTES', 10 * 1024 * 1024))
+
+    def parse(self, file_path, file_type, executor=None, on_progress=None, window=None):
+        """
+        Parse a document and extract text content.
+        With an executor, PDF page ranges are extracted in parallel, at most
+        window ranges at a time.
+        on_progress(done, total) is called as pages or sections complete.
+        """
+        if file_type == 'pdf' and executor is not None:
+            sections = self.iter_pdf_parallel(file_path, executor, on_progress, window)
+        else:
+            sections = self.iter_sections(file_path, file_type, on_progress)
+
+        # TXT blocks are contiguous, pages and sections go on new lines
+        return self._join(sections, '' if file_type == 'txt' else '\n')
+
+    def iter_sections(self, file_path, file_type, on_progress=None):
         """
-        Parse a document and extract text content
+        Yield text one page (PDF), section (DOCX) or block (TXT) at a time
         """
+        self._check_file_size(file_path)
+
         if file_type == 'pdf':
-            return self._parse_pdf(file_path)
+            return self._iter_pdf(file_path, on_progress)
         elif file_type == 'docx':
-            return self._parse_docx(file_path)
+            return self._iter_docx(file_path)
         elif file_type == 'txt':
-            return self._parse_txt(file_path)
+            return self._iter_txt(file_path)
         else:
             raise ValueError(f"Unsupported file type: {file_type}")
-    
-    def _parse_pdf(self, file_path):
-        """Parse PDF file"""
-        text = []
+
+    def iter_pdf_parallel(self, file_path, executor, on_progress=None, window=None):
+        """
+        Yield PDF text in page order while page ranges are extracted
+        concurrently by the executor's worker processes. Only window ranges
+        are submitted ahead of the reader, so finished ranges never pile up.
+        """
+        self._check_file_size(file_path)
+        total = self._pdf_page_count(file_path)
+        starts = iter(range(0, total, PAGES_PER_TASK))
+        pending = deque()
+
+        def submit_next():
+            start = next(starts, None)
+            if start is not None:
+                pending.append(executor.submit(extract_pdf_pages, file_path, start, min(start + PAGES_PER_TASK, total)))
+
+        for _ in range(window or DEFAULT_WINDOW):
+            submit_next()
+
+        done = 0
+        try:
+            while pending:
+                pages = pending.popleft().result()
+                # Keep the pool busy while this range is read
+                submit_next()
+                yield from pages
+                done += len(pages)
+                if on_progress:
+                    on_progress(done, total)
+        finally:
+            # Stop queued ranges if the caller gives up early (e.g. text limit reached)
+            for future in pending:
+                future.cancel()
+
+    def _iter_pdf(self, file_path, on_progress=None):
+        """Parse PDF file page by page"""
         try:
             with open(file_path, 'rb') as file:
                 pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    text.append(page.extract_text())
-            return '\n'.join(text)
+                total = len(pdf_reader.pages)
+                self._check_page_count(total)
+                for number, page in enumerate(pdf_reader.pages, start=1):
+                    yield page.extract_text()
+                    if on_progress:
+                        on_progress(number, total)
+        except DocumentLimitError:
+            raise
         except Exception as e:
             raise Exception(f"Failed to parse PDF: {str(e)}")
-    
-    def _parse_docx(self, file_path):
-        """Parse DOCX file"""
+
+    def _iter_docx(self, file_path):
+        """Parse DOCX file, one section per heading"""
         try:
             doc = DocxDocument(file_path)
-            text = []
+            section = []
             for paragraph in doc.paragraphs:
-                if paragraph.text.strip():
-                    text.append(paragraph.text)
-            return '\n'.join(text)
+                if not paragraph.text.strip():
+                    continue
+                if section and paragraph.style is not None and paragraph.style.name.startswith('Heading'):
+                    yield '\n'.join(section)
+                    section = []
+                section.append(paragraph.text)
+            if section:
+                yield '\n'.join(section)
         except Exception as e:
             raise Exception(f"Failed to parse DOCX: {str(e)}")
-    
-    def _parse_txt(self, file_path):
-        """Parse TXT file"""
+
+    def _iter_txt(self, file_path):
+        """Parse TXT file in fixed-size blocks"""
         try:
             with open(file_path, 'r', encoding='utf-8') as file:
-                return file.read()
+                while True:
+                    block = file.read(TXT_READ_SIZE)
+                    if not block:
+                        break
+                    yield block
         except Exception as e:
             raise Exception(f"Failed to parse TXT: {str(e)}")
-    
+
+    def _pdf_page_count(self, file_path):
+        try:
+            with open(file_path, 'rb') as file:
+                total = len(PyPDF2.PdfReader(file).pages)
+        except Exception as e:
+            raise Exception(f"Failed to parse PDF: {str(e)}")
+        self._check_page_count(total)
+        return total
+
+    def _join(self, sections, separator):
+        """Join sections as they arrive, refusing to build text larger than the limit"""
+        text = io.StringIO()
+        size = 0
+        for index, section in enumerate(sections):
+            section = section or ''
+            size += len(section.encode('utf-8')) + len(separator)
+            if size > self.max_text_bytes:
+                sections.close()
+                raise DocumentLimitError(f"Extracted text exceeds {self.max_text_bytes} bytes")
+            if index:
+                text.write(separator)
+            text.write(section)
+        return text.getvalue()
+
+    def _check_file_size(self, file_path):
+        size = os.path.getsize(file_path)
+        if size > self.max_file_bytes:
+            raise DocumentLimitError(f"File is {size} bytes, the limit is {self.max_file_bytes}")
+
+    def _check_page_count(self, total):
+        if total > self.max_pages:
+            raise DocumentLimitError(f"Document has {total} pages, the limit is {self.max_pages}")
+
     def parse_notion_url(self, url):
         """
         Parse content from a Notion page URL
@@ -56,3 +172,20 @@ class DocumentParser:
         # Placeholder - would need Notion API token and implementation
         raise NotImplementedError("Notion integration not yet implemented")
 
+
+def extract_pdf_pages(file_path, start, end):
+    """Extract the text of pages [start, end) in a worker process"""
+    try:
+        with open(file_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            return [pdf_reader.pages[i].extract_text() for i in range(start, end)]
+    except Exception as e:
+        raise Exception(f"Failed to parse PDF pages {start + 1}-{end}: {str(e)}")
+
+
+def parse_document(file_path, file_type):
+    """
+    Module-level entry point so parsing can run in a worker process
+    without importing the Flask app
+    """
+    return DocumentParser().parse(file_path, file_type)
@@ -0,0 +1,144 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import cached_property
+from models import Form
+from services.answer_cache import form_fingerprint
+
+SNAPSHOT_FIELDS = (
+    'id', 'user_id', 'title', 'description', 'cta_type', 'fields', 'context',
+    'context_documents', 'template_type', 'embed_settings', 'ai_settings', 'updated_at',
+)
+
+
+class FormSnapshot:
+    """Detached, read-only copy of the Form columns the chat path needs"""
+
+    def __init__(self, form):
+        for field in SNAPSHOT_FIELDS:
+            setattr(self, field, getattr(form, field))
+
+    @cached_property
+    def fingerprint(self):
+        """Answer cache fingerprint, hashed once per snapshot"""
+        return form_fingerprint(self)
+
+
+class FormCache:
+    """
+    Per-worker LRU of form snapshots and rendered system prompt prefixes.
+
+    Entries are dropped explicitly when a form changes. Other workers see the
+    change through a shared version counter when FORM_CACHE_REDIS_URL is set,
+    otherwise after FORM_CACHE_TTL seconds.
+    """
+
+    def __init__(self):
+        self.max_entries = int(os.getenv('FORM_CACHE_SIZE', 512))
+        self.ttl = float(os.getenv('FORM_CACHE_TTL', 30))
+        self.redis_url = os.getenv('FORM_CACHE_REDIS_URL')
+        self.hits = 0
+        self.misses = 0
+        self._forms = OrderedDict()    # form_id -> (snapshot, loaded_at, version)
+        self._prompts = OrderedDict()  # (form_id, updated_at) -> prompt prefix
+        self._lock = threading.Lock()
+        self._redis = None
+
+    def get(self, form_id):
+        """Snapshot of the form, loading it from the database on a miss; None if it doesn't exist"""
+        version = self._shared_version(form_id)
+        snapshot, now = self._cached(form_id, version)
+        if snapshot is not None:
+            return snapshot
+        return self._store(form_id, Form.query.get(form_id), now, version)
+
+    async def get_async(self, form_id, session):
+        """get() for the ASGI app, loading through an AsyncSession"""
+        version = await asyncio.to_thread(self._shared_version, form_id) if self.redis_url else None
+        snapshot, now = self._cached(form_id, version)
+        if snapshot is not None:
+            return snapshot
+        return self._store(form_id, await session.get(Form, form_id), now, version)
+
+    def _cached(self, form_id, version):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._forms.get(form_id)
+            if entry and now - entry[1] < self.ttl and entry[2] == version:
+                self._forms.move_to_end(form_id)
+                self.hits += 1
+                return entry[0], now
+            self.misses += 1
+        return None, now
+
+    def _store(self, form_id, form, now, version):
+        if form is None:
+            return None
+
+        snapshot = FormSnapshot(form)
+        with self._lock:
+            self._forms[form_id] = (snapshot, now, version)
+            self._forms.move_to_end(form_id)
+            self._evict(self._forms)
+        return snapshot
+
+    def prompt(self, form, render):
+        """Rendered prompt prefix for this version of the form"""
+        key = (form.id, form.updated_at)
+
+        with self._lock:
+            prompt = self._prompts.get(key)
+            if prompt is not None:
+                self._prompts.move_to_end(key)
+                return prompt
+
+        prompt = render(form)
+        with self._lock:
+            self._prompts[key] = prompt
+            self._evict(self._prompts)
+        return prompt
+
+    def invalidate(self, form_id):
+        """Forget a form in this worker and tell the others"""
+        with self._lock:
+            self._forms.pop(form_id, None)
+            for key in [key for key in self._prompts if key[0] == form_id]:
+                del self._prompts[key]
+
+        redis = self._get_redis()
+        if redis is not None:
+            try:
+                redis.incr(self._version_key(form_id))
+            except Exception as e:
+                print(f"Form Cache Error: {str(e)}")
+
+    def _evict(self, entries):
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def _version_key(self, form_id):
+        return f"form_cache:version:{form_id}"
+
+    def _shared_version(self, form_id):
+        redis = self._get_redis()
+        if redis is None:
+            return None
+        try:
+            return redis.get(self._version_key(form_id))
+        except Exception as e:
+            # Fall back to the TTL while the shared backend is unavailable
+            print(f"Form Cache Error: {str(e)}")
+            return None
+
+    def _get_redis(self):
+        if not self.redis_url:
+            return None
+        if self._redis is None:
+            import redis
+            self._redis = redis.Redis.from_url(self.redis_url, socket_timeout=0.1)
+        return self._redis
+
+
+form_cache = FormCache()
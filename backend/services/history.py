@@ -0,0 +1,60 @@
+import os
+from services.tokens import estimate_tokens
+
+# Per-message overhead for role and separators in the chat format
+MESSAGE_OVERHEAD = 4
+
+
+class HistoryBuilder:
+    """
+    Packs the most recent turns under a token budget and folds older
+    turns into a rolling summary that is updated incrementally
+    """
+
+    def __init__(self, summarize):
+        # summarize(previous_summary, messages) -> new summary text
+        self.summarize = summarize
+        self.default_budget = int(os.getenv('HISTORY_TOKEN_BUDGET', 1500))
+        # Fold down to this share of the budget so the next few turns fit without another summary call
+        self.refold_ratio = float(os.getenv('HISTORY_REFOLD_RATIO', 0.6))
+
+    def build(self, conversation_history, summary_state, budget=None, offset=0):
+        """
+        Return (summary_text, recent_messages, summary_state).
+        summary_state is {'text': ..., 'message_count': ...} where message_count
+        is how many leading messages the summary already covers. offset is the
+        number of earlier messages not included in conversation_history.
+        """
+        budget = budget or self.default_budget
+        summary_state = summary_state or {}
+        summary = summary_state.get('text', '')
+        summarized = max(summary_state.get('message_count', 0) - offset, 0)
+
+        window_budget = max(budget - estimate_tokens(summary), 0)
+        start = self._window_start(conversation_history, summarized, window_budget)
+
+        if start > summarized:
+            # Some unsummarized turns no longer fit, fold them (and a little more) into the summary
+            fold_until = self._window_start(conversation_history, summarized, int(window_budget * self.refold_ratio))
+            try:
+                summary = self.summarize(summary, conversation_history[summarized:fold_until])
+                summary_state = {'text': summary, 'message_count': offset + fold_until}
+                start = fold_until
+            except Exception as e:
+                # Keep the old summary and retry the fold on the next turn
+                print(f"History Summary Error: {str(e)}")
+
+        return summary, conversation_history[start:], summary_state
+
+    def _window_start(self, messages, floor, budget):
+        """Index of the oldest message that still fits, never going below floor"""
+        start = len(messages)
+        used = 0
+        while start > floor:
+            tokens = estimate_tokens(messages[start - 1]['content']) + MESSAGE_OVERHEAD
+            # Always keep the latest message even if it alone exceeds the budget
+            if used + tokens > budget and start < len(messages):
+                break
+            used += tokens
+            start -= 1
+        return start
@@ -0,0 +1,260 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from models import Document, DocumentJob, Form, ParsedContentCache, db
+from services.blob_store import blob_store
+from services.document_parser import PARSER_VERSION, DocumentParser, parse_document
+from services.form_cache import form_cache
+from services.answer_cache import answer_cache
+from services import metrics
+from services.retrieval import RetrievalService
+
+
+class IngestionService:
+    """
+    Runs document parsing off the request path. Parsing is CPU-bound, so it
+    runs in a process pool; a small thread pool waits on it and writes the
+    results back to the database. A recovery thread per process resubmits
+    jobs that a restarted or crashed worker left queued or processing.
+    """
+
+    def __init__(self):
+        self.max_workers = int(os.getenv('INGESTION_WORKERS', os.cpu_count() or 2))
+        self.max_attempts = int(os.getenv('INGESTION_MAX_ATTEMPTS', 3))
+        # A job left 'processing' this long without progress (e.g. its worker died) is claimed again
+        self.claim_timeout = float(os.getenv('INGESTION_CLAIM_TIMEOUT', 600))
+        # Seconds between recovery passes; queued jobs older than this are resubmitted
+        self.recovery_interval = float(os.getenv('INGESTION_RECOVERY_INTERVAL', 60))
+        self.app = None
+        self.parser = DocumentParser()
+        self.retrieval = RetrievalService()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._processes = None
+        self._threads = None
+        self._recovery_pid = None
+        self._submitted = set()  # job ids waiting in or running on this process's pool
+
+    def init_app(self, app):
+        self.app = app
+        # Pick up jobs left behind by a previous process once this one serves requests
+        app.before_request(self._ensure_recovery)
+
+    def submit(self, job_id):
+        """Queue a committed DocumentJob for processing"""
+        with self._lock:
+            if job_id in self._submitted:
+                return
+            self._submitted.add(job_id)
+        self._get_threads().submit(self._run, job_id)
+
+    def recover(self):
+        """Resubmit queued jobs nobody picked up and processing jobs whose worker went away"""
+        now = datetime.utcnow()
+        job_ids = [job_id for (job_id,) in db.session.query(DocumentJob.id).filter(or_(
+            and_(DocumentJob.status == 'queued',
+                 DocumentJob.updated_at < now - timedelta(seconds=self.recovery_interval)),
+            and_(DocumentJob.status == 'processing',
+                 DocumentJob.updated_at < now - timedelta(seconds=self.claim_timeout))
+        )).order_by(DocumentJob.created_at).all()]
+        db.session.rollback()
+
+        for job_id in job_ids:
+            self.submit(job_id)
+        return len(job_ids)
+
+    def _claim(self, job_id):
+        """Mark the job processing and return it, or None if it is done or another worker has it"""
+        stale = datetime.utcnow() - timedelta(seconds=self.claim_timeout)
+        job = DocumentJob.query.filter(DocumentJob.id == job_id, or_(
+            DocumentJob.status == 'queued',
+            and_(DocumentJob.status == 'processing', DocumentJob.updated_at < stale)
+        )).with_for_update(skip_locked=True).first()
+
+        if job is None:
+            db.session.rollback()
+            return None
+
+        if job.attempts >= self.max_attempts:
+            # Worker keeps dying on this file (e.g. out of memory); stop retrying it
+            self._fail(job, f"Parsing did not finish after {job.attempts} attempts")
+            return None
+
+        job.attempts += 1
+        self._update(job, status='processing', progress=0.1)
+        return job
+
+    def _run(self, job_id):
+        try:
+            with self.app.app_context():
+                self._process(job_id)
+        finally:
+            with self._lock:
+                self._submitted.discard(job_id)
+
+    def _process(self, job_id):
+        job = self._claim(job_id)
+        if job is None:
+            return
+
+        # Same bytes parsed by the same parser version: skip parsing entirely
+        parsed_content = self._cached_content(job)
+
+        if parsed_content is None:
+            try:
+                started = time.monotonic()
+                parsed_content = self._parse(job)
+                metrics.document_parse_duration.observe(time.monotonic() - started, file_type=job.file_type)
+            except Exception as e:
+                db.session.rollback()
+                self._fail(job, f"Failed to parse document: {str(e)}")
+                return
+            self._store_content(job, parsed_content)
+        else:
+            metrics.document_parse_cache_hits.inc(file_type=job.file_type)
+
+        self._update(job, progress=0.8)
+
+        try:
+            self._complete(job, parsed_content)
+        except Exception as e:
+            db.session.rollback()
+            self._fail(job, f"Failed to save document: {str(e)}")
+
+    def _parse(self, job):
+        processes = self._get_processes()
+        
+        if job.file_type == 'pdf':
+            # Page ranges of one PDF are spread across the pool
+            def on_progress(done, total):
+                self._update(job, progress=0.1 + 0.7 * done / total)
+            
+            return self.parser.parse(
+                job.file_path, job.file_type, executor=processes, on_progress=on_progress,
+                window=2 * self.max_workers
+            )
+        
+        return processes.submit(parse_document, job.file_path, job.file_type).result()
+
+    def _cached_content(self, job):
+        if not job.content_hash:
+            return None
+        cached = ParsedContentCache.query.filter_by(
+            content_hash=job.content_hash,
+            parser_version=PARSER_VERSION,
+            file_type=job.file_type
+        ).first()
+        return cached.content if cached else None
+
+    def _store_content(self, job, parsed_content):
+        if not job.content_hash:
+            return
+        try:
+            with db.session.begin_nested():
+                db.session.add(ParsedContentCache(
+                    content_hash=job.content_hash,
+                    parser_version=PARSER_VERSION,
+                    file_type=job.file_type,
+                    content=parsed_content
+                ))
+        except IntegrityError:
+            # Another worker cached the same file first
+            pass
+
+    def _complete(self, job, parsed_content):
+        """Store the parsed content and only now expose it to the form"""
+        document = Document.query.get(job.document_id)
+
+        if document:
+            # Re-parse of an existing document
+            document.parsed_content = parsed_content
+        else:
+            document = Document(
+                id=job.document_id,
+                form_id=job.form_id,
+                filename=job.filename,
+                file_type=job.file_type,
+                file_path=job.file_path,
+                content_hash=job.content_hash,
+                parsed_content=parsed_content
+            )
+            db.session.add(document)
+
+            form = Form.query.get(job.form_id)
+            form.context_documents = (form.context_documents or []) + [document.id]
+
+        self.retrieval.index_document(document)
+
+        job.status = 'completed'
+        job.progress = 1.0
+        job.updated_at = datetime.utcnow()
+        db.session.commit()
+        form_cache.invalidate(job.form_id)
+        answer_cache.invalidate(job.form_id)
+
+    def _update(self, job, **values):
+        for key, value in values.items():
+            setattr(job, key, value)
+        job.updated_at = datetime.utcnow()
+        db.session.commit()
+
+    def _fail(self, job, error):
+        job = DocumentJob.query.get(job.id)
+        # A failed first upload leaves no document behind, so drop its file reference
+        released = None
+        if not Document.query.get(job.document_id) and job.content_hash:
+            released = blob_store.release(job.content_hash)
+        self._update(job, status='failed', error=error)
+        if released:
+            blob_store.remove_released(job.content_hash, released)
+
+    def _ensure_recovery(self):
+        # Started lazily so every forked gunicorn worker gets its own thread
+        if self._recovery_pid == os.getpid():
+            return
+        with self._lock:
+            if self._recovery_pid == os.getpid():
+                return
+            self._recovery_pid = os.getpid()
+            threading.Thread(target=self._recover_loop, name='ingestion-recovery', daemon=True).start()
+
+    def _recover_loop(self):
+        while True:
+            with self.app.app_context():
+                try:
+                    self.recover()
+                except Exception as e:
+                    print(f"Ingestion Recovery Error: {str(e)}")
+                    db.session.rollback()
+            time.sleep(self.recovery_interval)
+
+    def _ensure_pools(self):
+        # Pools don't survive fork, so each gunicorn worker creates its own
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # spawn keeps parser processes free of the app's threads and DB connections
+            self._processes = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            self._threads = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='ingestion')
+            self._pid = os.getpid()
+
+    def _get_processes(self):
+        self._ensure_pools()
+        return self._processes
+
+    def _get_threads(self):
+        self._ensure_pools()
+        return self._threads
+
+
+ingestion_service = IngestionService()
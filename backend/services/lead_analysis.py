@@ -0,0 +1,194 @@
+import os
+import threading
+from datetime import datetime, timedelta
+from functools import partial
+import requests
+from sqlalchemy import and_, or_
+from models import ChatSession, Form, Lead, db
+from services.ai_service import AIService
+from services.form_cache import form_cache
+from services.lead_insights import complete_insights, session_insights
+from services.lead_tags import record_lead_tags
+from services.llm_client import CircuitOpenError
+
+
+class LeadAnalysisService:
+    """
+    Fills in a lead's pain points, buying signals and qualification level
+    after it has been saved. Leads with analysis_status 'pending' are the
+    queue; worker threads claim them with SELECT ... FOR UPDATE SKIP LOCKED,
+    so several processes can share it without other services.
+    """
+
+    def __init__(self):
+        self.workers = int(os.getenv('LEAD_ANALYSIS_WORKERS', 2))
+        self.poll_interval = float(os.getenv('LEAD_ANALYSIS_POLL_INTERVAL', 5.0))
+        self.max_attempts = int(os.getenv('LEAD_ANALYSIS_MAX_ATTEMPTS', 3))
+        self.retry_delay = float(os.getenv('LEAD_ANALYSIS_RETRY_DELAY', 30))
+        # A lead left 'processing' this long (e.g. its worker died) is claimed again
+        self.claim_timeout = float(os.getenv('LEAD_ANALYSIS_CLAIM_TIMEOUT', 300))
+        self.webhook_url = os.getenv('LEAD_ANALYSIS_WEBHOOK_URL')
+        self.webhook_timeout = float(os.getenv('LEAD_ANALYSIS_WEBHOOK_TIMEOUT', 5.0))
+        self.app = None
+        self.ai_service = AIService()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._threads = []
+        self._pid = None
+
+    def init_app(self, app):
+        self.app = app
+        # Pick up leads left pending by a previous process once this one serves requests
+        app.before_request(self._ensure_workers)
+
+    def notify(self):
+        """Wake the workers after committing a pending lead"""
+        self._ensure_workers()
+        self._wakeup.set()
+
+    def process_pending(self):
+        """Analyze queued leads until none are left; returns how many were processed"""
+        processed = 0
+        while True:
+            lead_id = self._claim()
+            if lead_id is None:
+                return processed
+            self._process(lead_id)
+            processed += 1
+
+    def _claim(self):
+        """Mark the oldest available lead as processing and return its id"""
+        now = datetime.utcnow()
+        retry_after = now - timedelta(seconds=self.retry_delay)
+        stale = now - timedelta(seconds=self.claim_timeout)
+        lead = Lead.query.filter(or_(
+            and_(Lead.analysis_status == 'pending', or_(
+                Lead.analysis_claimed_at.is_(None), Lead.analysis_claimed_at < retry_after
+            )),
+            and_(Lead.analysis_status == 'processing', Lead.analysis_claimed_at < stale)
+        )).order_by(Lead.created_at).with_for_update(skip_locked=True).first()
+
+        if lead is None:
+            db.session.rollback()
+            return None
+
+        lead.analysis_status = 'processing'
+        lead.analysis_attempts += 1
+        lead.analysis_claimed_at = now
+        db.session.commit()
+        return lead.id
+
+    def _process(self, lead_id):
+        lead = Lead.query.get(lead_id)
+        attempts = lead.analysis_attempts
+        analysis, previous = self._analysis(lead)
+
+        # No transaction is held during the model call; the claim stays on the row
+        db.session.rollback()
+        try:
+            insights = analysis()
+        except CircuitOpenError:
+            lead = self._still_claimed(lead_id, attempts)
+            if lead is None:
+                return
+            # Upstream is down; wait for it without using up an attempt
+            lead.analysis_status = 'pending'
+            lead.analysis_attempts -= 1
+            db.session.commit()
+            return
+        except Exception as e:
+            print(f"Lead Analysis Error: {str(e)}")
+            lead = self._still_claimed(lead_id, attempts)
+            if lead is None:
+                return
+            failed = lead.analysis_attempts >= self.max_attempts
+            lead.analysis_status = 'failed' if failed else 'pending'
+            lead.analysis_error = str(e)
+            db.session.commit()
+            if failed:
+                self._send_webhook(lead)
+            return
+
+        lead = self._still_claimed(lead_id, attempts)
+        if lead is None:
+            return
+        insights = complete_insights(insights, previous)
+        lead.pain_points = insights['pain_points']
+        lead.buying_signals = insights['buying_signals']
+        lead.qualification_level = insights['qualification_level']
+        lead.analysis_status = 'completed'
+        lead.analysis_error = None
+        lead.analyzed_at = datetime.utcnow()
+        record_lead_tags(lead)
+        db.session.commit()
+
+        self._send_webhook(lead)
+
+    def _still_claimed(self, lead_id, attempts):
+        """The lead, locked, unless another worker reclaimed it during the model call"""
+        lead = Lead.query.filter_by(id=lead_id).with_for_update().first()
+        if lead is None or lead.analysis_status != 'processing' or lead.analysis_attempts != attempts:
+            db.session.rollback()
+            return None
+        return lead
+
+    def _analysis(self, lead):
+        """
+        The model call for a lead, bound to plain values so it can run outside
+        a transaction: finish the session's running insights if there are any,
+        else analyze the whole transcript. Returns the call and the insights it
+        starts from.
+        """
+        history = list(lead.conversation_history or [])
+        responses = lead.responses
+        insights = session_insights(ChatSession.query.filter_by(session_id=lead.session_id).first())
+        if insights:
+            covered = insights.get('message_count', 0)
+            return partial(self.ai_service.update_insights, insights, history[covered:], responses), insights
+        return partial(self.ai_service.analyze_lead, history, responses, form_cache.get(lead.form_id)), None
+
+    def _send_webhook(self, lead):
+        """POST the finished lead to the form's webhook, or the default one"""
+        form = Form.query.get(lead.form_id)
+        url = (form.ai_settings or {}).get('analysis_webhook_url') if form else None
+        url = url or self.webhook_url
+        if not url:
+            return
+
+        payload = lead.to_dict([f for f in Lead.FIELDS if f != 'conversation_history'])
+        try:
+            requests.post(url, json={'event': 'lead.analyzed', 'lead': payload}, timeout=self.webhook_timeout)
+        except Exception as e:
+            print(f"Lead Webhook Error: {str(e)}")
+
+    def _ensure_workers(self):
+        # Started lazily so every forked gunicorn worker gets its own threads
+        if self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._threads = [
+                threading.Thread(target=self._run, name=f'lead-analysis-{i}', daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def _run(self):
+        while True:
+            with self.app.app_context():
+                try:
+                    processed = self.process_pending()
+                except Exception as e:
+                    print(f"Lead Analysis Error: {str(e)}")
+                    db.session.rollback()
+                    processed = 0
+            if not processed:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+
+lead_analysis = LeadAnalysisService()
@@ -0,0 +1,188 @@
+import csv
+import io
+import json
+import zlib
+from sqlalchemy.orm import load_only
+from models import Lead
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+EXPORT_FIELDS = (
+    'id', 'contact_info', 'qualification_level', 'pain_points', 'buying_signals', 'created_at',
+)
+
+CSV_HEADER = [
+    'ID',
+    'Name',
+    'Email',
+    'Phone',
+    'Qualification Level',
+    'Pain Points',
+    'Buying Signals',
+    'Created At'
+]
+
+ROWS_PER_FETCH = 500
+# Bytes buffered before a text chunk is sent
+CHUNK_SIZE = 64 * 1024
+ROWS_PER_PARQUET_GROUP = 5000
+
+
+def iter_leads(form_id):
+    """Stream a form's leads from a server-side cursor, without transcripts"""
+    return Lead.query.options(
+        load_only(*[getattr(Lead, f) for f in EXPORT_FIELDS])
+    ).filter_by(form_id=form_id).order_by(
+        Lead.created_at.desc(), Lead.id.desc()
+    ).execution_options(stream_results=True).yield_per(ROWS_PER_FETCH)
+
+
+def iter_csv(leads):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def drain():
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data.encode('utf-8')
+
+    writer.writerow(CSV_HEADER)
+    yield drain()
+
+    for lead in leads:
+        contact_info = lead.contact_info or {}
+        writer.writerow([
+            lead.id,
+            contact_info.get('name', ''),
+            contact_info.get('email', ''),
+            contact_info.get('phone', ''),
+            lead.qualification_level,
+            '; '.join(lead.pain_points or []),
+            '; '.join(lead.buying_signals or []),
+            lead.created_at.isoformat()
+        ])
+        if buffer.tell() >= CHUNK_SIZE:
+            yield drain()
+
+    yield drain()
+
+
+def iter_ndjson(leads):
+    lines = []
+    size = 0
+    for lead in leads:
+        line = json.dumps(lead.to_dict(EXPORT_FIELDS)) + '\n'
+        lines.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield ''.join(lines).encode('utf-8')
+            lines = []
+            size = 0
+
+    yield ''.join(lines).encode('utf-8')
+
+
+class ChunkSink:
+    """Write-only file object that hands written bytes back out in chunks"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_parquet(leads):
+    """Write one row group at a time so only a group is held in memory"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('id', pa.string()),
+        ('name', pa.string()),
+        ('email', pa.string()),
+        ('phone', pa.string()),
+        ('qualification_level', pa.string()),
+        ('pain_points', pa.list_(pa.string())),
+        ('buying_signals', pa.list_(pa.string())),
+        ('created_at', pa.timestamp('us')),
+    ])
+
+    sink = ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    rows = []
+
+    def write_group():
+        writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+        rows.clear()
+        return sink.drain()
+
+    for lead in leads:
+        contact_info = lead.contact_info or {}
+        rows.append({
+            'id': lead.id,
+            'name': contact_info.get('name'),
+            'email': contact_info.get('email'),
+            'phone': contact_info.get('phone'),
+            'qualification_level': lead.qualification_level,
+            'pain_points': lead.pain_points or [],
+            'buying_signals': lead.buying_signals or [],
+            'created_at': lead.created_at,
+        })
+        if len(rows) >= ROWS_PER_PARQUET_GROUP:
+            yield write_group()
+
+    if rows:
+        yield write_group()
+
+    writer.close()
+    yield sink.drain()
+
+
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(form_id, export_format, compress=False):
+    """Byte chunks of a lead export in the given format"""
+    leads = iter_leads(form_id)
+
+    if export_format == 'csv':
+        chunks = iter_csv(leads)
+    elif export_format == 'ndjson':
+        chunks = iter_ndjson(leads)
+    elif export_format == 'parquet':
+        # Parquet pages are already compressed
+        return iter_parquet(leads)
+    else:
+        raise ValueError(f"Unsupported export format: {export_format}")
+
+    return gzip_stream(chunks) if compress else chunks
@@ -0,0 +1,112 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from models import ChatSession, db
+from services.ai_service import AIService
+
+INSIGHT_KEYS = ('pain_points', 'buying_signals', 'qualification_level', 'summary')
+
+
+def session_insights(chat_session):
+    """Running insight state of a chat session, or None"""
+    return (chat_session.context_data or {}).get('insights') if chat_session else None
+
+
+def covers_transcript(insights, message_count):
+    return bool(insights) and insights.get('message_count', 0) >= message_count
+
+
+def complete_insights(insights, previous=None):
+    """
+    Every insight key from a model response. Keys the model left out or set
+    to null keep the previous value, else the analyze_lead default.
+    """
+    previous = previous or {}
+    defaults = AIService._default_analysis()
+    completed = {}
+    for key in INSIGHT_KEYS:
+        value = insights.get(key)
+        if value is None:
+            value = previous.get(key)
+        completed[key] = defaults[key] if value is None else value
+    return completed
+
+
+class LeadInsightService:
+    """
+    Keeps provisional lead insights in ChatSession.context_data['insights'],
+    updated after each turn from the previous state plus the new messages.
+    Updates run in a thread pool after the turn is committed.
+    """
+
+    def __init__(self):
+        self.max_workers = int(os.getenv('INSIGHT_WORKERS', 4))
+        self.default_enabled = os.getenv('INCREMENTAL_INSIGHTS', 'false').lower() == 'true'
+        self.app = None
+        self.ai_service = AIService()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._threads = None
+
+    def init_app(self, app):
+        self.app = app
+
+    def enabled_for(self, form):
+        return (form.ai_settings or {}).get('incremental_insights', self.default_enabled)
+
+    def schedule(self, form, chat_session_id):
+        """Queue an insight update for a session whose latest turn is committed"""
+        if self.enabled_for(form):
+            self._get_threads().submit(self._run, chat_session_id)
+
+    def _run(self, chat_session_id):
+        with self.app.app_context():
+            try:
+                self.update(chat_session_id)
+            except Exception as e:
+                print(f"Insight Update Error: {str(e)}")
+                db.session.rollback()
+
+    def update(self, chat_session_id):
+        chat_session = ChatSession.query.get(chat_session_id)
+        if not chat_session:
+            return
+
+        previous = session_insights(chat_session) or {}
+        covered = previous.get('message_count', 0)
+        messages = chat_session.get_messages(since_seq=covered)
+        if not messages:
+            return
+        message_count = covered + len(messages)
+
+        # No lock is held during the model call; the chat turn may commit meanwhile
+        db.session.rollback()
+        insights = self.ai_service.update_insights(previous, messages)
+
+        chat_session = ChatSession.query.filter_by(id=chat_session_id).with_for_update().first()
+        current = session_insights(chat_session) or {}
+        if current.get('message_count', 0) >= message_count:
+            # A concurrent update got further
+            db.session.rollback()
+            return
+
+        state = complete_insights(insights, previous)
+        state['message_count'] = message_count
+        state['updated_at'] = datetime.utcnow().isoformat()
+        # Only the insights key is replaced. If a chat turn overwrites it with an older
+        # state, the next update simply covers a longer delta.
+        chat_session.context_data = {**(chat_session.context_data or {}), 'insights': state}
+        db.session.commit()
+
+    def _get_threads(self):
+        # Pools don't survive fork, so each gunicorn worker creates its own
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._threads = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='insights')
+                    self._pid = os.getpid()
+        return self._threads
+
+
+lead_insights = LeadInsightService()
@@ -0,0 +1,262 @@
+import os
+import re
+import threading
+from collections import OrderedDict, deque
+
+# Keyword dictionaries by label; forms add their own in ai_settings.signal_dictionaries
+DEFAULT_DICTIONARIES = {
+    'ready': [
+        'ready', 'sign up', 'register', 'book', 'schedule', 'interested', 'get started',
+    ],
+    'buying_signal': [
+        'pricing', 'price', 'quote', 'budget', 'demo', 'trial', 'contract', 'purchase',
+        'buy', 'decision maker', 'approved', 'asap', 'urgent', 'roll out', 'implementation',
+    ],
+    'pain_point': [
+        'too slow', 'manual', 'time consuming', 'expensive', 'frustrated', 'struggling',
+        'difficult', 'error prone', 'outdated', 'not working', 'bottleneck', 'churn',
+    ],
+    'negative': [
+        'just browsing', 'just looking', 'student', 'homework', 'not interested',
+        'no budget', 'maybe later', 'not now',
+    ],
+}
+
+EMAIL_PATTERN = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+PHONE_PATTERN = re.compile(r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b')
+COMPANY_NAME = r"[A-Z][\w&.\-]*(?:\s+[A-Z][\w&.\-]*){0,3}"
+# Only explicit cues: "we are Looking..." or "I am from Germany" are not companies
+COMPANY_PATTERN = re.compile(
+    r"(?i:\b(?:i work (?:at|for)|(?:my|our) company(?: name)? is|company name is))\s+"
+    r"(" + COMPANY_NAME + r")"
+)
+COMPANY_SUFFIX_PATTERN = re.compile(
+    r"(?i:\bfrom)\s+(" + COMPANY_NAME + r"\s+(?:Inc|Ltd|LLC|GmbH|Corp|AG|plc|Limited)\b\.?)"
+)
+BUDGET_PATTERN = re.compile(
+    r'(?:\$\s?\d[\d,]*(?:\.\d+)?(?:\s?(?:k|m|thousand|million)\b)?'
+    r'|\b\d[\d,]*(?:\.\d+)?\s?(?:k|m|thousand|million)?\s?(?:usd|dollars|eur|euros)\b)',
+    re.IGNORECASE
+)
+TIMELINE_PATTERN = re.compile(
+    r'\b(?:asap|immediately|(?:this|next) (?:week|month|quarter|year)'
+    r'|(?:within|in) (?:\d+|a|an|one|two|three|four|six) (?:days?|weeks?|months?)'
+    r'|by (?:q[1-4]|end of (?:the )?(?:week|month|quarter|year)'
+    r'|(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*))\b',
+    re.IGNORECASE
+)
+TEAM_SIZE_PATTERN = re.compile(
+    r'\bteam of (\d[\d,]*)'
+    r'|\b(\d[\d,]*)\+?\s?-?\s?(?:people|person|employees|staff|engineers|developers|agents|reps|users|seats|members)\b',
+    re.IGNORECASE
+)
+
+# Score weights and the hot/warm boundaries of the provisional qualification
+WEIGHTS = {
+    'ready': 3,
+    'buying_signal': 2,
+    'pain_point': 1,
+    'negative': -3,
+    'budget': 2,
+    'timeline': 2,
+    'team_size': 1,
+    'company': 1,
+    'contact': 1,
+}
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over lowercase keywords: every keyword is found
+    in a single pass over the text. Matches must fall on word boundaries.
+    """
+
+    def __init__(self, dictionaries):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+
+        for label, keywords in dictionaries.items():
+            for keyword in keywords:
+                self._add(keyword.lower().strip(), label)
+
+        # Breadth-first so each node's failure link is known before its children's
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                state = self.fail[node]
+                while state and char not in self.goto[state]:
+                    state = self.fail[state]
+                self.fail[child] = self.goto[state].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def _add(self, keyword, label):
+        if not keyword:
+            return
+        node = 0
+        for char in keyword:
+            child = self.goto[node].get(char)
+            if child is None:
+                child = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[node][char] = child
+            node = child
+        self.output[node].append((label, keyword))
+
+    def find(self, text):
+        """(label, keyword) pairs found in the text, in order of their end"""
+        text = text.lower()
+        matches = []
+        node = 0
+        for end, char in enumerate(text, start=1):
+            while node and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            for label, keyword in self.output[node]:
+                start = end - len(keyword)
+                if (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum()):
+                    matches.append((label, keyword))
+        return matches
+
+
+def extract(message):
+    """Contact details and qualification facts stated in a message"""
+    extracted = {}
+    for field, pattern in (('email', EMAIL_PATTERN), ('phone', PHONE_PATTERN),
+                           ('budget', BUDGET_PATTERN), ('timeline', TIMELINE_PATTERN)):
+        match = pattern.search(message)
+        if match:
+            extracted[field] = match.group()
+
+    match = COMPANY_PATTERN.search(message)
+    if match:
+        extracted['company'] = match.group(1).rstrip('.')
+    else:
+        match = COMPANY_SUFFIX_PATTERN.search(message)
+        if match:
+            extracted['company'] = match.group(1)
+
+    match = TEAM_SIZE_PATTERN.search(message)
+    if match:
+        extracted['team_size'] = int((match.group(1) or match.group(2)).replace(',', ''))
+
+    return extracted
+
+
+class LeadSignalEngine:
+    """
+    Rule-based extraction and provisional hot/warm/cold scoring. Matchers are
+    compiled once per form version and kept in a small per-worker LRU.
+    """
+
+    def __init__(self):
+        self.hot_score = int(os.getenv('LEAD_RULES_HOT_SCORE', 7))
+        self.warm_score = int(os.getenv('LEAD_RULES_WARM_SCORE', 3))
+        # How far past the hot boundary a lead must be to skip the model analysis
+        self.clear_margin = int(os.getenv('LEAD_RULES_CLEAR_MARGIN', 3))
+        self.skip_analysis = os.getenv('LEAD_RULES_SKIP_ANALYSIS', 'true').lower() == 'true'
+        self.max_matchers = int(os.getenv('LEAD_RULES_CACHE_SIZE', 256))
+        self.default_matcher = KeywordMatcher(DEFAULT_DICTIONARIES)
+        self._matchers = OrderedDict()
+        self._lock = threading.Lock()
+
+    def matcher_for(self, form):
+        custom = (form.ai_settings or {}).get('signal_dictionaries') if form else None
+        if not custom or not isinstance(custom, dict):
+            return self.default_matcher
+
+        key = (form.id, form.updated_at)
+        with self._lock:
+            matcher = self._matchers.get(key)
+            if matcher is not None:
+                self._matchers.move_to_end(key)
+                return matcher
+
+        dictionaries = {label: list(keywords) for label, keywords in DEFAULT_DICTIONARIES.items()}
+        for label, keywords in custom.items():
+            # Settings are user input; a bad entry must not break every chat turn
+            if not isinstance(keywords, list):
+                print(f"Lead Signals Error: signal_dictionaries[{label!r}] of form {form.id} is not a list")
+                continue
+            dictionaries.setdefault(label, []).extend(
+                keyword for keyword in keywords if isinstance(keyword, str) and keyword.strip()
+            )
+        matcher = KeywordMatcher(dictionaries)
+
+        with self._lock:
+            self._matchers[key] = matcher
+            while len(self._matchers) > self.max_matchers:
+                self._matchers.popitem(last=False)
+        return matcher
+
+    def analyze_message(self, form, message):
+        """Keyword labels matched in one message and the facts extracted from it"""
+        labels = {label for label, _ in self.matcher_for(form).find(message or '')}
+        return labels, extract(message or '')
+
+    def score(self, form, conversation_history, form_data=None):
+        """
+        Provisional insights for a whole conversation: pain points, buying
+        signals, qualification level, the raw score and whether it is clear-cut
+        """
+        matcher = self.matcher_for(form)
+        texts = [msg['content'] for msg in conversation_history if msg.get('role') == 'user']
+        texts += [str(value) for value in (form_data or {}).values() if value]
+
+        found = OrderedDict()
+        extracted = {}
+        for text in texts:
+            for label, keyword in matcher.find(text):
+                found.setdefault((label, keyword), None)
+            for field, value in extract(text).items():
+                extracted.setdefault(field, value)
+
+        by_label = {}
+        for label, keyword in found:
+            by_label.setdefault(label, []).append(keyword)
+
+        score = sum(WEIGHTS.get(label, 0) * len(keywords) for label, keywords in by_label.items())
+        for field in ('budget', 'timeline', 'team_size', 'company'):
+            if field in extracted:
+                score += WEIGHTS[field]
+        if 'email' in extracted or 'phone' in extracted:
+            score += WEIGHTS['contact']
+
+        buying_signals = list(by_label.get('buying_signal', []))
+        for field, title in (('budget', 'Budget'), ('timeline', 'Timeline'), ('team_size', 'Team size')):
+            if field in extracted:
+                buying_signals.append(f"{title}: {extracted[field]}")
+
+        if score >= self.hot_score:
+            level = 'hot'
+        elif score >= self.warm_score:
+            level = 'warm'
+        else:
+            level = 'cold'
+
+        clear_cut = score >= self.hot_score + self.clear_margin or (
+            'negative' in by_label and score <= 0
+        )
+
+        return {
+            'pain_points': by_label.get('pain_point', []),
+            'buying_signals': buying_signals,
+            'qualification_level': level,
+            'score': score,
+            'clear_cut': clear_cut,
+        }
+
+    def clear_cut_insights(self, form, conversation_history, form_data=None):
+        """Rule-based insights when they are decisive enough to skip the model analysis, else None"""
+        enabled = (form.ai_settings or {}).get('rule_scoring', self.skip_analysis) if form else self.skip_analysis
+        if not enabled:
+            return None
+        insights = self.score(form, conversation_history, form_data)
+        return insights if insights['clear_cut'] else None
+
+
+lead_signals = LeadSignalEngine()
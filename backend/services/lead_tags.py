@@ -0,0 +1,63 @@
+import re
+from models import Lead, LeadTag, LeadTagCount, db
+from services.upsert import upsert_increment
+
+# Tag kind -> Lead column it comes from
+TAG_KINDS = {
+    'pain_point': 'pain_points',
+    'buying_signal': 'buying_signals',
+}
+MAX_TAG_LENGTH = 255
+
+
+def normalize_tag(value):
+    return re.sub(r"\s+", " ", str(value)).strip()[:MAX_TAG_LENGTH]
+
+
+def record_lead_tags(lead, session=None):
+    """
+    Store a lead's pain points and buying signals as rows and bump the
+    per-form counters, in the lead's transaction
+    """
+    session = session or db.session
+    counters = []
+    for kind, column in TAG_KINDS.items():
+        values = {normalize_tag(v) for v in (getattr(lead, column) or [])}
+        values.discard('')
+        for value in values:
+            session.add(LeadTag(lead_id=lead.id, form_id=lead.form_id, kind=kind, value=value))
+            counters.append({'form_id': lead.form_id, 'kind': kind, 'value': value, 'count': 1})
+
+    upsert_increment(LeadTagCount, counters, ['form_id', 'kind', 'value'], session=session)
+
+
+def top_tags(form_id, kind, limit=5):
+    """Most frequent tags of one kind for a form, read from the counters"""
+    rows = LeadTagCount.query.filter_by(form_id=form_id, kind=kind).order_by(
+        LeadTagCount.count.desc()
+    ).limit(limit).all()
+    return [(row.value, row.count) for row in rows]
+
+
+def rebuild_lead_tags(batch_size=1000):
+    """Recreate every tag row and counter from the leads table; returns leads processed"""
+    LeadTag.query.delete()
+    LeadTagCount.query.delete()
+
+    processed = 0
+    last_id = ''
+    while True:
+        # Only the tag columns, never the transcripts
+        leads = Lead.query.with_entities(
+            Lead.id, Lead.form_id, Lead.pain_points, Lead.buying_signals
+        ).filter(Lead.id > last_id).order_by(Lead.id).limit(batch_size).all()
+        if not leads:
+            break
+
+        for lead in leads:
+            record_lead_tags(lead)
+        last_id = leads[-1].id
+        processed += len(leads)
+        db.session.flush()
+
+    return processed
@@ -0,0 +1,309 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+import httpx
+import openai
+from openai import AsyncOpenAI, OpenAI
+from services import metrics
+
+# Errors worth another attempt; anything else (bad request, auth) fails at once
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,  # includes APITimeoutError
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+LATENCY_WINDOW = 200
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Opens after a run of consecutive failures and rejects calls until the
+    cooldown passes, then lets a single trial call through
+    """
+
+    def __init__(self, failure_threshold, cooldown):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return 'half_open'
+        return 'open'
+
+    def before_call(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return
+            if state == 'half_open' and not self._trial_running:
+                self._trial_running = True
+                return
+        raise CircuitOpenError("LLM upstream is unavailable, circuit open")
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+
+    def release(self):
+        """End a call that says nothing about the upstream's health, freeing the trial slot"""
+        with self._lock:
+            self._trial_running = False
+
+
+class BaseLLMClient:
+    """
+    Settings, latency tracking, backoff and the circuit breaker shared by
+    the sync and async clients
+    """
+
+    def __init__(self):
+        self.max_retries = int(os.getenv('LLM_MAX_RETRIES', 2))
+        self.backoff_base = float(os.getenv('LLM_BACKOFF_BASE', 0.25))
+        self.backoff_max = float(os.getenv('LLM_BACKOFF_MAX', 4.0))
+        self.hedge = os.getenv('LLM_HEDGE', 'false').lower() == 'true'
+        self.hedge_min_samples = int(os.getenv('LLM_HEDGE_MIN_SAMPLES', 20))
+        self.max_connections = int(os.getenv('LLM_MAX_CONNECTIONS', 50))
+        self.breaker = CircuitBreaker(
+            int(os.getenv('LLM_BREAKER_FAILURES', 5)),
+            float(os.getenv('LLM_BREAKER_COOLDOWN', 30))
+        )
+        self._latencies = {}  # model -> recent successful latencies
+        self._lock = threading.Lock()
+
+    def http_options(self):
+        """Keyword arguments for an httpx client"""
+        return {
+            'timeout': httpx.Timeout(
+                float(os.getenv('LLM_READ_TIMEOUT', 30)),
+                connect=float(os.getenv('LLM_CONNECT_TIMEOUT', 3))
+            ),
+            'limits': httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=int(os.getenv('LLM_MAX_KEEPALIVE', 20)),
+                keepalive_expiry=float(os.getenv('LLM_KEEPALIVE_EXPIRY', 30))
+            ),
+        }
+
+    def p95(self, model):
+        with self._lock:
+            latencies = sorted(self._latencies.get(model, ()))
+        if len(latencies) < self.hedge_min_samples:
+            return None
+        return latencies[int(len(latencies) * 0.95) - 1]
+
+    def _backoff(self, attempt):
+        """Full jitter exponential backoff"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _record_call(self, kwargs, started, result):
+        elapsed = time.monotonic() - started
+        metrics.observe_llm(kwargs.get('model'), elapsed, kwargs.get('stream'), getattr(result, 'usage', None))
+        if kwargs.get('stream'):
+            return
+        with self._lock:
+            latencies = self._latencies.setdefault(kwargs.get('model'), deque(maxlen=LATENCY_WINDOW))
+            latencies.append(elapsed)
+
+    def _record_error(self, kwargs, error):
+        metrics.llm_errors.inc(model=kwargs.get('model'), error=type(error).__name__)
+
+    def _check_breaker(self, kwargs):
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError as e:
+            self._record_error(kwargs, e)
+            raise
+
+    def _retry_delay(self, attempt, error):
+        """Seconds to wait before the next attempt, or None to give up"""
+        self.breaker.record_failure()
+        if attempt >= self.max_retries:
+            return None
+        delay = self._backoff(attempt + 1)
+        print(f"OpenAI retry {attempt + 1}/{self.max_retries} in {delay:.2f}s: {str(error)}")
+        return delay
+
+
+class LLMClient(BaseLLMClient):
+    """
+    Chat completions with explicit timeouts, a sized connection pool,
+    jittered retries, optional hedging after the observed p95 latency and a
+    circuit breaker. Callers keep their own fallback for when it raises.
+    """
+
+    def __init__(self):
+        super().__init__()
+        # Retries are done here, with jitter and the breaker in the loop
+        self.client = OpenAI(
+            api_key=os.getenv('OPENAI_API_KEY'),
+            http_client=httpx.Client(**self.http_options()),
+            max_retries=0
+        )
+        self._executor = ThreadPoolExecutor(max_workers=self.max_connections, thread_name_prefix='llm-hedge')
+
+    def complete(self, **kwargs):
+        """chat.completions.create with retries and, if enabled, hedging"""
+        call = self._hedged if self.hedge else self._timed
+        return self._with_retries(call, kwargs)
+
+    def stream(self, **kwargs):
+        """
+        Open a streaming completion. Retries only cover opening the stream;
+        once tokens flow, errors go to the caller.
+        """
+        return self._with_retries(self._timed, {**kwargs, 'stream': True})
+
+    def _with_retries(self, call, kwargs):
+        attempt = 0
+        while True:
+            self._check_breaker(kwargs)
+            try:
+                result = call(kwargs)
+            except RETRYABLE_ERRORS as e:
+                delay = self._retry_delay(attempt, e)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+                continue
+            except BaseException:
+                # Bad requests, auth errors: not an outage, but a
+                # half-open trial must not stay marked as running
+                self.breaker.release()
+                raise
+            self.breaker.record_success()
+            return result
+
+    def _timed(self, kwargs):
+        started = time.monotonic()
+        try:
+            result = self.client.chat.completions.create(**kwargs)
+        except Exception as e:
+            self._record_error(kwargs, e)
+            raise
+        self._record_call(kwargs, started, result)
+        return result
+
+    def _hedged(self, kwargs):
+        """Send a second identical request if the first is slower than p95; first success wins"""
+        delay = self.p95(kwargs.get('model'))
+        if delay is None:
+            return self._timed(kwargs)
+
+        first = self._executor.submit(self._timed, kwargs)
+        try:
+            return first.result(timeout=delay)
+        except FutureTimeout:
+            pass
+
+        pending = {first, self._executor.submit(self._timed, kwargs)}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+
+class AsyncLLMClient(BaseLLMClient):
+    """LLMClient for the ASGI app, on AsyncOpenAI; hedged losers are cancelled"""
+
+    def __init__(self):
+        super().__init__()
+        self.client = AsyncOpenAI(
+            api_key=os.getenv('OPENAI_API_KEY'),
+            http_client=httpx.AsyncClient(**self.http_options()),
+            max_retries=0
+        )
+
+    async def complete(self, **kwargs):
+        call = self._hedged if self.hedge else self._timed
+        return await self._with_retries(call, kwargs)
+
+    async def stream(self, **kwargs):
+        return await self._with_retries(self._timed, {**kwargs, 'stream': True})
+
+    async def close(self):
+        await self.client.close()
+
+    async def _with_retries(self, call, kwargs):
+        attempt = 0
+        while True:
+            self._check_breaker(kwargs)
+            try:
+                result = await call(kwargs)
+            except RETRYABLE_ERRORS as e:
+                delay = self._retry_delay(attempt, e)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # Bad requests, auth errors, cancellation: not an outage, but a
+                # half-open trial must not stay marked as running
+                self.breaker.release()
+                raise
+            self.breaker.record_success()
+            return result
+
+    async def _timed(self, kwargs):
+        started = time.monotonic()
+        try:
+            result = await self.client.chat.completions.create(**kwargs)
+        except Exception as e:
+            self._record_error(kwargs, e)
+            raise
+        self._record_call(kwargs, started, result)
+        return result
+
+    async def _hedged(self, kwargs):
+        delay = self.p95(kwargs.get('model'))
+        if delay is None:
+            return await self._timed(kwargs)
+
+        first = asyncio.ensure_future(self._timed(kwargs))
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+
+        pending = {first, asyncio.ensure_future(self._timed(kwargs))}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,315 @@
+import hmac
+import os
+import threading
+import time
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 3000, 4000, 6000, 8000, 12000, 16000, 32000)
+
+# Query count and time of the request being served, per thread or task
+_request_db = ContextVar('request_db', default=None)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple((name, labels.get(name, '')) for name in self.labelnames)
+
+    def header(self):
+        return [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = list(self._values.items())
+        return self.header() + [f'{self.name}{_format_labels(key)} {_format_value(value)}' for key, value in values]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def render(self):
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+
+        lines = self.header()
+        for key, counts, total in values:
+            for bound, count in zip(self.buckets, counts):
+                labels = key + (('le', _format_value(bound)),)
+                lines.append(f'{self.name}_bucket{_format_labels(labels)} {count}')
+            lines.append(f'{self.name}_sum{_format_labels(key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(key)} {counts[-1]}')
+        return lines
+
+
+class CallbackMetric(Metric):
+    """Gauge or counter read at scrape time; callback returns a number or [(labels, value)]"""
+
+    def __init__(self, name, help_text, kind, callback):
+        super().__init__(name, help_text)
+        self.kind = kind
+        self.callback = callback
+
+    def render(self):
+        try:
+            values = self.callback()
+        except Exception as e:
+            print(f"Metrics Error: {self.name}: {str(e)}")
+            return []
+        if not isinstance(values, list):
+            values = [({}, values)]
+        return self.header() + [
+            f'{self.name}{_format_labels(sorted(labels.items()))} {_format_value(value)}'
+            for labels, value in values
+        ]
+
+
+class MetricsRegistry:
+    """
+    Per-process metrics in the Prometheus text format. Each gunicorn worker
+    keeps its own; every sample carries a `worker` label with the process id.
+    """
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def gauge_callback(self, name, help_text, callback):
+        return self._register(CallbackMetric(name, help_text, 'gauge', callback))
+
+    def counter_callback(self, name, help_text, callback):
+        return self._register(CallbackMetric(name, help_text, 'counter', callback))
+
+    def render(self):
+        worker = f'worker="{os.getpid()}"'
+        lines = []
+        for metric in self._metrics:
+            for line in metric.render():
+                if not line.startswith('#'):
+                    # Add the worker label to every sample
+                    name, _, value = line.rpartition(' ')
+                    if name.endswith('}'):
+                        name = f'{name[:-1]},{worker}}}'
+                    else:
+                        name = f'{name}{{{worker}}}'
+                    line = f'{name} {value}'
+                lines.append(line)
+        return '\n'.join(lines) + '\n'
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+    'http_request_duration_seconds', 'Time to serve the request (Flask streams: until the stream ends)',
+    ('blueprint', 'route', 'method', 'status')
+)
+db_queries_per_request = registry.histogram(
+    'db_queries_per_request', 'SQL statements executed while serving a request',
+    ('blueprint', 'route'), QUERY_COUNT_BUCKETS
+)
+db_time_per_request = registry.histogram(
+    'db_time_per_request_seconds', 'Time spent in SQL statements while serving a request',
+    ('blueprint', 'route')
+)
+db_queries = registry.counter('db_queries_total', 'SQL statements executed, including background work')
+db_query_duration = registry.histogram('db_query_duration_seconds', 'Duration of single SQL statements')
+llm_request_duration = registry.histogram(
+    'llm_request_duration_seconds', 'OpenAI call duration (streams: until the stream opens)', ('model', 'stream')
+)
+llm_tokens = registry.counter('llm_tokens_total', 'Tokens sent and received', ('model', 'direction'))
+llm_errors = registry.counter('llm_errors_total', 'Failed OpenAI calls', ('model', 'error'))
+prompt_tokens = registry.histogram(
+    'prompt_tokens', 'Tokens in sampled chat prompts (see /api/admin/prompt-profile)', (), TOKEN_BUCKETS
+)
+document_parse_duration = registry.histogram(
+    'document_parse_duration_seconds', 'Time to extract text from an uploaded document', ('file_type',)
+)
+document_parse_cache_hits = registry.counter(
+    'document_parse_cache_hits_total', 'Uploads whose text came from the parse cache', ('file_type',)
+)
+
+
+def begin_request():
+    _request_db.set({'queries': 0, 'time': 0.0, 'started': time.monotonic(), 'status': None})
+
+
+def record_status(status):
+    """Status of the response about to be sent; end_request falls back to 500 without one"""
+    stats = _request_db.get()
+    if stats is not None:
+        stats['status'] = status
+
+
+def end_request(blueprint, route, method, status=None):
+    """Observe the request; called at teardown so requests that raise are counted too"""
+    stats = _request_db.get()
+    if stats is None:
+        return
+    _request_db.set(None)
+    status = status or stats['status'] or 500
+    blueprint = blueprint or 'app'
+    route = route or 'unmatched'
+    http_request_duration.observe(
+        time.monotonic() - stats['started'], blueprint=blueprint, route=route, method=method, status=status
+    )
+    db_queries_per_request.observe(stats['queries'], blueprint=blueprint, route=route)
+    db_time_per_request.observe(stats['time'], blueprint=blueprint, route=route)
+
+
+def observe_llm(model, seconds, stream=False, usage=None):
+    llm_request_duration.observe(seconds, model=model, stream=str(bool(stream)).lower())
+    if usage is not None:
+        record_llm_tokens(model, usage.prompt_tokens, usage.completion_tokens)
+
+
+def record_llm_tokens(model, tokens_in, tokens_out):
+    llm_tokens.inc(tokens_in or 0, model=model, direction='in')
+    llm_tokens.inc(tokens_out or 0, model=model, direction='out')
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_started', []).append(time.monotonic())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('metrics_started')
+    if not started:
+        return
+    elapsed = time.monotonic() - started.pop()
+    db_queries.inc()
+    db_query_duration.observe(elapsed)
+
+    stats = _request_db.get()
+    if stats is not None:
+        stats['queries'] += 1
+        stats['time'] += elapsed
+
+
+@event.listens_for(Engine, 'handle_error')
+def _handle_error(context):
+    started = context.connection.info.get('metrics_started') if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def register_service_metrics():
+    """Scrape-time views of counters the services already keep"""
+    from services.analytics_buffer import analytics_buffer
+    from services.answer_cache import answer_cache
+    from services.form_cache import form_cache
+    from services.model_router import model_router
+
+    registry.gauge_callback(
+        'analytics_ingest_queue_depth', 'Analytics events buffered and not yet written',
+        lambda: analytics_buffer.queue_depth
+    )
+    registry.counter_callback(
+        'cache_requests_total', 'Form and answer cache lookups',
+        lambda: [
+            ({'cache': 'form', 'result': 'hit'}, form_cache.hits),
+            ({'cache': 'form', 'result': 'miss'}, form_cache.misses),
+            ({'cache': 'answer', 'result': 'hit'}, answer_cache.hits),
+            ({'cache': 'answer', 'result': 'miss'}, answer_cache.misses),
+        ]
+    )
+    registry.counter_callback(
+        'model_routing_decisions_total', 'Chat turns per model tier and routing reason',
+        lambda: [
+            ({'tier': tier, 'reason': reason}, count)
+            for (tier, reason), count in list(model_router.decisions.items())
+        ]
+    )
+
+
+def scrape_token():
+    """Bearer token /api/metrics requires; without one the endpoint is off"""
+    return os.getenv('METRICS_TOKEN') or None
+
+
+def scrape_allowed(authorization):
+    token = scrape_token()
+    return bool(token) and hmac.compare_digest((authorization or '').encode(), f'Bearer {token}'.encode())
+
+
+def init_app(app):
+    """Time every Flask request and count its queries"""
+    from flask import request
+
+    register_service_metrics()
+
+    @app.before_request
+    def start_timer():
+        begin_request()
+
+    @app.after_request
+    def keep_status(response):
+        record_status(response.status_code)
+        return response
+
+    @app.teardown_request
+    def record_request(error=None):
+        end_request(
+            request.blueprint,
+            request.url_rule.rule if request.url_rule else None,
+            request.method
+        )
@@ -0,0 +1,98 @@
+import os
+import threading
+from collections import Counter, deque
+from services.lead_signals import lead_signals
+from services.tokens import estimate_tokens
+
+TIERS = ('fast', 'strong')
+ROUTING_POLICIES = ('auto', 'fast', 'strong')
+LATENCY_WINDOW = 500
+
+# Keyword labels that mean the turn matters for qualification
+STRONG_INTENTS = ('ready', 'buying_signal', 'pain_point')
+
+
+class ModelRouter:
+    """
+    Picks the fast or strong chat model per turn from the form's policy and
+    cheap local features, and keeps per-worker decision counts and latencies
+    """
+
+    def __init__(self):
+        self.models = {
+            'fast': os.getenv('CHAT_FAST_MODEL', 'gpt-3.5-turbo'),
+            'strong': os.getenv('CHAT_STRONG_MODEL', 'gpt-4'),
+        }
+        self.analysis_model_default = os.getenv('LEAD_ANALYSIS_MODEL', 'gpt-4')
+        self.default_policy = os.getenv('MODEL_ROUTING', 'auto')
+        self.small_talk_tokens = int(os.getenv('ROUTING_SMALL_TALK_TOKENS', 8))
+        self.long_message_tokens = int(os.getenv('ROUTING_LONG_MESSAGE_TOKENS', 60))
+        # Messages in the conversation from which every turn goes to the strong tier
+        self.strong_from_message = int(os.getenv('ROUTING_STRONG_FROM_MESSAGE', 7))
+        self.decisions = Counter()  # (tier, reason) -> turns
+        self._latencies = {tier: deque(maxlen=LATENCY_WINDOW) for tier in TIERS + ('analysis',)}
+        self._lock = threading.Lock()
+
+    def route(self, form, message, message_count):
+        """Returns (tier, model, reason) for a chat turn and counts the decision"""
+        settings = form.ai_settings or {}
+        policy = settings.get('model_routing', self.default_policy)
+        if policy not in ROUTING_POLICIES:
+            policy = 'auto'
+
+        if policy != 'auto':
+            tier, reason = policy, 'policy'
+        else:
+            tier, reason = self._classify(form, message or '', message_count)
+
+        with self._lock:
+            self.decisions[(tier, reason)] += 1
+        return tier, settings.get(f'{tier}_model') or self.models[tier], reason
+
+    def analysis_model(self, form):
+        return ((form.ai_settings or {}).get('analysis_model') if form else None) or self.analysis_model_default
+
+    def record_latency(self, tier, seconds):
+        with self._lock:
+            self._latencies[tier].append(seconds)
+
+    def stats(self):
+        with self._lock:
+            decisions = [
+                {'tier': tier, 'reason': reason, 'count': count}
+                for (tier, reason), count in sorted(self.decisions.items())
+            ]
+            latencies = {tier: sorted(values) for tier, values in self._latencies.items()}
+
+        return {
+            'models': dict(self.models, analysis=self.analysis_model_default),
+            'decisions': decisions,
+            'latency': {tier: self._summarize(values) for tier, values in latencies.items()},
+        }
+
+    def _classify(self, form, message, message_count):
+        if message_count >= self.strong_from_message:
+            return 'strong', 'late_turn'
+
+        labels = {label for label, _ in lead_signals.matcher_for(form).find(message)}
+        if labels.intersection(STRONG_INTENTS):
+            return 'strong', 'intent'
+
+        tokens = estimate_tokens(message)
+        if tokens >= self.long_message_tokens:
+            return 'strong', 'long_message'
+        if tokens <= self.small_talk_tokens and '?' not in message:
+            return 'fast', 'small_talk'
+        return 'fast', 'default'
+
+    def _summarize(self, values):
+        if not values:
+            return {'count': 0, 'p50': None, 'p95': None}
+        return {
+            'count': len(values),
+            'p50': values[len(values) // 2],
+            'p95': values[min(int(len(values) * 0.95), len(values) - 1)],
+        }
+
+
+model_router = ModelRouter()
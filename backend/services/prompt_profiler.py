@@ -0,0 +1,157 @@
+import os
+import random
+import threading
+from collections import OrderedDict, deque
+from services import metrics
+from services.history import MESSAGE_OVERHEAD
+from services.tokens import count_tokens, encoding_ready, preload_encoding
+
+# Form-derived segments, tokenized once per form version
+FORM_SEGMENTS = ('instructions', 'title', 'cta', 'context', 'fields')
+# Segments that change with every turn
+TURN_SEGMENTS = ('knowledge', 'summary', 'history')
+SEGMENTS = FORM_SEGMENTS + TURN_SEGMENTS
+
+
+class FormProfile:
+    def __init__(self, form_id, window):
+        self.form_id = form_id
+        self.title = None
+        self.version = None
+        self.form_sizes = None
+        self.exact = False
+        self.turns = 0
+        self.samples = deque(maxlen=window)
+
+
+class PromptProfiler:
+    """
+    Per-form distributions of prompt tokens by segment, over the last
+    PROMPT_PROFILE_WINDOW sampled turns of each form. Kept per worker.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv('PROMPT_PROFILE', 'true').lower() == 'true'
+        self.sample_rate = float(os.getenv('PROMPT_PROFILE_SAMPLE_RATE', 0.1))
+        self.window = int(os.getenv('PROMPT_PROFILE_WINDOW', 200))
+        self.max_forms = int(os.getenv('PROMPT_PROFILE_MAX_FORMS', 1000))
+        # Forms whose p95 prompt is larger than this are flagged
+        self.threshold = int(os.getenv('PROMPT_TOKEN_THRESHOLD', 3000))
+        self._forms = OrderedDict()  # form_id -> FormProfile
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        # Turns sampled before the encoding is loaded are counted with the estimate
+        if self.enabled:
+            preload_encoding()
+
+    def record(self, form, prefix, form_segments, knowledge, summary, messages):
+        """
+        Tokenize one prompt. prefix is the rendered form part of the system prompt and
+        form_segments(form) returns its title, cta, context and fields texts; it is only
+        called when the form version changes.
+        """
+        if not self.enabled or random.random() >= self.sample_rate:
+            return
+
+        try:
+            sizes = dict(self._form_sizes(form, prefix, form_segments))
+            sizes['knowledge'] = count_tokens(knowledge)
+            sizes['summary'] = count_tokens(summary)
+            sizes['history'] = sum(count_tokens(msg['content']) + MESSAGE_OVERHEAD for msg in messages)
+            total = sum(sizes.values()) + MESSAGE_OVERHEAD
+        except Exception as e:
+            print(f"Prompt Profiler Error: {str(e)}")
+            return
+
+        with self._lock:
+            profile = self._profile(form.id)
+            profile.title = form.title
+            profile.turns += 1
+            profile.samples.append((total, sizes))
+
+        metrics.prompt_tokens.observe(total)
+
+    def report(self, threshold=None, flagged_only=False, limit=50):
+        """Forms by p95 prompt size, largest first, with per-segment distributions"""
+        threshold = threshold or self.threshold
+        with self._lock:
+            profiles = [
+                (profile.form_id, profile.title, profile.turns, list(profile.samples))
+                for profile in self._forms.values()
+                if profile.samples
+            ]
+
+        forms = []
+        for form_id, title, turns, samples in profiles:
+            total = self._summarize([sample[0] for sample in samples])
+            segments = {
+                segment: self._summarize([sample[1][segment] for sample in samples])
+                for segment in SEGMENTS
+            }
+            flagged = total['p95'] > threshold
+            if flagged_only and not flagged:
+                continue
+            forms.append({
+                'form_id': form_id,
+                'title': title,
+                'turns': turns,
+                'samples': len(samples),
+                'total': total,
+                'segments': segments,
+                'largest_segment': max(SEGMENTS, key=lambda segment: segments[segment]['mean']),
+                'flagged': flagged,
+            })
+
+        forms.sort(key=lambda item: item['total']['p95'], reverse=True)
+        return {
+            'threshold': threshold,
+            'tokenizer': 'tiktoken' if encoding_ready() else 'estimate',
+            'forms': forms[:limit],
+        }
+
+    def _form_sizes(self, form, prefix, form_segments):
+        with self._lock:
+            profile = self._forms.get(form.id)
+            if profile is not None and profile.version == form.updated_at:
+                # Sizes estimated before the encoding loaded are counted again
+                if profile.exact or not encoding_ready():
+                    return profile.form_sizes
+
+        exact = encoding_ready()
+        texts = form_segments(form)
+        sizes = {segment: count_tokens(texts[segment]) for segment in FORM_SEGMENTS[1:]}
+        # The fixed template text around the form's own values
+        sizes['instructions'] = max(count_tokens(prefix) - sum(sizes.values()), 0)
+
+        with self._lock:
+            profile = self._profile(form.id)
+            if profile.version != form.updated_at:
+                # Sizes from an older version would mix two prompts
+                profile.samples.clear()
+            profile.version = form.updated_at
+            profile.form_sizes = sizes
+            profile.exact = exact
+        return sizes
+
+    def _profile(self, form_id):
+        # Callers hold the lock
+        profile = self._forms.get(form_id)
+        if profile is None:
+            profile = self._forms[form_id] = FormProfile(form_id, self.window)
+            while len(self._forms) > self.max_forms:
+                self._forms.popitem(last=False)
+        self._forms.move_to_end(form_id)
+        return profile
+
+    def _summarize(self, values):
+        values = sorted(values)
+        return {
+            'p50': values[len(values) // 2],
+            'p95': values[min(int(len(values) * 0.95), len(values) - 1)],
+            'max': values[-1],
+            'mean': round(sum(values) / len(values), 1),
+        }
+
+
+prompt_profiler = PromptProfiler()
@@ -0,0 +1,212 @@
+import os
+import queue
+import re
+import threading
+import zlib
+from datetime import datetime
+import numpy as np
+from models import QuestionCluster, QuestionClusterBand, db
+
+NUM_PERM = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+# Estimated Jaccard similarity needed to join an existing cluster
+SIMILARITY_THRESHOLD = 0.5
+MAX_REPRESENTATIVE_LENGTH = 300
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+
+# Fixed seed so every worker and restart produces the same signatures
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 1 << 31, size=NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, 1 << 31, size=NUM_PERM).astype(np.uint64)
+
+QUESTION_WORDS = frozenset("""
+what how why when where who which can could do does did is are will would should
+any have has
+""".split())
+FILLER_PATTERN = re.compile(r"^(hi|hello|hey|thanks|thank you|ok|okay|so|and|please)\b[\s,]*")
+
+
+def normalize(text):
+    """Lowercase, drop punctuation and leading filler words"""
+    text = re.sub(r"[^a-z0-9\s]", " ", text.lower())
+    text = re.sub(r"\s+", " ", text).strip()
+    previous = None
+    while previous != text:
+        previous = text
+        text = FILLER_PATTERN.sub("", text)
+    return text
+
+
+def is_question(text, normalized):
+    if '?' in text:
+        return True
+    first_word = normalized.split(' ', 1)[0] if normalized else ''
+    return first_word in QUESTION_WORDS
+
+
+def minhash(normalized):
+    """MinHash signature over character shingles of normalized text"""
+    padded = f" {normalized} "
+    shingles = {padded[i:i + SHINGLE_SIZE] for i in range(max(len(padded) - SHINGLE_SIZE + 1, 1))}
+    hashes = np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+    # (NUM_PERM, n_shingles) matrix of permuted hashes, minimum per permutation
+    permuted = (np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % MERSENNE_PRIME
+    return permuted.min(axis=1)
+
+
+def band_keys(signature):
+    """LSH bucket keys, one per band of the signature"""
+    bands = signature.reshape(BANDS, ROWS_PER_BAND)
+    return [f"{i}:{zlib.crc32(band.tobytes()):08x}" for i, band in enumerate(bands)]
+
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of two signatures"""
+    return float(np.mean(signature == other))
+
+
+class QuestionClusterService:
+    """
+    Groups near-duplicate visitor questions per form with MinHash LSH and
+    keeps a running count per cluster
+    """
+
+    def record(self, form_id, message):
+        """Count a user message towards its question cluster; returns the cluster or None"""
+        if not message:
+            return None
+
+        normalized = normalize(message)
+        if len(normalized) < SHINGLE_SIZE or not is_question(message, normalized):
+            return None
+
+        signature = minhash(normalized)
+        keys = band_keys(signature)
+
+        cluster = self._find_cluster(form_id, signature, keys)
+        if cluster:
+            QuestionCluster.query.filter_by(id=cluster.id).update({
+                QuestionCluster.count: QuestionCluster.count + 1,
+                QuestionCluster.last_seen_at: datetime.utcnow()
+            }, synchronize_session=False)
+            return cluster
+
+        cluster = QuestionCluster(
+            form_id=form_id,
+            representative=message.strip()[:MAX_REPRESENTATIVE_LENGTH],
+            signature=[int(v) for v in signature],
+            count=1,
+            last_seen_at=datetime.utcnow()
+        )
+        db.session.add(cluster)
+        db.session.flush()
+
+        db.session.add_all([
+            QuestionClusterBand(form_id=form_id, band_key=key, cluster_id=cluster.id)
+            for key in keys
+        ])
+        return cluster
+
+    def top_questions(self, form_id, limit=5):
+        clusters = QuestionCluster.query.filter_by(form_id=form_id).order_by(
+            QuestionCluster.count.desc()
+        ).limit(limit).all()
+        return [{'question': c.representative, 'count': c.count} for c in clusters]
+
+    def _find_cluster(self, form_id, signature, keys):
+        """Best matching cluster among those sharing at least one LSH band"""
+        candidate_ids = {
+            row.cluster_id
+            for row in QuestionClusterBand.query.filter(
+                QuestionClusterBand.form_id == form_id,
+                QuestionClusterBand.band_key.in_(keys)
+            ).with_entities(QuestionClusterBand.cluster_id)
+        }
+        if not candidate_ids:
+            return None
+
+        best = None
+        best_score = SIMILARITY_THRESHOLD
+        for cluster in QuestionCluster.query.filter(QuestionCluster.id.in_(candidate_ids)):
+            score = similarity(signature, np.array(cluster.signature, dtype=np.uint64))
+            if score >= best_score:
+                best, best_score = cluster, score
+        return best
+
+
+class QuestionRecorder:
+    """
+    Clusters chat messages on a background thread per process, so the MinHash,
+    lookups and band inserts stay out of the chat request and its transaction.
+    Questions still queued when a worker exits are lost; the counts are
+    approximate anyway and backfill-question-clusters rebuilds them.
+    """
+
+    def __init__(self):
+        self.max_pending = int(os.getenv('QUESTION_QUEUE_SIZE', 10000))
+        self.app = None
+        self.service = QuestionClusterService()
+        self._queue = queue.Queue(maxsize=self.max_pending)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def init_app(self, app):
+        self.app = app
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def add(self, form_id, message):
+        """Queue a user message; dropped if the queue is full"""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((form_id, message))
+        except queue.Full:
+            pass
+
+    def flush(self):
+        """Cluster everything queued now, in this thread; returns how many were processed"""
+        processed = 0
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return processed
+            self._process(*item)
+            processed += 1
+
+    def _process(self, form_id, message):
+        with self.app.app_context():
+            try:
+                self.service.record(form_id, message)
+                db.session.commit()
+            except Exception as e:
+                print(f"Question Cluster Error: {str(e)}")
+                db.session.rollback()
+
+    def _ensure_worker(self):
+        # Started lazily so every forked gunicorn worker gets its own thread and queue
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.max_pending)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='question-clusters', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._process(*self._queue.get())
+
+
+question_recorder = QuestionRecorder()
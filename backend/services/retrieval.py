@@ -0,0 +1,200 @@
+import math
+import os
+import re
+import threading
+from collections import Counter
+from models import DocumentChunk, Form, db
+from services.tokens import estimate_tokens
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from has have how i if in is it its
+me my of on or our so that the their them there they this to was we what when
+where which who why will with you your
+""".split())
+
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+
+
+def tokenize(text):
+    """Lowercase word tokens with stopwords removed"""
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def chunk_text(text, max_tokens):
+    """
+    Split text into chunks of roughly max_tokens, keeping paragraphs
+    together where possible and falling back to sentences for long ones
+    """
+    pieces = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            pieces.append(paragraph)
+        else:
+            pieces.extend(s for s in SENTENCE_PATTERN.split(paragraph) if s.strip())
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    for piece in pieces:
+        piece_tokens = estimate_tokens(piece)
+
+        # Hard-split anything that still doesn't fit (e.g. PDF text without punctuation)
+        while piece_tokens > max_tokens:
+            cut = max_tokens * 4
+            chunks.append(piece[:cut])
+            piece = piece[cut:]
+            piece_tokens = estimate_tokens(piece)
+
+        if current and current_tokens + piece_tokens > max_tokens:
+            chunks.append("\n".join(current))
+            current = []
+            current_tokens = 0
+
+        if piece:
+            current.append(piece)
+            current_tokens += piece_tokens
+
+    if current:
+        chunks.append("\n".join(current))
+
+    return chunks
+
+
+def bump_version(form_id):
+    """Mark the form's chunks as changed, in the caller's transaction"""
+    Form.query.filter_by(id=form_id).update(
+        {Form.retrieval_version: Form.retrieval_version + 1}, synchronize_session=False
+    )
+
+
+class FormIndex:
+    """In-memory BM25 index over the chunks of a single form"""
+
+    def __init__(self, rows):
+        self.chunk_ids = []
+        self.lengths = []
+        self.postings = {}
+
+        for position, (chunk_id, term_counts) in enumerate(rows):
+            term_counts = term_counts or {}
+            self.chunk_ids.append(chunk_id)
+            self.lengths.append(sum(term_counts.values()))
+            for term, count in term_counts.items():
+                self.postings.setdefault(term, []).append((position, count))
+
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0
+
+    def search(self, query_terms, limit):
+        """Return (chunk_id, score) pairs for the best matching chunks"""
+        total = len(self.chunk_ids)
+        if not total or not self.avg_length:
+            return []
+
+        scores = {}
+        for term in set(query_terms):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for position, tf in postings:
+                norm = K1 * (1 - B + B * self.lengths[position] / self.avg_length)
+                scores[position] = scores.get(position, 0) + idf * tf * (K1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:limit]
+        return [(self.chunk_ids[position], score) for position, score in ranked]
+
+
+class RetrievalService:
+    """
+    Chunks parsed documents at upload time and retrieves the chunks most
+    relevant to a user message at chat time, within a token budget
+    """
+
+    def __init__(self):
+        self.chunk_tokens = int(os.getenv('RETRIEVAL_CHUNK_TOKENS', 300))
+        self.top_k = int(os.getenv('RETRIEVAL_TOP_K', 4))
+        self.token_budget = int(os.getenv('RETRIEVAL_TOKEN_BUDGET', 1200))
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def index_document(self, document):
+        """Replace the stored chunks for a document with fresh ones"""
+        DocumentChunk.query.filter_by(document_id=document.id).delete()
+        bump_version(document.form_id)
+
+        for position, content in enumerate(chunk_text(document.parsed_content or '', self.chunk_tokens)):
+            db.session.add(DocumentChunk(
+                form_id=document.form_id,
+                document_id=document.id,
+                position=position,
+                content=content,
+                token_count=estimate_tokens(content),
+                term_counts=dict(Counter(tokenize(content)))
+            ))
+
+    def retrieve(self, form_id, query, top_k=None, token_budget=None):
+        """
+        Return the most relevant chunk texts for a query, best first,
+        stopping before the combined size exceeds the token budget
+        """
+        top_k = top_k or self.top_k
+        token_budget = token_budget or self.token_budget
+
+        query_terms = tokenize(query or '')
+        if not query_terms:
+            return []
+
+        index = self._get_index(form_id)
+        if index is None:
+            return []
+
+        ranked = index.search(query_terms, top_k)
+        if not ranked:
+            return []
+
+        chunks = {
+            chunk.id: chunk
+            for chunk in DocumentChunk.query.filter(
+                DocumentChunk.id.in_([chunk_id for chunk_id, _ in ranked])
+            ).with_entities(DocumentChunk.id, DocumentChunk.content, DocumentChunk.token_count)
+        }
+
+        selected = []
+        used_tokens = 0
+        for chunk_id, _ in ranked:
+            chunk = chunks.get(chunk_id)
+            if not chunk or used_tokens + chunk.token_count > token_budget:
+                continue
+            selected.append(chunk.content)
+            used_tokens += chunk.token_count
+
+        return selected
+
+    def _get_index(self, form_id):
+        """Load the form's index, rebuilding it only when its chunks changed"""
+        version = db.session.query(Form.retrieval_version).filter(Form.id == form_id).scalar()
+        if version is None:
+            return None
+
+        with self._lock:
+            cached = self._indexes.get(form_id)
+            if cached and cached[0] == version:
+                return cached[1]
+
+        rows = DocumentChunk.query.filter_by(form_id=form_id).with_entities(
+            DocumentChunk.id, DocumentChunk.term_counts
+        ).all()
+        index = FormIndex(rows)
+
+        with self._lock:
+            self._indexes[form_id] = (version, index)
+
+        return index
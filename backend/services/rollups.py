@@ -0,0 +1,140 @@
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import func
+from models import Analytics, AnalyticsRollup, db
+from services.upsert import upsert_increment
+
+GRANULARITIES = ('hour', 'day')
+SQLITE_BUCKETS = {'hour': '%Y-%m-%d %H:00:00', 'day': '%Y-%m-%d 00:00:00'}
+ROLLUP_KEY = ['form_id', 'event_type', 'granularity', 'bucket']
+
+# Counter rows kept next to the event counts so the dashboard can average
+# completion times without reading raw events
+COMPLETION_SECONDS = 'completion_seconds'
+TIMED_COMPLETIONS = 'timed_completions'
+
+
+def truncate(timestamp, granularity):
+    """Start of the hour or day containing timestamp"""
+    if granularity == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    if granularity == 'day':
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unsupported granularity: {granularity}")
+
+
+def completion_seconds(event):
+    """Whole seconds from session start for form_completed events that carry them"""
+    if event['event_type'] != 'form_completed':
+        return None
+    seconds = (event.get('event_data') or {}).get('completion_seconds')
+    if not isinstance(seconds, (int, float)) or seconds < 0:
+        return None
+    return int(round(seconds))
+
+
+def bucket_sql(granularity, column):
+    """SQL truncating column to its hour or day; read results back with as_bucket"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return func.date_trunc(granularity, column)
+    # SQLite has no date_trunc
+    return func.strftime(SQLITE_BUCKETS[granularity], column)
+
+
+def as_bucket(value):
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+
+def increment_rollups(events):
+    """Add a batch of Analytics column dicts to the hourly and daily rollups"""
+    counts = Counter()
+    for event in events:
+        timestamp = event.get('timestamp') or datetime.utcnow()
+        seconds = completion_seconds(event)
+        for granularity in GRANULARITIES:
+            bucket = truncate(timestamp, granularity)
+            counts[(event['form_id'], event['event_type'], granularity, bucket)] += 1
+            if seconds is not None:
+                counts[(event['form_id'], COMPLETION_SECONDS, granularity, bucket)] += seconds
+                counts[(event['form_id'], TIMED_COMPLETIONS, granularity, bucket)] += 1
+
+    upsert_increment(AnalyticsRollup, [
+        {
+            'form_id': form_id,
+            'event_type': event_type,
+            'granularity': granularity,
+            'bucket': bucket,
+            'count': count
+        }
+        for (form_id, event_type, granularity, bucket), count in counts.items()
+    ], ROLLUP_KEY)
+
+
+def event_counts(form_ids, event_types, start_date):
+    """Event totals since start_date (to the hour) as {event_type: count}"""
+    rows = db.session.query(
+        AnalyticsRollup.event_type, func.sum(AnalyticsRollup.count)
+    ).filter(
+        AnalyticsRollup.form_id.in_(form_ids),
+        AnalyticsRollup.event_type.in_(event_types),
+        AnalyticsRollup.granularity == 'hour',
+        AnalyticsRollup.bucket >= truncate(start_date, 'hour')
+    ).group_by(AnalyticsRollup.event_type).all()
+
+    counts = {event_type: 0 for event_type in event_types}
+    counts.update({event_type: int(total) for event_type, total in rows})
+    return counts
+
+
+def avg_completion_time(form_ids, start_date):
+    """Mean seconds to completion since start_date, from the completion counters"""
+    counts = event_counts(form_ids, [COMPLETION_SECONDS, TIMED_COMPLETIONS], start_date)
+    if not counts[TIMED_COMPLETIONS]:
+        return 0
+    return counts[COMPLETION_SECONDS] / counts[TIMED_COMPLETIONS]
+
+
+def rebuild_rollups():
+    """Recompute every rollup from the raw analytics table"""
+    AnalyticsRollup.query.delete()
+
+    for granularity in GRANULARITIES:
+        bucket = bucket_sql(granularity, Analytics.timestamp)
+        rows = db.session.query(
+            Analytics.form_id, Analytics.event_type, bucket, func.count(Analytics.id)
+        ).group_by(Analytics.form_id, Analytics.event_type, bucket).yield_per(5000)
+
+        batch = []
+        for form_id, event_type, bucket_start, count in rows:
+            batch.append({
+                'form_id': form_id,
+                'event_type': event_type,
+                'granularity': granularity,
+                'bucket': as_bucket(bucket_start),
+                'count': count
+            })
+            if len(batch) >= 5000:
+                upsert_increment(AnalyticsRollup, batch, ROLLUP_KEY)
+                batch = []
+        upsert_increment(AnalyticsRollup, batch, ROLLUP_KEY)
+
+        # Completion counters, for events recorded with completion_seconds
+        seconds = Analytics.event_data['completion_seconds'].as_float()
+        rows = db.session.query(
+            Analytics.form_id, bucket, func.sum(func.round(seconds)), func.count(seconds)
+        ).filter(
+            Analytics.event_type == 'form_completed',
+            seconds >= 0
+        ).group_by(Analytics.form_id, bucket).all()
+
+        batch = []
+        for form_id, bucket_start, total, timed in rows:
+            for event_type, count in ((COMPLETION_SECONDS, int(total)), (TIMED_COMPLETIONS, timed)):
+                batch.append({
+                    'form_id': form_id,
+                    'event_type': event_type,
+                    'granularity': granularity,
+                    'bucket': as_bucket(bucket_start),
+                    'count': count
+                })
+        upsert_increment(AnalyticsRollup, batch, ROLLUP_KEY)
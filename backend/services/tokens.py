@@ -0,0 +1,70 @@
+import math
+import os
+import threading
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Rough OpenAI rule of thumb: one token is about four characters of English text
+CHARS_PER_TOKEN = 4
+
+# Encoding of the gpt-3.5-turbo and gpt-4 chat models
+ENCODING_NAME = 'cl100k_base'
+
+_encoding = None
+_encoding_failed = False
+_encoding_lock = threading.Lock()
+_loader_pid = None
+_loader_lock = threading.Lock()
+
+def estimate_tokens(text):
+    """Estimate the number of tokens in a piece of text"""
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def count_tokens(text):
+    """Exact token count once the tiktoken encoding is loaded, otherwise the estimate"""
+    if not text:
+        return 0
+    # Never waits for the encoding: requests count with the estimate until it is loaded
+    encoding = _encoding
+    if encoding is None:
+        preload_encoding()
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def encoding_ready():
+    """Whether count_tokens is exact yet"""
+    return _encoding is not None
+
+def preload_encoding():
+    """Load the encoding in a background thread of this process, once"""
+    global _loader_pid
+    if tiktoken is None or _encoding is not None or _encoding_failed:
+        return
+    # Not _encoding_lock, which is held for the whole download
+    with _loader_lock:
+        # Threads do not survive a fork, so each worker process starts its own
+        if _loader_pid == os.getpid():
+            return
+        _loader_pid = os.getpid()
+    threading.Thread(target=load_encoding, name='tiktoken-loader', daemon=True).start()
+
+def load_encoding():
+    """The tiktoken encoding, loading it first if needed; None when unavailable"""
+    global _encoding, _encoding_failed
+    if tiktoken is None or _encoding_failed:
+        return None
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None and not _encoding_failed:
+                # The first load fetches the BPE ranks unless TIKTOKEN_CACHE_DIR has them
+                try:
+                    _encoding = tiktoken.get_encoding(ENCODING_NAME)
+                except Exception as e:
+                    print(f"Tokenizer Error: {str(e)}")
+                    _encoding_failed = True
+    return _encoding
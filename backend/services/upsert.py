@@ -0,0 +1,35 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db
+
+
+def upsert_increment(model, rows, key_columns, counter_column='count', session=None):
+    """
+    Insert counter rows, adding to the existing counter when a row with
+    the same key already exists. Rows must have unique keys. Runs in the
+    given session's transaction (the Flask-SQLAlchemy session by default).
+    """
+    if not rows:
+        return
+
+    session = session or db.session
+    # A stable order keeps concurrent workers from deadlocking on row locks
+    rows = sorted(rows, key=lambda row: tuple(str(row[c]) for c in key_columns))
+    counter = getattr(model.__table__.c, counter_column)
+    dialect = session.get_bind().dialect.name
+
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = insert(model).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={counter_column: counter + stmt.excluded[counter_column]}
+        )
+        session.execute(stmt)
+        return
+
+    for row in rows:
+        existing = session.query(model).filter_by(**{c: row[c] for c in key_columns}).with_for_update().first()
+        if existing:
+            setattr(existing, counter_column, getattr(existing, counter_column) + row[counter_column])
+        else:
+            session.add(model(**row))
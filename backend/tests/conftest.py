@@ -0,0 +1,69 @@
+import os
+import sys
+import tempfile
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.fake_openai import FakeOpenAIConfig, FakeOpenAIServer
+
+# The app and its services read their configuration at import time
+fake_openai = FakeOpenAIServer(FakeOpenAIConfig(latency=0, jitter=0, token_interval=0, reply_tokens=8, seed=1)).start()
+_db_dir = tempfile.mkdtemp(prefix='backend-tests-')
+os.environ.update({
+    'DATABASE_URL': f'sqlite:///{_db_dir}/test.db',
+    'ASYNC_DATABASE_URL': f'sqlite+aiosqlite:///{_db_dir}/test.db',
+    'UPLOAD_FOLDER': f'{_db_dir}/uploads',
+    'OPENAI_API_KEY': 'test',
+    'OPENAI_BASE_URL': fake_openai.base_url,
+    'LLM_MAX_RETRIES': '0',
+    'LLM_BREAKER_FAILURES': '1000',
+    'INCREMENTAL_INSIGHTS': 'false',
+    'LEAD_ANALYSIS_WORKERS': '0',
+})
+
+# models imports db from app, so app has to be imported first
+import app  # noqa: E402,F401
+
+
+@pytest.fixture
+def fake_llm():
+    """The stub OpenAI server, reset to instant successful replies"""
+    config = fake_openai.config
+    config.latency = 0
+    config.jitter = 0
+    config.token_interval = 0
+    config.reply_tokens = 8
+    config.error_rate = 0
+    config.error_status = 503
+    config.reset()
+    return fake_openai
+
+
+@pytest.fixture
+def flask_app(fake_llm):
+    from app import app, db
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+
+
+@pytest.fixture
+def form(flask_app):
+    from models import Form, db
+
+    with flask_app.app_context():
+        form = Form(
+            id='test-form', user_id='test-user', title='Test form', cta_type='Book a demo',
+            fields=[{'id': 'email', 'label': 'Email', 'type': 'email', 'required': True}],
+            context='We sell lead qualification software.', context_documents=[],
+            embed_settings={}, ai_settings={'answer_cache': False}
+        )
+        db.session.add(form)
+        db.session.commit()
+        return form.id
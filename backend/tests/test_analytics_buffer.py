@@ -0,0 +1,113 @@
+import threading
+import pytest
+from sqlalchemy.exc import DataError, IntegrityError, OperationalError
+from models import Analytics, db
+from services.analytics_buffer import AnalyticsBuffer
+
+
+@pytest.fixture
+def buffer(flask_app, monkeypatch):
+    buffer = AnalyticsBuffer()
+    buffer.app = flask_app
+    # Flushed by the tests, not by a background thread
+    monkeypatch.setattr(buffer, '_ensure_worker', lambda: None)
+    return buffer
+
+
+def event(form_id, event_type='form_view', session_id='s-1'):
+    return {'form_id': form_id, 'event_type': event_type, 'event_data': {}, 'session_id': session_id}
+
+
+def stored(flask_app):
+    with flask_app.app_context():
+        return sorted(row.event_type for row in Analytics.query.all())
+
+
+def test_flush_writes_the_batch(flask_app, form, buffer):
+    buffer.add_many([event(form), event(form, 'form_completed')])
+
+    assert buffer.flush() == 2
+    assert stored(flask_app) == ['form_completed', 'form_view']
+    assert buffer.queue_depth == 0
+
+
+@pytest.mark.parametrize('error', [
+    # What Postgres raises for an unknown form_id and for a value longer than its column
+    IntegrityError('INSERT', {}, Exception('violates foreign key constraint')),
+    DataError('INSERT', {}, Exception('value too long for type character varying(50)')),
+])
+def test_row_errors_drop_only_the_bad_row(flask_app, form, buffer, monkeypatch, error):
+    write = buffer._write
+
+    def strict_write(events):
+        if any(len(e['event_type']) > 50 for e in events):
+            raise error
+        write(events)
+
+    monkeypatch.setattr(buffer, '_write', strict_write)
+    buffer.add_many([event(form), event(form, 'x' * 60), event(form, 'form_completed')])
+
+    assert buffer.flush() == 2
+    assert stored(flask_app) == ['form_completed', 'form_view']
+    # Nothing left to poison the next flush
+    assert buffer.queue_depth == 0
+
+
+def test_database_errors_requeue_the_batch(flask_app, form, buffer, monkeypatch):
+    def unavailable(events):
+        raise OperationalError('INSERT', {}, Exception('connection refused'))
+
+    monkeypatch.setattr(buffer, '_write', unavailable)
+    buffer.add_many([event(form), event(form, 'form_completed')])
+    assert buffer.flush() == 0
+    assert buffer.queue_depth == 2
+
+    monkeypatch.undo()
+    assert buffer.flush() == 2
+    assert stored(flask_app) == ['form_completed', 'form_view']
+
+
+def test_pending_events_are_capped_oldest_first(flask_app, form, buffer, monkeypatch):
+    buffer.max_pending = 3
+    buffer.add_many([event(form, f'event-{i}') for i in range(5)])
+    assert buffer.queue_depth == 3
+
+    def unavailable(events):
+        raise OperationalError('INSERT', {}, Exception('connection refused'))
+
+    monkeypatch.setattr(buffer, '_write', unavailable)
+    buffer.flush()
+    buffer.add(form, 'event-5')
+    assert [e['event_type'] for e in buffer._events] == ['event-3', 'event-4', 'event-5']
+
+
+def test_dead_flush_thread_is_restarted(flask_app):
+    buffer = AnalyticsBuffer()
+    buffer.app = flask_app
+    buffer._run = lambda: None
+
+    buffer._ensure_worker()
+    first = buffer._thread
+    first.join()
+    buffer._ensure_worker()
+
+    assert buffer._thread is not first
+
+
+def test_flush_thread_survives_errors(flask_app, monkeypatch):
+    buffer = AnalyticsBuffer()
+    buffer.flush_interval = 0.01
+    flushed = threading.Event()
+    calls = []
+
+    def flaky_flush():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError('boom')
+        flushed.set()
+
+    monkeypatch.setattr(buffer, 'flush', flaky_flush)
+    buffer._ensure_worker()
+
+    assert flushed.wait(2)
+    assert buffer._thread.is_alive()
@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+import pytest
+from models import Analytics, AnalyticsRollup, db
+from services import analytics_engine
+from services.rollups import event_counts, increment_rollups, rebuild_rollups
+
+START = (datetime.utcnow() - timedelta(days=2)).replace(minute=0, second=0, microsecond=0)
+
+
+@pytest.fixture(autouse=True)
+def clear_reports():
+    analytics_engine.report_cache.clear()
+    yield
+    analytics_engine.report_cache.clear()
+
+
+def track(form_id, session_id, event_type, minutes, **event_data):
+    event = {
+        'form_id': form_id, 'event_type': event_type, 'session_id': session_id,
+        'event_data': event_data, 'timestamp': START + timedelta(minutes=minutes)
+    }
+    db.session.add(Analytics(**event))
+    return event
+
+
+def add_sessions(form_id):
+    events = [
+        # Completes after 10 minutes
+        track(form_id, 'a', 'form_view', 0),
+        track(form_id, 'a', 'message_sent', 1),
+        track(form_id, 'a', 'form_shown', 5),
+        track(form_id, 'a', 'form_completed', 10, completion_seconds=600),
+        # Completes the next hour after 20 minutes
+        track(form_id, 'b', 'form_view', 70),
+        track(form_id, 'b', 'message_sent', 71),
+        track(form_id, 'b', 'message_sent', 72),
+        track(form_id, 'b', 'form_shown', 80),
+        track(form_id, 'b', 'form_completed', 90, completion_seconds=1200),
+        # Leaves after one message
+        track(form_id, 'c', 'form_view', 75),
+        track(form_id, 'c', 'message_sent', 76),
+    ]
+    increment_rollups(events)
+    db.session.commit()
+
+
+def test_funnel_counts_sessions_per_step(flask_app, form):
+    with flask_app.app_context():
+        add_sessions(form)
+        funnel = analytics_engine.funnel([form], START - timedelta(days=1))
+
+    assert [(step['step'], step['sessions']) for step in funnel['steps']] == [
+        ('viewed', 3), ('first_message', 3), ('form_shown', 2), ('completed', 2)
+    ]
+    assert funnel['steps'][2]['conversion_from_previous'] == pytest.approx(2 / 3)
+    assert funnel['median_completion_time'] == 900
+
+
+def test_funnel_timeseries_buckets_sessions_by_start(flask_app, form):
+    with flask_app.app_context():
+        add_sessions(form)
+        buckets = analytics_engine.funnel_timeseries([form], START - timedelta(days=1), 'hour')
+
+    assert [(b['bucket'], b['viewed'], b['completed'], b['cumulative_completed']) for b in buckets] == [
+        (START.isoformat(), 1, 1, 1),
+        ((START + timedelta(hours=1)).isoformat(), 2, 1, 2),
+    ]
+
+
+def test_rebuild_matches_the_incremental_rollups(flask_app, form):
+    with flask_app.app_context():
+        add_sessions(form)
+        types = ['form_view', 'message_sent', 'form_completed', 'completion_seconds', 'timed_completions']
+        incremental = event_counts([form], types, START - timedelta(days=1))
+
+        rebuild_rollups()
+        db.session.commit()
+
+        assert event_counts([form], types, START - timedelta(days=1)) == incremental
+        assert AnalyticsRollup.query.filter_by(granularity='day').count() == 6
+
+
+def test_form_analytics_uses_the_rollup_completion_time_and_caches_the_funnel(flask_app, form, monkeypatch):
+    with flask_app.app_context():
+        add_sessions(form)
+    calls = []
+    funnel = analytics_engine.funnel
+    monkeypatch.setattr(analytics_engine, 'funnel', lambda *args: calls.append(1) or funnel(*args))
+    client = flask_app.test_client()
+
+    stats = client.get(f'/api/analytics/forms/{form}').get_json()
+    again = client.get(f'/api/analytics/forms/{form}').get_json()
+    dashboard = client.get('/api/analytics/dashboard', headers={'Authorization': 'test-user'}).get_json()
+
+    assert len(calls) == 1
+    assert again == stats
+    assert stats['avg_completion_time'] == 900
+    assert stats['median_completion_time'] == 900
+    assert stats['funnel'][-1]['sessions'] == 2
+    # One definition of completion time in both views
+    assert dashboard['avg_completion_time'] == stats['avg_completion_time']
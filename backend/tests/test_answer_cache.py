@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+from services import answer_cache as answer_cache_module
+from services.answer_cache import AnswerCache
+from services.form_cache import FormSnapshot, SNAPSHOT_FIELDS
+
+
+def snapshot(form_id, context='We sell lead qualification software.'):
+    row = SimpleNamespace(**{field: None for field in SNAPSHOT_FIELDS})
+    row.id = form_id
+    row.context = context
+    row.fields = []
+    row.context_documents = []
+    row.ai_settings = {}
+    return FormSnapshot(row)
+
+
+def test_forms_are_evicted_least_recently_used_first():
+    cache = AnswerCache()
+    cache.max_forms = 2
+    first, second, third = snapshot('first'), snapshot('second'), snapshot('third')
+
+    cache.put(first, 'What does it cost?', 'From $49 a month.')
+    cache.put(second, 'What does it cost?', 'From $99 a month.')
+    assert cache.get(first, 'What does it cost?') == 'From $49 a month.'
+    cache.put(third, 'What does it cost?', 'Free.')
+
+    assert cache.stats()['forms'] == 2
+    assert cache.get(first, 'What does it cost?') == 'From $49 a month.'
+    assert cache.get(second, 'What does it cost?') is None
+
+
+def test_snapshot_fingerprint_is_hashed_once(monkeypatch):
+    calls = []
+    fingerprint = answer_cache_module.form_fingerprint
+    monkeypatch.setattr('services.form_cache.form_fingerprint', lambda form: calls.append(1) or fingerprint(form))
+    cache = AnswerCache()
+    form = snapshot('form')
+
+    cache.put(form, 'Is there a trial?', 'Yes, 14 days.')
+    for _ in range(3):
+        assert cache.get(form, 'Is there a trial?') == 'Yes, 14 days.'
+
+    assert len(calls) == 1
+    # A new snapshot of a changed form starts over
+    assert cache.get(snapshot('form', context='Now we sell CRMs.'), 'Is there a trial?') is None
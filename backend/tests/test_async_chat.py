@@ -0,0 +1,100 @@
+import asyncio
+import httpx
+from models import ChatMessage, ChatSession, Lead, LeadTag, LeadTagCount
+from routes import async_chat
+from services import lead_tags
+
+
+def post(path, payload):
+    """One request through the ASGI dispatcher, as uvicorn would serve it"""
+    from asgi import application
+    from services.async_db import engine
+
+    async def request():
+        transport = httpx.ASGITransport(app=application)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            response = await client.post(path, json=payload)
+        # Each test runs its own event loop; pooled connections belong to this one
+        await engine.dispose()
+        return response
+
+    return asyncio.run(request())
+
+
+def run_turn(payload, form_id):
+    return post(f'/api/chat/{form_id}', payload)
+
+
+def saved_messages(flask_app, session_id):
+    with flask_app.app_context():
+        chat_session = ChatSession.query.filter_by(session_id=session_id).first()
+        return [
+            (row.role, row.content)
+            for row in ChatMessage.query.filter_by(session_id=chat_session.id).order_by(ChatMessage.seq)
+        ]
+
+
+def test_async_turn_saves_reply(flask_app, form):
+    response = run_turn({'session_id': 'async-1', 'message': 'What does it cost?'}, form)
+
+    assert response.status_code == 200
+    reply = response.json()['message']
+    assert reply
+    assert saved_messages(flask_app, 'async-1') == [('user', 'What does it cost?'), ('assistant', reply)]
+
+
+def test_async_follow_up_turn(flask_app, form):
+    run_turn({'session_id': 'async-2', 'message': 'Hi there, what is this?'}, form)
+    response = run_turn({'session_id': 'async-2', 'message': 'Do you integrate with HubSpot?'}, form)
+
+    assert response.status_code == 200
+    assert [role for role, _ in saved_messages(flask_app, 'async-2')] == ['user', 'assistant', 'user', 'assistant']
+
+
+def test_async_streamed_turn_saves_reply(flask_app, form):
+    response = run_turn({'session_id': 'async-3', 'message': 'Is there a trial?', 'stream': True}, form)
+
+    assert response.status_code == 200
+    events = [line.split(': ', 1)[1] for line in response.text.splitlines() if line.startswith('event: ')]
+    assert events[-1] == 'done'
+    assert set(events[:-1]) == {'token'}
+
+    messages = saved_messages(flask_app, 'async-3')
+    assert [role for role, _ in messages] == ['user', 'assistant']
+    assert messages[1][1]
+
+
+INSIGHTS = {'pain_points': ['Manual data entry'], 'buying_signals': ['Asked about pricing'], 'qualification_level': 'hot'}
+
+
+def test_async_submit_saves_lead_and_tags_together(flask_app, form, monkeypatch):
+    monkeypatch.setattr(async_chat, 'precomputed_insights', lambda *args: INSIGHTS)
+
+    response = post(f'/api/chat/{form}/submit', {'session_id': 'async-4', 'data': {'email': 'a@example.com'}})
+
+    assert response.status_code == 201
+    with flask_app.app_context():
+        lead = Lead.query.one()
+        assert lead.qualification_level == 'hot'
+        assert {(tag.kind, tag.value) for tag in LeadTag.query.filter_by(lead_id=lead.id)} == {
+            ('pain_point', 'Manual data entry'), ('buying_signal', 'Asked about pricing')
+        }
+        assert {(row.kind, row.count) for row in LeadTagCount.query.filter_by(form_id=form)} == {
+            ('pain_point', 1), ('buying_signal', 1)
+        }
+
+
+def test_async_submit_keeps_no_lead_when_tags_fail(flask_app, form, monkeypatch):
+    monkeypatch.setattr(async_chat, 'precomputed_insights', lambda *args: INSIGHTS)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('counter write failed')
+
+    monkeypatch.setattr(lead_tags, 'upsert_increment', fail)
+
+    response = post(f'/api/chat/{form}/submit', {'session_id': 'async-5', 'data': {}})
+
+    assert response.status_code == 500
+    with flask_app.app_context():
+        assert Lead.query.count() == 0
+        assert LeadTag.query.count() == 0
@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+from models import ChatMessage, ChatSession, db
+
+STARTED = datetime(2026, 1, 5, 9, 0)
+LEGACY = [
+    {'role': 'user', 'content': 'Hi, what is this?', 'timestamp': STARTED.isoformat()},
+    {'role': 'assistant', 'content': 'A conversational form.', 'timestamp': (STARTED + timedelta(seconds=2)).isoformat()},
+    {'role': 'user', 'content': 'Does it integrate with HubSpot?', 'timestamp': (STARTED + timedelta(seconds=9)).isoformat()},
+    {'role': 'assistant', 'content': 'Yes, through webhooks.'},
+]
+
+
+def legacy_session(form, session_id):
+    """A session as stored before chat_messages existed: transcript in the JSON column, no counter"""
+    db.session.add(ChatSession(
+        id=session_id, form_id=form, session_id=session_id, messages=LEGACY, message_count=0, context_data={}
+    ))
+    db.session.commit()
+
+
+def stored(session_id):
+    return [
+        (row.seq, row.role, row.content)
+        for row in ChatMessage.query.filter_by(session_id=session_id).order_by(ChatMessage.seq)
+    ]
+
+
+def test_migrate_command_moves_legacy_messages_once_in_order(flask_app, form):
+    runner = flask_app.test_cli_runner()
+    with flask_app.app_context():
+        legacy_session(form, 'legacy-1')
+
+        result = runner.invoke(args=['migrate-chat-messages', '--batch-size', '1'])
+        assert 'Migrated 1 chat sessions' in result.output
+
+        expected = [(seq, msg['role'], msg['content']) for seq, msg in enumerate(LEGACY)]
+        assert stored('legacy-1') == expected
+        chat_session = db.session.get(ChatSession, 'legacy-1')
+        assert chat_session.messages == []
+        assert chat_session.message_count == len(LEGACY)
+        first = ChatMessage.query.filter_by(session_id='legacy-1', seq=0).one()
+        assert first.created_at == STARTED
+
+        # Running it again, or using the session, adds nothing
+        assert 'Migrated 0 chat sessions' in runner.invoke(args=['migrate-chat-messages']).output
+        assert chat_session.migrate_legacy_messages() is False
+        assert stored('legacy-1') == expected
+
+
+def test_chat_turn_migrates_a_legacy_session_before_appending(flask_app, form):
+    with flask_app.app_context():
+        legacy_session(form, 'legacy-2')
+
+    client = flask_app.test_client()
+    for message in ('How much is it?', 'Is there a trial?'):
+        response = client.post(f'/api/chat/{form}', json={'session_id': 'legacy-2', 'message': message})
+        assert response.status_code == 200
+
+    with flask_app.app_context():
+        rows = stored('legacy-2')
+        assert [seq for seq, _, _ in rows] == list(range(len(LEGACY) + 4))
+        assert [content for _, _, content in rows[:len(LEGACY)]] == [msg['content'] for msg in LEGACY]
+        assert [(role, content) for _, role, content in rows[len(LEGACY)::2]] == [
+            ('user', 'How much is it?'), ('user', 'Is there a trial?')
+        ]
+        assert db.session.get(ChatSession, 'legacy-2').messages == []
@@ -0,0 +1,81 @@
+import json
+from types import SimpleNamespace
+import openai
+from models import ChatMessage, ChatSession
+from routes import chat
+
+SSE = {'Accept': 'text/event-stream'}
+
+
+def read_events(response):
+    """(event, payload) pairs of a Server-Sent Events body"""
+    events = []
+    for block in response.get_data(as_text=True).strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.splitlines())
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def saved_messages(flask_app, session_id):
+    with flask_app.app_context():
+        chat_session = ChatSession.query.filter_by(session_id=session_id).first()
+        return [
+            (row.role, row.content)
+            for row in ChatMessage.query.filter_by(session_id=chat_session.id).order_by(ChatMessage.seq)
+        ]
+
+
+def chunk(content):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+
+def test_stream_sends_tokens_then_done_and_saves_the_reply(flask_app, form):
+    response = flask_app.test_client().post(
+        f'/api/chat/{form}', json={'session_id': 'sse-1', 'message': 'What does it cost?'}, headers=SSE
+    )
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    events = read_events(response)
+    assert [event for event, _ in events[:-1]] == ['token'] * (len(events) - 1)
+    assert len(events) > 2
+    event, done = events[-1]
+    assert event == 'done'
+    assert done['message'] == ''.join(payload['content'] for _, payload in events[:-1])
+    assert saved_messages(flask_app, 'sse-1') == [('user', 'What does it cost?'), ('assistant', done['message'])]
+
+
+def test_stream_sends_the_fallback_when_the_llm_fails_before_any_token(flask_app, form, fake_llm):
+    fake_llm.config.fail_next(1)
+
+    response = flask_app.test_client().post(
+        f'/api/chat/{form}', json={'session_id': 'sse-2', 'message': 'What does it cost?'}, headers=SSE
+    )
+
+    events = read_events(response)
+    assert [event for event, _ in events] == ['token', 'done']
+    fallback = chat.ai_service._fallback_response()['message']
+    assert events[1][1]['message'] == fallback
+    assert saved_messages(flask_app, 'sse-2') == [('user', 'What does it cost?'), ('assistant', fallback)]
+
+
+def test_stream_ends_with_an_error_when_the_llm_breaks_off(flask_app, form, monkeypatch):
+    def broken_stream(**kwargs):
+        yield chunk('Our plans')
+        yield chunk(' start at')
+        raise openai.APIConnectionError(request=None)
+
+    monkeypatch.setattr(chat.ai_service.llm, 'stream', broken_stream)
+
+    response = flask_app.test_client().post(
+        f'/api/chat/{form}', json={'session_id': 'sse-3', 'message': 'What does it cost?'}, headers=SSE
+    )
+
+    events = read_events(response)
+    assert events == [
+        ('token', {'content': 'Our plans'}),
+        ('token', {'content': ' start at'}),
+        ('error', {'message': chat.STREAM_ERROR_MESSAGE}),
+    ]
+    # The truncated reply is not saved
+    assert saved_messages(flask_app, 'sse-3') == [('user', 'What does it cost?')]
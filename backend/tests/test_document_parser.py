@@ -0,0 +1,81 @@
+from concurrent.futures import Future
+
+import pytest
+from PyPDF2 import PdfWriter
+
+from services import document_parser
+from services.document_parser import DocumentLimitError, DocumentParser, PAGES_PER_TASK
+
+
+class CountingExecutor:
+    """Runs tasks inline and tracks how many results are waiting to be read"""
+
+    def __init__(self):
+        self.outstanding = 0
+        self.max_outstanding = 0
+        self.submitted = 0
+        self.cancelled = 0
+
+    def submit(self, fn, *args):
+        executor = self
+        future = Future()
+        future.set_result(fn(*args))
+        self.submitted += 1
+        self.outstanding += 1
+        self.max_outstanding = max(self.max_outstanding, self.outstanding)
+
+        result = future.result
+        cancel = future.cancel
+
+        def read(timeout=None):
+            executor.outstanding -= 1
+            return result(timeout)
+
+        def stop():
+            executor.cancelled += 1
+            return cancel()
+
+        future.result = read
+        future.cancel = stop
+        return future
+
+
+@pytest.fixture
+def pdf(tmp_path, monkeypatch):
+    path = tmp_path / 'doc.pdf'
+    writer = PdfWriter()
+    for _ in range(PAGES_PER_TASK * 10):
+        writer.add_blank_page(width=72, height=72)
+    with open(path, 'wb') as f:
+        writer.write(f)
+    monkeypatch.setattr(
+        document_parser, 'extract_pdf_pages',
+        lambda file_path, start, end: [f'page {number}' for number in range(start, end)]
+    )
+    return str(path)
+
+
+def test_parallel_pdf_keeps_a_bounded_window_in_order(pdf):
+    executor = CountingExecutor()
+    progress = []
+
+    text = DocumentParser().parse(
+        pdf, 'pdf', executor=executor, window=3,
+        on_progress=lambda done, total: progress.append(done)
+    )
+
+    assert text == '\n'.join(f'page {number}' for number in range(PAGES_PER_TASK * 10))
+    assert executor.submitted == 10
+    assert executor.max_outstanding <= 3
+    assert progress[-1] == PAGES_PER_TASK * 10
+
+
+def test_text_limit_stops_submitting_and_cancels_pending(pdf):
+    executor = CountingExecutor()
+    parser = DocumentParser(max_text_bytes=PAGES_PER_TASK * 12)
+
+    with pytest.raises(DocumentLimitError):
+        parser.parse(pdf, 'pdf', executor=executor, window=2)
+
+    assert executor.submitted < 10
+    assert executor.cancelled == executor.outstanding
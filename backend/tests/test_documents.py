@@ -0,0 +1,54 @@
+import io
+import os
+from models import Document, Form, StoredFile, db
+from services.answer_cache import answer_cache
+from services.blob_store import blob_store
+from services.form_cache import form_cache
+
+
+def add_document(form_id, document_id='doc-1'):
+    content_hash, file_path = blob_store.save(io.BytesIO(b'Pricing starts at $49 a month.'))
+    db.session.add(Document(
+        id=document_id, form_id=form_id, filename='pricing.txt', file_type='txt',
+        file_path=file_path, content_hash=content_hash, parsed_content='Pricing starts at $49 a month.'
+    ))
+    form = Form.query.get(form_id)
+    form.context_documents = [document_id]
+    db.session.commit()
+    return content_hash, file_path
+
+
+def test_delete_removes_the_file_and_invalidates_the_caches(flask_app, form):
+    with flask_app.app_context():
+        content_hash, file_path = add_document(form)
+        snapshot = form_cache.get(form)
+        answer_cache.put(snapshot, 'What does it cost?', 'From $49 a month.')
+
+    response = flask_app.test_client().delete('/api/documents/doc-1')
+
+    assert response.status_code == 204
+    assert not os.path.exists(file_path)
+    with flask_app.app_context():
+        assert StoredFile.query.get(content_hash) is None
+        snapshot = form_cache.get(form)
+        assert snapshot.context_documents == []
+    assert answer_cache.get(snapshot, 'What does it cost?') is None
+
+
+def test_file_is_kept_when_the_delete_does_not_commit(flask_app, form, monkeypatch):
+    with flask_app.app_context():
+        content_hash, file_path = add_document(form)
+
+    def failing_commit():
+        raise RuntimeError('database went away')
+
+    monkeypatch.setattr(db.session, 'commit', failing_commit)
+    response = flask_app.test_client().delete('/api/documents/doc-1')
+    monkeypatch.undo()
+
+    assert response.status_code == 500
+
+    assert os.path.exists(file_path)
+    with flask_app.app_context():
+        db.session.rollback()
+        assert Document.query.get('doc-1') is not None
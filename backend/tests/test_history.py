@@ -0,0 +1,121 @@
+import pytest
+from services.history import MESSAGE_OVERHEAD, HistoryBuilder
+
+# 9 estimated tokens of content, 13 with the per-message overhead
+CONTENT_TOKENS = 9
+MESSAGE_TOKENS = CONTENT_TOKENS + MESSAGE_OVERHEAD
+
+
+def messages(count, start=0):
+    return [
+        {'role': 'user' if i % 2 == 0 else 'assistant', 'content': f'{i:02d}' + 'x' * (CONTENT_TOKENS * 4 - 2)}
+        for i in range(start, start + count)
+    ]
+
+
+class Summarizer:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def __call__(self, previous, folded):
+        self.calls.append((previous, [m['content'][:2] for m in folded]))
+        if self.fail:
+            raise RuntimeError('OpenAI unavailable')
+        # Short enough not to eat into the window
+        return f'S{len(self.calls)}'
+
+
+@pytest.fixture
+def builder():
+    builder = HistoryBuilder(Summarizer())
+    builder.refold_ratio = 0.6
+    return builder
+
+
+def test_history_within_budget_is_kept_whole(builder):
+    history = messages(5)
+
+    summary, recent, state = builder.build(history, {}, budget=10 * MESSAGE_TOKENS)
+
+    assert (summary, recent, state) == ('', history, {})
+    assert builder.summarize.calls == []
+
+
+def test_overflow_folds_the_oldest_turns_down_to_the_refold_ratio(builder):
+    history = messages(12)
+
+    summary, recent, state = builder.build(history, {}, budget=10 * MESSAGE_TOKENS)
+
+    # 60% of the budget keeps the last 6 messages; the first 6 are folded in one call
+    assert builder.summarize.calls == [('', ['00', '01', '02', '03', '04', '05'])]
+    assert summary == 'S1'
+    assert recent == history[6:]
+    assert state == {'text': 'S1', 'message_count': 6}
+
+
+def test_headroom_avoids_a_summary_on_the_next_turns(builder):
+    history = messages(12)
+    _, _, state = builder.build(history, {}, budget=10 * MESSAGE_TOKENS)
+
+    # Two more turns still fit next to the summary: no extra summarize call, by design
+    history += messages(2, start=12)
+    summary, recent, next_state = builder.build(history, state, budget=10 * MESSAGE_TOKENS)
+
+    assert len(builder.summarize.calls) == 1
+    assert summary == 'S1'
+    assert recent == history[6:]
+    assert next_state == state
+
+
+def test_later_folds_only_summarize_messages_after_message_count(builder):
+    history = messages(12)
+    _, _, state = builder.build(history, {}, budget=10 * MESSAGE_TOKENS)
+
+    history += messages(6, start=12)
+    summary, recent, state = builder.build(history, state, budget=10 * MESSAGE_TOKENS)
+
+    # Continues from the previous summary with messages 6.. only; the summary's own
+    # tokens leave room for one message less than the first fold
+    assert builder.summarize.calls[1] == ('S1', ['06', '07', '08', '09', '10', '11', '12'])
+    assert state == {'text': 'S2', 'message_count': 13}
+    assert recent == history[13:]
+
+
+def test_offset_accounts_for_messages_not_loaded(builder):
+    # The caller only loaded the messages after the 6 already summarized
+    history = messages(12)
+    _, _, state = builder.build(history, {}, budget=10 * MESSAGE_TOKENS)
+
+    loaded = history[6:] + messages(6, start=12)
+    summary, recent, state = builder.build(loaded, state, budget=10 * MESSAGE_TOKENS, offset=6)
+
+    assert builder.summarize.calls[1] == ('S1', ['06', '07', '08', '09', '10', '11', '12'])
+    assert state == {'text': 'S2', 'message_count': 13}
+    assert [m['content'][:2] for m in recent] == ['13', '14', '15', '16', '17']
+
+
+def test_failed_summary_keeps_the_old_state_and_trims_to_the_budget():
+    summarizer = Summarizer(fail=True)
+    builder = HistoryBuilder(summarizer)
+    history = messages(12)
+
+    summary, recent, state = builder.build(history, {'text': 'old', 'message_count': 0}, budget=10 * MESSAGE_TOKENS)
+
+    assert summary == 'old'
+    assert state == {'text': 'old', 'message_count': 0}
+    # Still within the budget: the unsummarized overflow is left out of the prompt
+    assert sum(len(m['content']) // 4 + MESSAGE_OVERHEAD for m in recent) <= 10 * MESSAGE_TOKENS
+    assert recent == history[-len(recent):]
+
+    # The fold is retried on the next turn
+    builder.build(history, state, budget=10 * MESSAGE_TOKENS)
+    assert len(summarizer.calls) == 2
+
+
+def test_latest_message_is_kept_even_over_budget(builder):
+    history = messages(1) + [{'role': 'user', 'content': 'y' * 400}]
+
+    _, recent, _ = builder.build(history, {}, budget=20)
+
+    assert recent[-1]['content'] == 'y' * 400
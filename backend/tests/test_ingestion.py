@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+from models import DocumentJob, db
+from services.ingestion import ingestion_service
+
+
+def add_job(job_id, form_id, status, age, attempts=0):
+    updated_at = datetime.utcnow() - timedelta(seconds=age)
+    db.session.add(DocumentJob(
+        id=job_id, form_id=form_id, document_id=f'doc-{job_id}', filename='notes.txt', file_type='txt',
+        file_path='/tmp/notes.txt', status=status, attempts=attempts, created_at=updated_at, updated_at=updated_at
+    ))
+    db.session.commit()
+
+
+def test_recover_resubmits_abandoned_jobs(flask_app, form, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(ingestion_service, 'submit', submitted.append)
+
+    with flask_app.app_context():
+        add_job('queued-old', form, 'queued', ingestion_service.recovery_interval + 5)
+        add_job('queued-new', form, 'queued', 0)
+        add_job('stale', form, 'processing', ingestion_service.claim_timeout + 5)
+        add_job('running', form, 'processing', 5)
+        add_job('done', form, 'completed', ingestion_service.claim_timeout + 5)
+
+        assert ingestion_service.recover() == 2
+
+    # Oldest first
+    assert submitted == ['stale', 'queued-old']
+
+
+def test_claim_takes_queued_and_stale_jobs_only(flask_app, form):
+    with flask_app.app_context():
+        add_job('queued', form, 'queued', 0)
+        add_job('stale', form, 'processing', ingestion_service.claim_timeout + 5, attempts=1)
+        add_job('running', form, 'processing', 5, attempts=1)
+
+        assert ingestion_service._claim('queued').attempts == 1
+        assert ingestion_service._claim('stale').attempts == 2
+        assert ingestion_service._claim('running') is None
+        # Already claimed by the first call
+        assert ingestion_service._claim('queued') is None
+
+
+def test_claim_fails_jobs_out_of_attempts(flask_app, form):
+    with flask_app.app_context():
+        add_job('crashy', form, 'processing', ingestion_service.claim_timeout + 5,
+                attempts=ingestion_service.max_attempts)
+
+        assert ingestion_service._claim('crashy') is None
+        job = DocumentJob.query.get('crashy')
+        assert job.status == 'failed'
+        assert 'attempts' in job.error
@@ -0,0 +1,69 @@
+from models import Lead, db
+from routes.chat import build_lead
+from services.lead_analysis import lead_analysis
+
+INSIGHTS = {'pain_points': ['manual follow-up'], 'buying_signals': [], 'qualification_level': 'warm'}
+
+
+def pending_lead(form):
+    lead = build_lead(form, 'analysis-1', {'email': 'a@example.com'}, [
+        {'role': 'user', 'content': 'We follow up on leads by hand.'},
+    ])
+    db.session.add(lead)
+    db.session.commit()
+    return lead.id
+
+
+def test_no_transaction_is_held_during_the_model_call(flask_app, form, monkeypatch):
+    in_transaction = []
+
+    def analyze_lead(history, responses, form):
+        in_transaction.append(db.session().in_transaction())
+        return INSIGHTS
+
+    monkeypatch.setattr(lead_analysis.ai_service, 'analyze_lead', analyze_lead)
+    monkeypatch.setattr(lead_analysis, '_send_webhook', lambda lead: None)
+
+    with flask_app.app_context():
+        lead_id = pending_lead(form)
+        assert lead_analysis.process_pending() == 1
+
+        assert in_transaction == [False]
+        lead = Lead.query.get(lead_id)
+        assert lead.analysis_status == 'completed'
+        assert lead.qualification_level == 'warm'
+
+
+def test_result_is_dropped_when_the_lead_was_reclaimed(flask_app, form, monkeypatch):
+    def analyze_lead(history, responses, form):
+        # Another worker took the lead over after the claim went stale
+        db.session.query(Lead).update({Lead.analysis_attempts: Lead.analysis_attempts + 1})
+        db.session.commit()
+        return INSIGHTS
+
+    monkeypatch.setattr(lead_analysis.ai_service, 'analyze_lead', analyze_lead)
+    monkeypatch.setattr(lead_analysis, '_send_webhook', lambda lead: None)
+
+    with flask_app.app_context():
+        lead_id = pending_lead(form)
+        lead_analysis.process_pending()
+
+        lead = Lead.query.get(lead_id)
+        assert lead.analysis_status == 'processing'
+        assert lead.qualification_level == 'cold'
+
+
+def test_null_analysis_keys_get_defaults(flask_app, form, monkeypatch):
+    monkeypatch.setattr(lead_analysis.ai_service, 'analyze_lead', lambda history, responses, form: {
+        'pain_points': None, 'qualification_level': None
+    })
+    monkeypatch.setattr(lead_analysis, '_send_webhook', lambda lead: None)
+
+    with flask_app.app_context():
+        lead_id = pending_lead(form)
+        lead_analysis.process_pending()
+
+        lead = Lead.query.get(lead_id)
+        assert lead.analysis_status == 'completed'
+        assert lead.qualification_level == 'cold'
+        assert lead.pain_points == [] and lead.buying_signals == []
@@ -0,0 +1,108 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import Lead, db
+from services import lead_export
+
+START = datetime(2026, 3, 1, 12, 0)
+# Five leads share each timestamp, so pages and chunks split runs of equal created_at
+LEAD_COUNT = 23
+
+
+@pytest.fixture
+def leads(flask_app, form):
+    with flask_app.app_context():
+        for i in range(LEAD_COUNT):
+            db.session.add(Lead(
+                id=f'lead-{i:02d}', form_id=form, session_id=f'session-{i}',
+                contact_info={'name': f'Name {i}', 'email': f'{i}@example.com', 'phone': ''},
+                responses={}, conversation_history=[],
+                pain_points=[f'pain {i}', 'manual work'], buying_signals=[] if i % 2 else ['budget set'],
+                qualification_level=('hot', 'warm', 'cold')[i % 3],
+                created_at=START + timedelta(minutes=i // 5)
+            ))
+        db.session.commit()
+        # Newest first, ties broken by id, as the API and the exports order them
+        rows = Lead.query.filter_by(form_id=form).all()
+        return [lead.id for lead in sorted(rows, key=lambda lead: (lead.created_at, lead.id), reverse=True)]
+
+
+def export(flask_app, form, **params):
+    response = flask_app.test_client().get(f'/api/leads/export/{form}', query_string=params)
+    assert response.status_code == 200
+    return response
+
+
+def test_gzip_csv_round_trip(flask_app, form, leads, monkeypatch):
+    monkeypatch.setattr(lead_export, 'CHUNK_SIZE', 256)
+
+    response = export(flask_app, form, gzip=1)
+
+    assert response.mimetype == 'application/gzip'
+    assert response.headers['Content-Disposition'].endswith('.csv.gz"')
+    rows = list(csv.reader(io.StringIO(zlib.decompress(response.data, wbits=31).decode('utf-8'))))
+    assert rows[0] == lead_export.CSV_HEADER
+    assert [row[0] for row in rows[1:]] == leads
+    first = rows[1]
+    assert first[2] == f'{int(first[0][-2:])}@example.com'
+    assert first[5] == f'pain {int(first[0][-2:])}; manual work'
+
+
+def test_gzip_ndjson_round_trip(flask_app, form, leads):
+    response = export(flask_app, form, format='ndjson', gzip='true')
+
+    lines = zlib.decompress(response.data, wbits=31).decode('utf-8').splitlines()
+    records = [json.loads(line) for line in lines]
+    assert [record['id'] for record in records] == leads
+    assert set(records[0]) == set(lead_export.EXPORT_FIELDS)
+
+
+def test_parquet_round_trip_by_row_group(flask_app, form, leads, monkeypatch):
+    pq = pytest.importorskip('pyarrow.parquet')
+    monkeypatch.setattr(lead_export, 'ROWS_PER_PARQUET_GROUP', 5)
+
+    response = export(flask_app, form, format='parquet', gzip=1)
+
+    assert response.mimetype == 'application/vnd.apache.parquet'
+    parquet = pq.ParquetFile(io.BytesIO(response.data))
+    assert parquet.metadata.num_rows == LEAD_COUNT
+    assert parquet.num_row_groups == -(-LEAD_COUNT // 5)
+
+    rows = []
+    for group in range(parquet.num_row_groups):
+        rows.extend(parquet.read_row_group(group).to_pylist())
+    assert [row['id'] for row in rows] == leads
+
+    with flask_app.app_context():
+        lead = db.session.get(Lead, rows[0]['id'])
+        assert rows[0]['created_at'] == lead.created_at
+        assert rows[0]['pain_points'] == lead.pain_points
+        assert rows[0]['buying_signals'] == lead.buying_signals
+        assert rows[0]['email'] == lead.contact_info['email']
+
+
+@pytest.mark.parametrize('limit', [1, 4, 5, 7, LEAD_COUNT])
+def test_keyset_pages_cover_equal_timestamps_once(flask_app, form, leads, limit):
+    client = flask_app.test_client()
+    seen = []
+    cursor = None
+    while True:
+        params = {'form_id': form, 'limit': limit}
+        if cursor:
+            params['cursor'] = cursor
+        response = client.get('/api/leads', query_string=params)
+        assert response.status_code == 200
+        page = [lead['id'] for lead in response.get_json()]
+        assert len(page) <= limit
+        seen.extend(page)
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+
+    assert len(seen) == len(set(seen))
+    assert seen == leads
@@ -0,0 +1,65 @@
+from models import ChatSession, db
+from routes.chat import build_lead
+from services.lead_insights import complete_insights, lead_insights, session_insights
+
+
+def chat_session(form, context_data=None):
+    session = ChatSession(id='insights-1', form_id=form, session_id='insights-1', context_data=context_data or {})
+    db.session.add(session)
+    session.add_message('user', 'We lose leads because follow-up is manual.')
+    session.add_message('assistant', 'How many leads a month?')
+    db.session.commit()
+    return session
+
+
+def test_complete_insights_fills_missing_and_null_keys():
+    previous = {'pain_points': ['manual follow-up'], 'qualification_level': 'warm'}
+
+    assert complete_insights({'buying_signals': None}, previous) == {
+        'pain_points': ['manual follow-up'],
+        'buying_signals': [],
+        'qualification_level': 'warm',
+        'summary': 'Lead submitted form',
+    }
+    # Explicit values, even empty ones, win over earlier findings
+    assert complete_insights({'pain_points': [], 'qualification_level': 'hot'}, previous)['pain_points'] == []
+    assert complete_insights({}, None)['qualification_level'] == 'cold'
+
+
+def test_update_never_stores_null_insights(flask_app, form, monkeypatch):
+    monkeypatch.setattr(lead_insights.ai_service, 'update_insights', lambda previous, messages: {
+        'pain_points': ['manual follow-up'], 'qualification_level': None
+    })
+
+    with flask_app.app_context():
+        session_id = chat_session(form).id
+        lead_insights.update(session_id)
+
+        insights = session_insights(ChatSession.query.get(session_id))
+        assert insights['message_count'] == 2
+        assert insights['qualification_level'] == 'cold'
+        assert insights['buying_signals'] == []
+
+        lead = build_lead(form, 'insights-1', {}, [], insights)
+        assert lead.qualification_level == 'cold'
+        assert lead.buying_signals == []
+
+
+def test_update_keeps_earlier_findings_the_model_left_out(flask_app, form, monkeypatch):
+    monkeypatch.setattr(lead_insights.ai_service, 'update_insights', lambda previous, messages: {
+        'buying_signals': ['asked about pricing']
+    })
+    earlier = {
+        'pain_points': ['manual follow-up'], 'buying_signals': [], 'qualification_level': 'warm',
+        'summary': 'Small sales team', 'message_count': 1
+    }
+
+    with flask_app.app_context():
+        session_id = chat_session(form, {'insights': earlier}).id
+        lead_insights.update(session_id)
+
+        insights = session_insights(ChatSession.query.get(session_id))
+        assert insights['pain_points'] == ['manual follow-up']
+        assert insights['buying_signals'] == ['asked about pricing']
+        assert insights['qualification_level'] == 'warm'
+        assert insights['message_count'] == 2
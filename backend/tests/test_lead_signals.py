@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+import pytest
+from services.lead_signals import KeywordMatcher, LeadSignalEngine, extract
+
+
+def form(signal_dictionaries=None):
+    return SimpleNamespace(id='form-1', updated_at=None, ai_settings={'signal_dictionaries': signal_dictionaries})
+
+
+def test_matcher_finds_overlapping_keywords_in_one_pass():
+    matcher = KeywordMatcher({'a': ['sign up', 'up'], 'b': ['sign up now', 'now']})
+
+    assert matcher.find('Can I Sign Up Now?') == [('a', 'sign up'), ('a', 'up'), ('b', 'sign up now'), ('b', 'now')]
+
+
+def test_matcher_requires_word_boundaries():
+    matcher = KeywordMatcher({'buying_signal': ['buy', 'demo']})
+
+    assert matcher.find('buyer wants a demonstration') == []
+    assert matcher.find('we want to buy, then a demo.') == [('buying_signal', 'buy'), ('buying_signal', 'demo')]
+
+
+@pytest.mark.parametrize('message, company', [
+    ('I work at Acme Robotics and need a demo', 'Acme Robotics'),
+    ('My company is Globex.', 'Globex'),
+    ("I'm Dana from Initech Inc. and we're evaluating", 'Initech Inc.'),
+    ('We are Looking for a CRM', None),
+    ('I am from Germany', None),
+    ("We're Interested in pricing", None),
+    ('I work at a small agency', None),
+])
+def test_extract_company_needs_an_explicit_cue(message, company):
+    assert extract(message).get('company') == company
+
+
+def test_extract_contact_and_qualification_facts():
+    extracted = extract('Reach me at dana@example.com or 555-123-4567. Team of 25, budget $20k, need it next month.')
+
+    assert extracted == {
+        'email': 'dana@example.com',
+        'phone': '555-123-4567',
+        'budget': '$20k',
+        'timeline': 'next month',
+        'team_size': 25,
+    }
+
+
+def test_score_levels():
+    engine = LeadSignalEngine()
+
+    hot = engine.score(None, [
+        {'role': 'user', 'content': 'Ready to sign up, what is the pricing? Budget is $10k, we need it asap.'},
+    ])
+    assert hot['qualification_level'] == 'hot'
+    assert 'pricing' in hot['buying_signals']
+
+    cold = engine.score(None, [{'role': 'user', 'content': 'Just browsing for my homework'}])
+    assert cold['qualification_level'] == 'cold'
+    assert cold['clear_cut']
+
+    # Assistant messages don't count
+    assert engine.score(None, [{'role': 'assistant', 'content': 'Ready for a demo?'}])['score'] == 0
+
+
+def test_custom_dictionaries_add_keywords():
+    engine = LeadSignalEngine()
+
+    labels, _ = engine.analyze_message(form({'pain_point': ['spreadsheets']}), 'We live in spreadsheets')
+
+    assert labels == {'pain_point'}
+
+
+@pytest.mark.parametrize('dictionaries, labels', [
+    # A string would otherwise be added one character at a time
+    ({'pain_point': 'spreadsheets'}, set()),
+    ({'pain_point': ['spreadsheets', 42, None, '']}, {'pain_point'}),
+    (['spreadsheets'], set()),
+])
+def test_malformed_custom_dictionaries_are_skipped(dictionaries, labels):
+    engine = LeadSignalEngine()
+
+    found, _ = engine.analyze_message(form(dictionaries), 'We live in spreadsheets, s and p everywhere')
+
+    assert found == labels
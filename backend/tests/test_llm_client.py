@@ -0,0 +1,195 @@
+import asyncio
+import threading
+import time
+import openai
+import pytest
+from services.llm_client import AsyncLLMClient, CircuitOpenError, LLMClient
+
+MESSAGES = [{'role': 'user', 'content': 'Hello'}]
+
+
+@pytest.fixture
+def llm_env(monkeypatch, fake_llm):
+    """Client settings read at construction: fast backoff, a two-failure breaker"""
+    monkeypatch.setenv('LLM_MAX_RETRIES', '2')
+    monkeypatch.setenv('LLM_BACKOFF_BASE', '0.01')
+    monkeypatch.setenv('LLM_BACKOFF_MAX', '0.02')
+    monkeypatch.setenv('LLM_BREAKER_FAILURES', '2')
+    monkeypatch.setenv('LLM_BREAKER_COOLDOWN', '0.2')
+    monkeypatch.setenv('LLM_HEDGE', 'false')
+    return fake_llm.config
+
+
+def complete(client):
+    return client.complete(model='gpt-test', messages=MESSAGES)
+
+
+def open_breaker(client, config):
+    """Two failed calls without retries open a two-failure breaker"""
+    client.max_retries = 0
+    config.fail_next(2)
+    for _ in range(2):
+        with pytest.raises(openai.InternalServerError):
+            complete(client)
+    assert client.breaker.state == 'open'
+
+
+def test_retries_transient_errors(llm_env):
+    client = LLMClient()
+    # Every failed attempt counts towards the breaker, retries included
+    client.breaker.failure_threshold = 10
+    llm_env.fail_next(2)
+
+    response = complete(client)
+
+    assert response.choices[0].message.content
+    assert llm_env.requests == 3
+    assert client.breaker.state == 'closed'
+
+
+def test_gives_up_after_max_retries(llm_env):
+    client = LLMClient()
+    client.breaker.failure_threshold = 10
+    llm_env.fail_next(3)
+
+    with pytest.raises(openai.InternalServerError):
+        complete(client)
+    assert llm_env.requests == 3
+
+
+def test_does_not_retry_bad_requests(llm_env):
+    client = LLMClient()
+    llm_env.fail_next(1, status=400)
+
+    with pytest.raises(openai.BadRequestError):
+        complete(client)
+    assert llm_env.requests == 1
+    assert client.breaker.failures == 0
+
+
+def test_hedges_requests_slower_than_p95(monkeypatch, llm_env):
+    monkeypatch.setenv('LLM_HEDGE', 'true')
+    monkeypatch.setenv('LLM_HEDGE_MIN_SAMPLES', '5')
+    client = LLMClient()
+
+    llm_env.delay_next(*[0.05] * 5)
+    for _ in range(5):
+        complete(client)
+    assert client.p95('gpt-test') is not None
+
+    # The first attempt stalls; the hedge sent after p95 answers at once
+    llm_env.reset()
+    llm_env.delay_next(2.0, 0)
+    started = time.monotonic()
+    response = complete(client)
+
+    assert response.choices[0].message.content
+    assert time.monotonic() - started < 1.0
+    assert llm_env.requests == 2
+
+
+def test_breaker_opens_and_rejects_without_calling(llm_env):
+    client = LLMClient()
+    open_breaker(client, llm_env)
+
+    with pytest.raises(CircuitOpenError):
+        complete(client)
+    assert llm_env.requests == 2
+
+
+def test_breaker_closes_after_successful_trial(llm_env):
+    client = LLMClient()
+    open_breaker(client, llm_env)
+
+    time.sleep(0.25)
+    assert client.breaker.state == 'half_open'
+    complete(client)
+
+    assert client.breaker.state == 'closed'
+    assert client.breaker.failures == 0
+
+
+def test_breaker_reopens_after_failed_trial(llm_env):
+    client = LLMClient()
+    open_breaker(client, llm_env)
+
+    time.sleep(0.25)
+    llm_env.fail_next(1)
+    with pytest.raises(openai.InternalServerError):
+        complete(client)
+
+    assert client.breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        complete(client)
+
+
+def test_half_open_lets_one_trial_through(llm_env):
+    client = LLMClient()
+    open_breaker(client, llm_env)
+    time.sleep(0.25)
+
+    llm_env.delay_next(0.3)
+    trial = threading.Thread(target=complete, args=(client,))
+    trial.start()
+    time.sleep(0.1)
+    with pytest.raises(CircuitOpenError):
+        complete(client)
+    trial.join()
+
+    assert client.breaker.state == 'closed'
+
+
+def test_trial_with_non_retryable_error_frees_the_breaker(llm_env):
+    client = LLMClient()
+    open_breaker(client, llm_env)
+    time.sleep(0.25)
+
+    llm_env.fail_next(1, status=400)
+    with pytest.raises(openai.BadRequestError):
+        complete(client)
+
+    # The next call is the new trial instead of being rejected forever
+    assert client.breaker.state == 'half_open'
+    complete(client)
+    assert client.breaker.state == 'closed'
+
+
+def test_async_trial_with_non_retryable_error_frees_the_breaker(llm_env):
+    async def scenario():
+        client = AsyncLLMClient()
+        client.max_retries = 0
+        llm_env.fail_next(2)
+        for _ in range(2):
+            with pytest.raises(openai.InternalServerError):
+                await client.complete(model='gpt-test', messages=MESSAGES)
+        assert client.breaker.state == 'open'
+
+        await asyncio.sleep(0.25)
+        llm_env.fail_next(1, status=401)
+        with pytest.raises(openai.AuthenticationError):
+            await client.complete(model='gpt-test', messages=MESSAGES)
+
+        await client.complete(model='gpt-test', messages=MESSAGES)
+        assert client.breaker.state == 'closed'
+        await client.close()
+
+    asyncio.run(scenario())
+
+
+def test_async_cancelled_trial_frees_the_breaker(llm_env):
+    async def scenario():
+        client = AsyncLLMClient()
+        client.breaker.opened_at = time.monotonic() - 1
+
+        llm_env.delay_next(1.0)
+        trial = asyncio.ensure_future(client.complete(model='gpt-test', messages=MESSAGES))
+        await asyncio.sleep(0.1)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+        await client.complete(model='gpt-test', messages=MESSAGES)
+        assert client.breaker.state == 'closed'
+        await client.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,60 @@
+import pytest
+from routes import async_chat
+from services import metrics
+from tests.test_async_chat import run_turn
+
+
+def request_count(route, status):
+    """Samples of http_request_duration_seconds for one route and status"""
+    return sum(
+        counts[-1] for key, (counts, _) in list(metrics.http_request_duration._values.items())
+        if dict(key)['route'] == route and dict(key)['status'] == status
+    )
+
+
+def test_metrics_are_off_without_a_token(flask_app, monkeypatch):
+    monkeypatch.delenv('METRICS_TOKEN', raising=False)
+
+    assert flask_app.test_client().get('/api/metrics').status_code == 404
+
+
+def test_metrics_require_the_bearer_token(flask_app, monkeypatch):
+    monkeypatch.setenv('METRICS_TOKEN', 'scrape-secret')
+    client = flask_app.test_client()
+
+    assert client.get('/api/metrics').status_code == 401
+    assert client.get('/api/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+
+    response = client.get('/api/metrics', headers={'Authorization': 'Bearer scrape-secret'})
+    assert response.status_code == 200
+    assert '# TYPE http_request_duration_seconds histogram' in response.get_data(as_text=True)
+
+
+def test_requests_that_raise_are_timed(flask_app, monkeypatch):
+    def fail():
+        raise RuntimeError('boom')
+
+    # Propagating skips after_request, as in debug mode or when an earlier hook raises
+    monkeypatch.setitem(flask_app.config, 'PROPAGATE_EXCEPTIONS', True)
+    monkeypatch.setitem(flask_app.view_functions, 'health_check', fail)
+    before = request_count('/api/health', 500)
+
+    with pytest.raises(RuntimeError):
+        flask_app.test_client().get('/api/health')
+
+    assert request_count('/api/health', 500) == before + 1
+
+
+def test_async_requests_are_timed(flask_app, form, monkeypatch):
+    route = '/api/chat/<form_id>'
+    before = request_count(route, 200), request_count(route, 500)
+
+    run_turn({'session_id': 'metrics-1', 'message': 'What does it cost?'}, form)
+
+    async def fail(*args):
+        raise RuntimeError('boom')
+
+    monkeypatch.setattr(async_chat.form_cache, 'get_async', fail)
+    assert run_turn({'session_id': 'metrics-2', 'message': 'Hello?'}, form).status_code == 500
+
+    assert (request_count(route, 200), request_count(route, 500)) == (before[0] + 1, before[1] + 1)
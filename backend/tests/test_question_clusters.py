@@ -0,0 +1,83 @@
+import queue
+import numpy as np
+import pytest
+from models import ChatMessage, QuestionCluster, db
+from services.question_clusters import (
+    BANDS, NUM_PERM, QuestionClusterService, band_keys, minhash, normalize, question_recorder, similarity
+)
+
+
+def test_minhash_is_deterministic_and_normalization_insensitive():
+    signature = minhash(normalize('What does it cost?'))
+
+    assert signature.shape == (NUM_PERM,)
+    assert np.array_equal(signature, minhash(normalize('Hi, what does it COST')))
+    assert similarity(signature, signature) == 1.0
+
+
+def test_band_keys_are_prefixed_by_band():
+    keys = band_keys(minhash(normalize('Do you integrate with HubSpot?')))
+
+    assert len(keys) == BANDS
+    assert [key.split(':')[0] for key in keys] == [str(i) for i in range(BANDS)]
+
+
+def test_near_duplicates_share_bands_and_distinct_questions_do_not():
+    pricing = minhash(normalize('How much does the pro plan cost per month?'))
+    near = minhash(normalize('How much does the pro plan costs per month??'))
+    other = minhash(normalize('Do you integrate with Salesforce?'))
+
+    assert similarity(pricing, near) > 0.5
+    assert set(band_keys(pricing)) & set(band_keys(near))
+    assert similarity(pricing, other) < 0.2
+
+
+def test_near_duplicate_questions_land_in_one_cluster(flask_app, form):
+    service = QuestionClusterService()
+    with flask_app.app_context():
+        for message in [
+            'How much does the pro plan cost per month?',
+            'how much does the Pro plan costs per month?',
+            'How much does the pro plan cost per month',
+            'Do you integrate with Salesforce?',
+            'Thanks, that is all',
+        ]:
+            service.record(form, message)
+        db.session.commit()
+
+        assert service.top_questions(form) == [
+            {'question': 'How much does the pro plan cost per month?', 'count': 3},
+            {'question': 'Do you integrate with Salesforce?', 'count': 1},
+        ]
+
+
+@pytest.fixture
+def recorder(flask_app, monkeypatch):
+    # Processed by the tests with flush(); a thread started by earlier tests keeps the old queue
+    monkeypatch.setattr(question_recorder, '_ensure_worker', lambda: None)
+    monkeypatch.setattr(question_recorder, '_queue', queue.Queue())
+    return question_recorder
+
+
+def test_chat_turn_leaves_clustering_to_the_recorder(flask_app, form, recorder):
+    response = flask_app.test_client().post(
+        f'/api/chat/{form}', json={'session_id': 'q-1', 'message': 'Is there a free trial?'}
+    )
+
+    assert response.status_code == 200
+    with flask_app.app_context():
+        assert QuestionCluster.query.count() == 0
+        assert recorder.flush() == 1
+        assert QuestionCluster.query.one().representative == 'Is there a free trial?'
+
+
+def test_clustering_failure_keeps_the_user_message(flask_app, form, recorder, monkeypatch):
+    def broken(form_id, message):
+        raise RuntimeError('clusters table locked')
+
+    monkeypatch.setattr(recorder.service, 'record', broken)
+    flask_app.test_client().post(f'/api/chat/{form}', json={'session_id': 'q-2', 'message': 'Is there a free trial?'})
+    recorder.flush()
+
+    with flask_app.app_context():
+        assert [m.role for m in ChatMessage.query.order_by(ChatMessage.seq)] == ['user', 'assistant']
@@ -0,0 +1,79 @@
+from models import Document, db
+from services.retrieval import FormIndex, RetrievalService, chunk_text, tokenize
+
+
+def test_chunk_text_keeps_small_paragraphs_together():
+    text = 'Pricing starts at $49.\n\nAnnual plans get two months free.\n\n\nSupport is 24/7.'
+
+    assert chunk_text(text, 300) == ['Pricing starts at $49.\nAnnual plans get two months free.\nSupport is 24/7.']
+    assert chunk_text(text, 10) == ['Pricing starts at $49.', 'Annual plans get two months free.', 'Support is 24/7.']
+
+
+def test_chunk_text_splits_long_paragraphs_on_sentences():
+    paragraph = ' '.join(f'Sentence number {i} is here.' for i in range(20))
+
+    chunks = chunk_text(paragraph, 20)
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 20 * 4 for chunk in chunks)
+    assert ' '.join(chunks).replace('\n', ' ') == paragraph
+
+
+def test_chunk_text_hard_splits_text_without_punctuation():
+    chunks = chunk_text('x' * 100, 10)
+
+    assert chunks == ['x' * 40, 'x' * 40, 'x' * 20]
+
+
+def index_of(texts):
+    from collections import Counter
+    return FormIndex([(i, dict(Counter(tokenize(text)))) for i, text in enumerate(texts)])
+
+
+def test_bm25_ranks_rarer_and_more_frequent_terms_higher():
+    index = index_of([
+        'Our pricing page lists every plan.',
+        'Pricing: the pro plan costs $49, pricing for teams is custom.',
+        'We integrate with HubSpot and Salesforce.',
+    ])
+
+    assert [chunk_id for chunk_id, _ in index.search(tokenize('pricing'), 5)] == [1, 0]
+    assert [chunk_id for chunk_id, _ in index.search(tokenize('hubspot pricing'), 1)] == [2]
+    assert index.search(tokenize('refunds'), 5) == []
+
+
+def add_document(form_id, document_id, content):
+    document = Document(
+        id=document_id, form_id=form_id, filename=f'{document_id}.txt', file_type='txt',
+        file_path=f'/tmp/{document_id}.txt', parsed_content=content
+    )
+    db.session.add(document)
+    return document
+
+
+def test_index_is_rebuilt_after_delete_and_add_with_reused_ids(flask_app, form):
+    service = RetrievalService()
+    with flask_app.app_context():
+        service.index_document(add_document(form, 'old', 'Pricing starts at $49 a month.'))
+        db.session.commit()
+        assert service.retrieve(form, 'pricing') == ['Pricing starts at $49 a month.']
+
+        # Same chunk count, and SQLite hands out the deleted chunk's id again
+        db.session.delete(Document.query.get('old'))
+        db.session.flush()
+        service.index_document(add_document(form, 'new', 'Pricing is now $59 a month.'))
+        db.session.commit()
+
+        assert service.retrieve(form, 'pricing') == ['Pricing is now $59 a month.']
+
+
+def test_retrieve_respects_the_token_budget(flask_app, form):
+    service = RetrievalService()
+    with flask_app.app_context():
+        service.index_document(add_document(form, 'short', 'Pricing is $49.'))
+        service.index_document(add_document(form, 'long', 'Pricing details and more pricing. ' * 20))
+        db.session.commit()
+
+        # The long chunk alone is over budget, so it is skipped whatever its rank
+        assert service.retrieve(form, 'pricing', token_budget=10) == ['Pricing is $49.']
+        assert len(service.retrieve(form, 'pricing')) == 2
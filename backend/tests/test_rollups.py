@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+from models import ChatSession, db
+from services.analytics_buffer import analytics_buffer
+from services.rollups import avg_completion_time, increment_rollups
+
+
+def test_completion_counters_average_completion_times(flask_app, form):
+    now = datetime.utcnow()
+    with flask_app.app_context():
+        increment_rollups([
+            {'form_id': form, 'event_type': 'form_completed', 'event_data': {'completion_seconds': 60},
+             'timestamp': now},
+            {'form_id': form, 'event_type': 'form_completed', 'event_data': {'completion_seconds': 120},
+             'timestamp': now},
+            # Recorded before completion times were tracked
+            {'form_id': form, 'event_type': 'form_completed', 'event_data': {}, 'timestamp': now},
+            {'form_id': form, 'event_type': 'form_view', 'event_data': {'completion_seconds': 999},
+             'timestamp': now},
+        ])
+        db.session.commit()
+
+        assert avg_completion_time([form], now - timedelta(days=1)) == 90
+        assert avg_completion_time([form], now + timedelta(hours=2)) == 0
+
+
+def test_dashboard_reads_completion_time_from_rollups(flask_app, form):
+    with flask_app.app_context():
+        db.session.add(ChatSession(
+            id='dash-session', session_id='dash-1', form_id=form, started_at=datetime.utcnow() - timedelta(seconds=300)
+        ))
+        db.session.commit()
+
+    client = flask_app.test_client()
+    assert client.post(f'/api/chat/{form}/submit', json={
+        'session_id': 'dash-1', 'data': {'email': 'a@example.com'}
+    }).status_code == 201
+    with flask_app.app_context():
+        analytics_buffer.flush()
+
+    stats = client.get('/api/analytics/dashboard', headers={'Authorization': 'test-user'}).get_json()
+
+    assert stats['total_completions'] == 1
+    assert 295 <= stats['avg_completion_time'] <= 310
+
+
+def test_track_rejects_events_the_columns_cannot_hold(flask_app, form):
+    client = flask_app.test_client()
+
+    assert client.post('/api/analytics/track', json={'form_id': form, 'event_type': 'x' * 51}).status_code == 400
+    assert client.post('/api/analytics/track', json={
+        'form_id': form, 'event_type': 'form_view', 'session_id': 's' * 101
+    }).status_code == 400
+    assert client.post('/api/analytics/track', json={'form_id': 7, 'event_type': 'form_view'}).status_code == 400
+    response = client.post('/api/analytics/track/batch', json={'events': [
+        {'form_id': form, 'event_type': 'form_view'},
+        {'form_id': form, 'event_type': 'form_view', 'event_data': 'oops'},
+    ]})
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith('Event 1:')
+
+    assert client.post('/api/analytics/track', json={
+        'form_id': form, 'event_type': 'form_view', 'session_id': 's' * 100, 'event_data': None
+    }).status_code == 201
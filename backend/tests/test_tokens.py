@@ -0,0 +1,50 @@
+import threading
+import time
+import pytest
+from services import tokens
+
+
+class FakeEncoding:
+    def encode(self, text, disallowed_special=()):
+        return text.split()
+
+
+class SlowTiktoken:
+    """get_encoding blocks until released, like a stalled download"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = 0
+
+    def get_encoding(self, name):
+        self.calls += 1
+        self.release.wait(5)
+        return FakeEncoding()
+
+
+@pytest.fixture
+def slow_tiktoken(monkeypatch):
+    fake = SlowTiktoken()
+    monkeypatch.setattr(tokens, 'tiktoken', fake)
+    monkeypatch.setattr(tokens, '_encoding', None)
+    monkeypatch.setattr(tokens, '_encoding_failed', False)
+    monkeypatch.setattr(tokens, '_loader_pid', None)
+    yield fake
+    fake.release.set()
+
+
+def test_count_tokens_estimates_while_the_encoding_loads(slow_tiktoken):
+    started = time.monotonic()
+    assert tokens.count_tokens('one two three four') == tokens.estimate_tokens('one two three four')
+    assert tokens.count_tokens('five six') == tokens.estimate_tokens('five six')
+    assert time.monotonic() - started < 1.0
+
+    slow_tiktoken.release.set()
+    for _ in range(50):
+        if tokens.encoding_ready():
+            break
+        time.sleep(0.02)
+
+    assert tokens.count_tokens('one two three four') == 4
+    # A single background load per process
+    assert slow_tiktoken.calls == 1
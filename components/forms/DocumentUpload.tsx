@@ -40,15 +40,16 @@ export function DocumentUpload({ formId, onUploadComplete }: DocumentUploadProps
 
       const response = await documentsApi.upload(formData)
       
+      // Parsing continues in the background as a job
       setUploadedDocs([...uploadedDocs, {
-        id: response.data.id,
+        id: response.data.document_id,
         filename: response.data.filename
       }])
 
-      toast.success('Document uploaded and parsed successfully')
+      toast.success('Document uploaded, processing in the background')
       
       if (onUploadComplete) {
-        onUploadComplete(response.data.id)
+        onUploadComplete(response.data.document_id)
       }
     } catch (error) {
       toast.error('Failed to upload document')
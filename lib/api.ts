@@ -36,6 +36,7 @@ export interface Form {
   context_documents?: string[]
   template_type?: string
   embed_settings: EmbedSettings
+  ai_settings?: AISettings
   created_at: string
   updated_at: string
 }
@@ -57,6 +58,19 @@ export interface EmbedSettings {
   width: string
 }
 
+export interface AISettings {
+  history_token_budget?: number
+  answer_cache?: boolean
+  analysis_webhook_url?: string
+  incremental_insights?: boolean
+  signal_dictionaries?: Partial<Record<'ready' | 'buying_signal' | 'pain_point' | 'negative', string[]>>
+  rule_scoring?: boolean
+  model_routing?: 'auto' | 'fast' | 'strong'
+  fast_model?: string
+  strong_model?: string
+  analysis_model?: string
+}
+
 export interface Lead {
   id: string
   form_id: string
@@ -65,14 +79,28 @@ export interface Lead {
     email?: string
     phone?: string
   }
-  responses: Record<string, any>
-  conversation_history: ChatMessage[]
+  responses?: Record<string, any>
+  conversation_history?: ChatMessage[]
   pain_points: string[]
   buying_signals: string[]
   qualification_level: 'hot' | 'warm' | 'cold'
+  analysis_status?: 'pending' | 'processing' | 'completed' | 'failed'
   created_at: string
 }
 
+export interface LiveSessions {
+  form_id: string
+  qualification: Record<'hot' | 'warm' | 'cold', number>
+  sessions: {
+    session_id: string
+    message_count: number
+    qualification_level: 'hot' | 'warm' | 'cold' | null
+    pain_points: string[]
+    buying_signals: string[]
+    last_activity: string
+  }[]
+}
+
 export interface ChatMessage {
   role: 'user' | 'assistant'
   content: string
@@ -86,6 +114,9 @@ export interface Analytics {
   completion_rate: number
   drop_off_rate: number
   avg_completion_time: number
+  median_completion_time?: number
+  avg_session_duration?: number
+  funnel?: Array<{ step: string; sessions: number; conversion_from_previous: number | null }>
   top_questions: Array<{ question: string; count: number }>
   common_objections: Array<{ objection: string; count: number }>
 }
@@ -101,8 +132,8 @@ export const formsApi = {
 }
 
 export const leadsApi = {
-  getAll: (formId?: string) => 
-    api.get<Lead[]>('/leads', { params: { form_id: formId } }),
+  getAll: (formId?: string, cursor?: string) => 
+    api.get<Lead[]>('/leads', { params: { form_id: formId, cursor } }),
   getById: (id: string) => api.get<Lead>(`/leads/${id}`),
   exportCsv: (formId: string) => 
     api.get(`/leads/export/${formId}`, { responseType: 'blob' }),
@@ -111,6 +142,8 @@ export const leadsApi = {
 export const analyticsApi = {
   getFormAnalytics: (formId: string) => 
     api.get<Analytics>(`/analytics/forms/${formId}`),
+  getLiveSessions: (formId: string, minutes?: number) =>
+    api.get<LiveSessions>(`/analytics/forms/${formId}/live`, { params: { minutes } }),
   getDashboardStats: () => 
     api.get('/analytics/dashboard'),
 }
@@ -133,5 +166,6 @@ export const documentsApi = {
       headers: { 'Content-Type': 'multipart/form-data' },
     }),
   parse: (documentId: string) => api.post(`/documents/${documentId}/parse`),
+  getJob: (jobId: string) => api.get(`/documents/jobs/${jobId}`),
 }
 